@@ -0,0 +1,4 @@
+{#- Poids d'extrapolation des totaux : 1 / fraction de la population générée (generate.py --sample-fraction) -#}
+{% macro scaling_weight() %}
+    (select max(poids) from {{ source('canalbox', 'echantillonnage') }})
+{% endmacro %}
@@ -78,5 +78,6 @@ customer_churn_profile as (
     from churn_analysis cc
 )
 
-select * from customer_churn_profile
+select customer_churn_profile.*, {{ scaling_weight() }} as scaling_weight
+from customer_churn_profile
 order by churn_rate_percent desc, total_subscriptions desc
\ No newline at end of file
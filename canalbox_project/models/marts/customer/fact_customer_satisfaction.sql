@@ -67,5 +67,6 @@ trend_analysis as (
     from satisfaction_metrics sm
 )
 
-select * from trend_analysis
+select trend_analysis.*, {{ scaling_weight() }} as scaling_weight
+from trend_analysis
 order by feedback_month desc, geographic_zone
\ No newline at end of file
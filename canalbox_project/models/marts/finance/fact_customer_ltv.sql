@@ -60,5 +60,6 @@ customer_status as (
     from client_tenure ct
 )
 
-select * from customer_status
+select customer_status.*, {{ scaling_weight() }} as scaling_weight
+from customer_status
 order by total_revenue desc
\ No newline at end of file
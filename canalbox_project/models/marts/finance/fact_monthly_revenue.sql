@@ -3,18 +3,37 @@
     tags=['finance', 'marts']
 ) }}
 
-with monthly_payments as (
+-- Agrégats tenus à jour par triggers sur paiements (init.sql) : pas de relecture des paiements
+with monthly_rollups as (
     select
-        fp.payment_year,
-        fp.payment_month,
-        fp.payment_ym,
-        sum(fp.amount) as total_revenue,
-        count(distinct fp.client_id) as paying_clients,
-        count(distinct fp.subscription_id) as transactions,
-        avg(fp.amount) as avg_transaction_value
-    from {{ ref('fact_payments') }} fp
-    where fp.is_successful = true
-    group by 1, 2, 3
+        pm.mois,
+        sum(pm.montant_reussi)::bigint as total_revenue,
+        sum(pm.nb_reussis)::bigint as successful_payments,
+        sum(pm.nb_abonnements_payes)::bigint as transactions
+    from {{ source('canalbox', 'paiements_mensuels') }} pm
+    group by 1
+    having sum(pm.nb_reussis) > 0
+),
+
+monthly_payers as (
+    select
+        pp.mois,
+        count(distinct pp.client_id) as paying_clients
+    from {{ source('canalbox', 'paiements_payeurs_mensuels') }} pp
+    group by 1
+),
+
+monthly_payments as (
+    select
+        extract(year from mr.mois) as payment_year,
+        extract(month from mr.mois) as payment_month,
+        to_char(mr.mois, 'YYYY-MM') as payment_ym,
+        mr.total_revenue,
+        mpy.paying_clients,
+        mr.transactions,
+        mr.total_revenue::numeric / mr.successful_payments as avg_transaction_value
+    from monthly_rollups mr
+    left join monthly_payers mpy on mr.mois = mpy.mois
 ),
 
 subscription_values as (
@@ -53,5 +72,6 @@ mrr_calculation as (
     full outer join subscription_values sv on mp.payment_ym = sv.start_ym
 )
 
-select * from mrr_calculation
+select mrr_calculation.*, {{ scaling_weight() }} as scaling_weight
+from mrr_calculation
 order by payment_year desc, payment_month desc
\ No newline at end of file
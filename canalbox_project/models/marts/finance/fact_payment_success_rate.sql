@@ -3,19 +3,24 @@
     tags=['finance', 'marts']
 ) }}
 
+-- Agrégats tenus à jour par triggers sur paiements (init.sql) : pas de relecture des paiements
 with payment_metrics as (
     select
-        fp.payment_year,
-        fp.payment_month,
-        fp.payment_ym,
-        fp.simplified_payment_type,
-        count(*) as total_payments,
-        sum(case when fp.is_successful = true then 1 else 0 end) as successful_payments,
-        sum(case when fp.is_successful = false then 1 else 0 end) as failed_payments,
-        sum(fp.amount) as total_amount_processed,
-        sum(case when fp.is_successful = true then fp.amount else 0 end) as successful_amount,
-        sum(case when fp.is_successful = false then fp.amount else 0 end) as failed_amount
-    from {{ ref('fact_payments') }} fp
+        extract(year from pm.mois) as payment_year,
+        extract(month from pm.mois) as payment_month,
+        to_char(pm.mois, 'YYYY-MM') as payment_ym,
+        case 
+            when pm.type_paiement = 'initial' then 'Initial'
+            when pm.type_paiement = 'renouvellement' then 'Renewal'
+            else 'Other'
+        end as simplified_payment_type,
+        sum(pm.nb_paiements)::bigint as total_payments,
+        sum(pm.nb_reussis)::bigint as successful_payments,
+        sum(pm.nb_paiements - pm.nb_reussis)::bigint as failed_payments,
+        sum(pm.montant_total)::bigint as total_amount_processed,
+        sum(pm.montant_reussi)::bigint as successful_amount,
+        sum(pm.montant_total - pm.montant_reussi)::bigint as failed_amount
+    from {{ source('canalbox', 'paiements_mensuels') }} pm
     group by 1, 2, 3, 4
 ),
 
@@ -43,5 +48,6 @@ success_rates as (
     from payment_metrics pm
 )
 
-select * from success_rates
+select success_rates.*, {{ scaling_weight() }} as scaling_weight
+from success_rates
 order by payment_year desc, payment_month desc, simplified_payment_type
\ No newline at end of file
@@ -59,5 +59,6 @@ agent_performance as (
     from acquisition_metrics am
 )
 
-select * from agent_performance
+select agent_performance.*, {{ scaling_weight() }} as scaling_weight
+from agent_performance
 order by acquisition_month desc, new_clients desc
\ No newline at end of file
@@ -84,5 +84,6 @@ lifecycle_metrics as (
     from client_lifecycle_data cld
 )
 
-select * from lifecycle_metrics
+select lifecycle_metrics.*, {{ scaling_weight() }} as scaling_weight
+from lifecycle_metrics
 order by total_revenue desc, total_engagement_months desc
\ No newline at end of file
@@ -48,5 +48,6 @@ monthly_trends as (
     from installation_metrics im
 )
 
-select * from monthly_trends
+select monthly_trends.*, {{ scaling_weight() }} as scaling_weight
+from monthly_trends
 order by installation_month desc
\ No newline at end of file
@@ -72,5 +72,6 @@ performance_ranking as (
     from technician_metrics tm
 )
 
-select * from performance_ranking
+select performance_ranking.*, {{ scaling_weight() }} as scaling_weight
+from performance_ranking
 order by performance_score desc, completed_installations desc
\ No newline at end of file
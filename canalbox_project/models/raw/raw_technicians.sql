@@ -8,5 +8,7 @@ select
     nom,
     email,
     telephone,
+    latitude,
+    longitude,
     created_at
 from {{ source('canalbox', 'techniciens') }}
\ No newline at end of file
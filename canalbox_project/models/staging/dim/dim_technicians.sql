@@ -13,6 +13,8 @@ renamed as (
         nom as technician_name,
         email as technician_email,
         telephone as technician_phone,
+        latitude as technician_latitude,
+        longitude as technician_longitude,
         created_at as technician_created_at,
         -- Ajout de colonnes pour l'analyse temporelle
         extract(year from created_at) as technician_creation_year,
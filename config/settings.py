@@ -14,9 +14,25 @@ DEFAULT_PARAMS = {
     "agents_count": 123,
     "techniciens_count": 86,
     "clients_count": 5729,
-    "start_date": "2024-01-01"
+    "start_date": "2024-01-01",
+    "capacite_technicien": 3,  # Installations maximum par technicien et par jour
+    "chunk_size": 5000,  # Lignes par lot validé lors du chargement
+    "extract_chunk_size": 50000,  # Lignes lues par lot lors des extractions (extract.py)
+    "dbt_threads": 4,  # Modèles construits en parallèle par dbt_refresh.py
+    "loader_workers": 2,  # Processus de chargement en mode --pipeline (une connexion chacun)
+    "output_dir": "output",  # Sorties fichiers (--output parquet|csv)
+    "checkpoint_dir": "checkpoints",  # Points de reprise des runs
+    "snapshot_dir": "snapshots",  # Cache des jeux de données générés (--snapshot-cache)
+    "snapshot_max_gb": 20,  # Taille maximale du cache d'instantanés
+    "restore_workers": 4  # Connexions parallèles pour enregistrer ou restaurer un instantané
 }
 
+# Forfaits (miroir de la table forfaits d'init.sql, ids SERIAL dans l'ordre d'insertion)
+FORFAITS = [
+    {"id": 1, "nom": "50 Mbps", "prix_mensuel": 15000},
+    {"id": 2, "nom": "200 Mbps", "prix_mensuel": 30000}
+]
+
 # Modèles de box
 MODELES_BOX = [
     "Huawei HG8245H",
@@ -31,4 +47,130 @@ COTONOU_COORDS = {
     "latitude": 6.3700,
     "longitude": 2.4324,
     "radius": 0.1  # Rayon de dispersion en degrés
-}
\ No newline at end of file
+}
+
+# Règles de croissance utilisées pour répartir les créations dans le temps
+CROISSANCE_PARAMS = {
+    "croissance_mensuelle": 0.1,  # 10% de croissance par mois
+    "boost_pointe": 2.0,  # 100% de boost pendant la période de pointe
+    "debut_pointe": 25,  # Période de pointe : 25 du mois...
+    "fin_pointe": 8,  # ... au 8 du mois suivant
+    "variation_min": 0.7,  # Fluctuations aléatoires mensuelles (-30% à +50%)
+    "variation_max": 1.5,
+    "multiplicateur_min": 0.5  # Minimum de 0.5x la base
+}
+
+# Régions (generate.py --regions) : chacune est générée par son propre processus dans
+# son schéma region_<nom>, avec ses coordonnées, ses règles de croissance (remplacent
+# celles de CROISSANCE_PARAMS) et ses effectifs ; les vues du schéma REGIONS_SCHEMA
+# les réunissent pour les marts. Le code (distinct pour chaque région) est ajouté aux
+# numéros de série des boxes et aux emails : ils restent uniques dans ces vues
+REGIONS = {
+    "cotonou": {
+        "code": "COT",
+        "coords": COTONOU_COORDS,
+        "croissance": {},
+        "agents": 123,
+        "techniciens": 86,
+        "clients": 5729
+    },
+    "abomey_calavi": {
+        "code": "ABC",
+        "coords": {"latitude": 6.4485, "longitude": 2.3557, "radius": 0.08},
+        "croissance": {"croissance_mensuelle": 0.12},
+        "agents": 70,
+        "techniciens": 45,
+        "clients": 3500
+    },
+    "porto_novo": {
+        "code": "PNO",
+        "coords": {"latitude": 6.4969, "longitude": 2.6289, "radius": 0.06},
+        "croissance": {"croissance_mensuelle": 0.06},
+        "agents": 50,
+        "techniciens": 32,
+        "clients": 2400
+    },
+    "parakou": {
+        "code": "PAR",
+        "coords": {"latitude": 9.3372, "longitude": 2.6303, "radius": 0.05},
+        "croissance": {"croissance_mensuelle": 0.05, "boost_pointe": 1.5},
+        "agents": 30,
+        "techniciens": 20,
+        "clients": 1400
+    }
+}
+REGIONS_SCHEMA = "regions"
+
+
+# Planification des installations
+INSTALLATION_PARAMS = {
+    "delai_min_jours": 2,  # Installation souhaitée 2 à 7 jours ouvrables après soumission
+    "delai_max_jours": 7,
+    "candidats_proches": 4  # Techniciens les plus proches considérés pour chaque installation
+}
+
+# Probabilités de transition du cycle de vie des abonnements
+ABONNEMENT_PARAMS = {
+    "proba_premier_renouvellement": 0.95,  # 95% se réabonnent après l'installation
+    "proba_continuation": 0.9,  # 90% de chance de continuer avant 3 renouvellements
+    "proba_continuation_tardive": 0.7,  # 70% de chance de continuer ensuite
+    "seuil_continuation_tardive": 3,
+    "max_renouvellements": 12,
+    "proba_reabonnement_rapide": 0.8,  # Réabonnement dans les 0-2 jours, sinon 3-10 jours
+    "proba_forfait_premium": 0.2,
+    "durees_renouvellement": {1: 0.7, 3: 0.27, 6: 0.015, 12: 0.015},
+    "proba_retour": 0.15,  # Clients arrêtés qui reviennent après une pause
+    "pause_mois_min": 1,
+    "pause_mois_max": 6,
+    "proba_retour_premium": 0.1,
+    "durees_retour": {1: 0.8, 3: 0.1, 6: 0.1},
+    "horizon_jours": 30  # Pas d'abonnement au-delà d'aujourd'hui + 30 jours
+}
+
+# Profils de charge (generate.py --profile) : distributions asymétriques qui éprouvent
+# jointures, regroupements et index des marts. Paramètres d'un profil :
+# - zipf_agents : exposant de la loi de Zipf du choix de l'agent des clients (agents très sollicités)
+# - abonnements : probabilités du cycle de vie remplacées (ABONNEMENT_PARAMS), chaînes longues
+# - proba_soumission_repetee : probabilité de chaque soumission supplémentaire d'un client
+#   (nombre géométrique), suivie de sa réinstallation
+# - rafales_par_an / facteur_rafale : jours de rafale d'inscriptions et leur intensité
+PROFILS_CHARGE = {
+    "standard": {},
+    "agents_chauds": {"zipf_agents": 1.2},
+    "chaines_longues": {
+        "abonnements": {
+            "max_renouvellements": 240,
+            "proba_premier_renouvellement": 0.99,
+            "proba_continuation": 0.99,
+            "proba_continuation_tardive": 0.98,
+            "durees_renouvellement": {1: 0.95, 3: 0.05}
+        }
+    },
+    "reinstallations": {"proba_soumission_repetee": 0.4},
+    "rafales": {"rafales_par_an": 8, "facteur_rafale": 15}
+}
+# Toutes les asymétries à la fois
+PROFILS_CHARGE["stress"] = {
+    key: value
+    for name in ("agents_chauds", "chaines_longues", "reinstallations", "rafales")
+    for key, value in PROFILS_CHARGE[name].items()
+}
+
+# Simulateur d'événements en temps réel (simulate.py)
+SIMULATION_PARAMS = {
+    "inscriptions_par_seconde": 20,
+    "duree_secondes": 60,
+    "jours_par_seconde": 1,  # Vitesse de l'horloge simulée
+    "ecrivains": 4,  # Connexions du pool écrivant en parallèle
+    "evenements_par_transaction": 50,
+    "delai_transaction": 0.05  # Attente maximale (secondes) pour compléter une transaction
+}
+
+# Banc de charge des requêtes analytiques (query_bench.py)
+BENCH_PARAMS = {
+    "clients": 8,  # Clients concurrents (une connexion chacun)
+    "duree_secondes": 60,  # Durée de chaque phase de mesure
+    "statement_timeout_ms": 60000,
+    "explain_top": 3,  # Requêtes les plus lentes dont le plan est relevé
+    "chauffe_charge_secondes": 5  # Attente entre le lancement de la charge d'écriture et la mesure
+}
@@ -0,0 +1,99 @@
+"""
+Rafraîchit uniquement les modèles dbt impactés par les tables sources modifiées depuis le dernier run
+
+Les états des sources (lignes, date maximale, modifications) sont relevés avant
+`dbt run` et enregistrés s'il réussit : des données chargées pendant le run
+seront prises en compte au suivant.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import psycopg2
+
+from config.settings import DB_CONFIG, DEFAULT_PARAMS, REGIONS_SCHEMA
+from utils.dbt_orchestrator import (
+    SOURCE_TABLES, affected_models, changed_sources, load_manifest, load_watermarks, run_models,
+    save_watermarks, source_watermarks
+)
+from utils.regions import region_schemas
+from utils.sinks import compact_rollups
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("dbt_orchestrator")
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruction sélective des modèles dbt de Canalbox')
+    parser.add_argument('--threads', type=int, default=DEFAULT_PARAMS["dbt_threads"],
+                        help='Nombre de modèles construits en parallèle par dbt')
+    parser.add_argument('--full', action='store_true',
+                        help='Reconstruit tous les modèles, quelles que soient les sources modifiées')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Affiche les sources modifiées et les modèles à reconstruire sans exécuter dbt')
+    parser.add_argument('--watermark-file', type=str,
+                        default=str(Path(DEFAULT_PARAMS["checkpoint_dir"]) / "dbt_watermarks.json"),
+                        help='Fichier des états des sources au dernier run réussi')
+    parser.add_argument('--profiles-dir', type=str, default=None,
+                        help='Répertoire de profiles.yml (par défaut celui de dbt)')
+    parser.add_argument('--source-schema', type=str, default='public',
+                        help='Schéma des tables sources (regions : vues réunissant les régions de generate.py --regions)')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+
+    args = parser.parse_args()
+    watermark_file = Path(args.watermark_file)
+
+    conn = psycopg2.connect(
+        host=args.db_host,
+        port=args.db_port,
+        dbname=args.db_name,
+        user=args.db_user,
+        password=args.db_password
+    )
+    try:
+        if not args.dry_run:
+            # Agrégats mensuels des paiements ramenés à une ligne par clé avant leur relecture
+            if args.source_schema == REGIONS_SCHEMA:
+                for schema in region_schemas(conn):
+                    compact_rollups(conn, schema)
+            else:
+                compact_rollups(conn)
+        current = source_watermarks(conn, args.source_schema)
+    finally:
+        conn.close()
+
+    # Premier run (aucun état enregistré) : reconstruction complète
+    previous = load_watermarks(watermark_file)
+    full = args.full or previous is None
+    changed = list(SOURCE_TABLES) if full else changed_sources(current, previous)
+    if not changed:
+        logger.info("Aucune source modifiée depuis le dernier run, rien à reconstruire")
+        return
+    logger.info(f"Sources modifiées: {', '.join(changed)}")
+
+    manifest = load_manifest(profiles_dir=args.profiles_dir)
+    if full:
+        # Y compris les modèles sans source (dim_dates)
+        models = sorted(node["name"] for unique_id, node in manifest["nodes"].items() if unique_id.startswith("model."))
+    else:
+        models = affected_models(manifest, changed)
+    logger.info(f"{len(models)} modèles à reconstruire: {', '.join(models)}")
+    if args.dry_run or not models:
+        return
+
+    try:
+        timings = run_models(models, args.threads, profiles_dir=args.profiles_dir, dbt_vars={"source_schema": args.source_schema})
+    except Exception as e:
+        logger.error(f"Échec de dbt run, états des sources non enregistrés: {e}")
+        sys.exit(1)
+
+    save_watermarks(watermark_file, current)
+    logger.info(f"{len(timings)} modèles reconstruits ({sum(timings.values()):.2f} s cumulées)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Construit les modèles dbt (raw, staging, marts) sur DuckDB à partir des fichiers de generate.py
+
+Alternative embarquée au `dbt run` PostgreSQL : les sources sont lues directement
+dans les fichiers Parquet / CSV partitionnés (generate.py --output parquet|csv).
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from config.settings import DEFAULT_PARAMS
+from utils.duckdb_engine import register_sources, run_models
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("duckdb_runner")
+
+def main():
+    parser = argparse.ArgumentParser(description='Exécute les modèles dbt de Canalbox sur DuckDB')
+    parser.add_argument('--data-dir', type=str, default=DEFAULT_PARAMS["output_dir"],
+                        help='Répertoire des fichiers générés (generate.py --output-dir)')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='Format des fichiers générés')
+    parser.add_argument('--database', type=str, default=None,
+                        help='Fichier DuckDB où conserver les tables construites (en mémoire par défaut)')
+    parser.add_argument('--select', nargs='*', default=None,
+                        help='Modèles à construire, avec leurs dépendances (tous par défaut)')
+    parser.add_argument('--export-dir', type=str, default=None,
+                        help='Exporte les marts construits en Parquet dans ce répertoire')
+    args = parser.parse_args()
+
+    try:
+        import duckdb
+    except ImportError:
+        sys.exit("duckdb_runner nécessite duckdb (pip install duckdb)")
+
+    con = duckdb.connect(args.database or ":memory:")
+    sources = register_sources(con, args.data_dir, args.format)
+    logger.info(f"Sources déclarées: {', '.join(sources)}")
+
+    timings = run_models(con, args.select)
+    logger.info(f"{len(timings)} modèles construits en {sum(timings.values()):.2f} s")
+
+    if args.export_dir:
+        export_dir = Path(args.export_dir)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        marts = con.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'marts' ORDER BY 1"
+        ).fetchall()
+        for (name,) in marts:
+            path = export_dir / f"{name}.parquet"
+            con.execute(f"COPY marts.{name} TO '{path.as_posix()}' (FORMAT parquet)")
+            logger.info(f"marts.{name} exporté vers {path}")
+
+    con.close()
+
+if __name__ == "__main__":
+    main()
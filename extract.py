@@ -0,0 +1,80 @@
+"""
+Exporte des tables ou des marts PostgreSQL de Canalbox vers des fichiers Parquet / CSV
+
+Les lignes sont lues en flux (curseur nommé ou COPY TO STDOUT) et écrites au fil
+de l'eau : la mémoire utilisée ne dépend pas de la taille des tables.
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import psycopg2
+
+from config.settings import DB_CONFIG, DEFAULT_PARAMS
+from utils.extract import build_query, extract
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("extract")
+
+def parse_date(value: str):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def main():
+    parser = argparse.ArgumentParser(description='Extraction en flux des tables Canalbox')
+    parser.add_argument('--table', nargs='*', default=[],
+                        help='Tables ou marts à extraire (schema.table accepté)')
+    parser.add_argument('--query', type=str, default=None,
+                        help='Requête SELECT à extraire (avec --name)')
+    parser.add_argument('--name', type=str, default='requete',
+                        help='Nom du fichier produit pour --query')
+    parser.add_argument('--since', type=parse_date, default=None,
+                        help='Date de début incluse (YYYY-MM-DD)')
+    parser.add_argument('--until', type=parse_date, default=None,
+                        help='Date de fin exclue (YYYY-MM-DD)')
+    parser.add_argument('--date-column', type=str, default=None,
+                        help='Colonne filtrée par --since / --until (déduite pour les tables de init.sql)')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='Format des fichiers produits')
+    parser.add_argument('--method', choices=['cursor', 'copy'], default='cursor',
+                        help='Lecture par curseur nommé côté serveur, ou par COPY TO STDOUT (CSV uniquement)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_PARAMS["extract_chunk_size"],
+                        help='Nombre de lignes lues par lot')
+    parser.add_argument('--output-dir', type=str, default=str(Path(DEFAULT_PARAMS["output_dir"]) / "extract"),
+                        help='Répertoire des fichiers produits')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+
+    args = parser.parse_args()
+    if not args.table and args.query is None:
+        parser.error("Indiquer au moins une table (--table) ou une requête (--query)")
+    if args.method == "copy" and args.format != "csv":
+        parser.error("--method copy nécessite --format csv")
+
+    conn = psycopg2.connect(
+        host=args.db_host,
+        port=args.db_port,
+        dbname=args.db_name,
+        user=args.db_user,
+        password=args.db_password
+    )
+    extension = "parquet" if args.format == "parquet" else "csv.gz"
+    sources = [(table, None, table) for table in args.table]
+    if args.query is not None:
+        sources.append((None, args.query, args.name))
+
+    try:
+        for table, query, name in sources:
+            sql = build_query(conn, table=table, query=query, date_column=args.date_column,
+                              since=args.since, until=args.until)
+            output_path = Path(args.output_dir) / f"{name}.{extension}"
+            extract(conn, sql, output_path, args.format, args.method, args.chunk_size)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
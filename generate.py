@@ -5,13 +5,20 @@ Usage: python generate.py --agents 20 --clients 500 --start-date 2023-01-01
 """
 
 import argparse
+import json
 import logging
+import os
 import random
+import sys
+import time
+from bisect import bisect_right
 from datetime import date, timedelta
-from uuid import UUID, uuid4
-from typing import List, Dict, Tuple, Set
+from pathlib import Path
+from uuid import UUID
+from typing import Callable, List, Dict, Tuple, Set, Optional
 from collections import defaultdict
 
+import numpy as np
 import psycopg2
 from faker import Faker
 
@@ -27,260 +34,299 @@ logging.basicConfig(
 logger = logging.getLogger("data_generator")
 
 # Import des modules du projet
-from config.settings import DB_CONFIG, DEFAULT_PARAMS, MODELES_BOX, COTONOU_COORDS
+from config.settings import DB_CONFIG, DEFAULT_PARAMS, MODELES_BOX, COTONOU_COORDS, INSTALLATION_PARAMS, PROFILS_CHARGE, REGIONS, REGIONS_SCHEMA
+from utils.arrivals import sample_arrival_dates, stratified_sample
+from utils.plan import GenerationPlan
+from utils.lifecycle import simulate_abonnements
+from utils.checkpoint import CheckpointStore, new_run_id, seed_stage, seeded_uuid4
+from utils.kpi import compute_kpis
+from utils.sinks import FileSink, OutputSink, PostgresSink, write_sampling
+from utils.pipeline import PipelinedPostgresSink
+from utils.regions import (
+    create_region_views, ensure_region_schema, region_code, region_counts, region_db_config, region_seed, region_settings, run_regions
+)
+from utils.server_side import NB_COMMENTAIRES, generate_derived_tables, read_derived_tables
+from utils.snapshot import SnapshotCache, snapshot_key, tables_are_empty
+from utils.spatial import SpatialGrid
+from utils.scheduler import TechnicianAssignments, TechnicianScheduler
 from utils.date_utils import add_business_days, subtract_business_days, is_business_day
 from utils.validators import validate_paiement
 from models import Agent, Technicien, Client, Soumission, Installation, Box, Abonnement, Paiement, Feedback
 
-def get_clients_per_month(base_date: date, target_date: date) -> float:
-    """Calcule le multiplicateur de clients pour un mois donné"""
-    # Calculer le nombre de mois entre la date de base et la date cible
-    months_diff = (target_date.year - base_date.year) * 12 + (target_date.month - base_date.month)
-    
-    # Croissance progressive de 100% sur 24 mois
-    growth_factor = 1 + (months_diff * 0.1)  # 10% de croissance par mois
-    
-    # Période de pointe : 25 du mois au 8 du mois suivant
-    is_peak_period = False
-    if target_date.day >= 25:
-        is_peak_period = True
-    elif target_date.day <= 8 and target_date > base_date:
-        # Vérifier si c'est le mois suivant
-        if target_date.month == (base_date.month % 12) + 1 or (target_date.month == 1 and base_date.month == 12):
-            is_peak_period = True
-    
-    if is_peak_period:
-        growth_factor *= 2.0  # 100% de boost pendant la période de pointe
-    
-    # Fluctuations aléatoires mensuelles (-30% à +50%)
-    monthly_variation = random.uniform(0.7, 1.5)
-    growth_factor *= monthly_variation
-    
-    # Assurer un minimum de 0.5x la base
-    return max(0.5, growth_factor)
+def regional_email(email: str, code: Optional[str]) -> str:
+    """Ajoute le code de la région à la partie locale d'un email : les emails de régions différentes ne se confondent pas"""
+    if code is None:
+        return email
+    local, domain = email.split("@", 1)
+    return f"{local}.{code.lower()}@{domain}"
 
-def generate_agents(n: int, start_date: date) -> List[Agent]:
-    """Génère des commerciaux avec des dates de création aléatoires et évolution réaliste"""
+def generate_agents(n: int, plan: GenerationPlan, rng: Optional[np.random.Generator] = None, code: Optional[str] = None) -> List[Agent]:
+    """Génère des commerciaux avec des dates de création aléatoires suivant la courbe de demande du plan (code : code de la région des emails)"""
     fake = Faker('fr_FR')
     agents = []
     
-    # Date de fin pour la génération (aujourd'hui)
-    end_date = date.today()
-    
-    # Générer des agents sur la période complète
-    current_date = start_date
-    agent_count = 0
-    target_agents = n
+    # Dates de création de tous les agents (30% de la cible par mois, limite de sécurité à 2x la cible)
+    creation_dates = sample_arrival_dates((n / 12) * 0.3, plan, rng, min_per_month=1, limit=n * 2)
     
     # Suivre les emails uniques
     used_emails: Set[str] = set()
     
-    while current_date <= end_date:
-        # Calculer le nombre d'agents à créer pour ce mois
-        multiplier = get_clients_per_month(start_date, current_date)
-        agents_this_month = max(1, int((target_agents / 12) * multiplier * 0.3))  # 30% de la cible
-        
-        # Générer les agents pour ce mois
-        month_start = date(current_date.year, current_date.month, 1)
-        if current_date.month == 12:
-            month_end = date(current_date.year, 12, 31)
-        else:
-            month_end = date(current_date.year, current_date.month + 1, 1) - timedelta(days=1)
-        
-        for _ in range(agents_this_month):
-            if agent_count >= target_agents * 2:  # Limite de sécurité
-                break
-                
-            created_at = fake.date_between(start_date=month_start, end_date=month_end)
-            
-            # Générer un email unique
-            email = fake.email()
-            attempts = 0
-            while email in used_emails and attempts < 100:
-                email = fake.email()
-                attempts += 1
-            used_emails.add(email)
-            
-            agents.append(Agent(
-                id=uuid4(),
-                nom=fake.name(),
-                email=email,
-                telephone=fake.phone_number(),
-                created_at=created_at
-            ))
-            agent_count += 1
+    for created_at in creation_dates.tolist():
+        # Générer un email unique
+        email = regional_email(fake.email(), code)
+        attempts = 0
+        while email in used_emails and attempts < 100:
+            email = regional_email(fake.email(), code)
+            attempts += 1
+        used_emails.add(email)
         
-        # Passer au mois suivant
-        if current_date.month == 12:
-            current_date = date(current_date.year + 1, 1, 1)
-        else:
-            current_date = date(current_date.year, current_date.month + 1, 1)
+        agents.append(Agent(
+            id=seeded_uuid4(),
+            nom=fake.name(),
+            email=email,
+            telephone=fake.phone_number(),
+            created_at=created_at
+        ))
     
     logger.info(f"Générés {len(agents)} agents")
     return agents
 
-def generate_techniciens(n: int, start_date: date) -> List[Technicien]:
-    """Génère des techniciens avec des dates de création aléatoires et évolution réaliste"""
+def generate_techniciens(n: int, plan: GenerationPlan, rng: Optional[np.random.Generator] = None, coords: Dict = COTONOU_COORDS, code: Optional[str] = None) -> List[Technicien]:
+    """Génère des techniciens avec des dates de création suivant la courbe de demande du plan, autour des coordonnées de leur région (code : code de la région des emails)"""
     fake = Faker('fr_FR')
     techniciens = []
     
-    # Date de fin pour la génération (aujourd'hui)
-    end_date = date.today()
+    # Dates de création de tous les techniciens (40% de la cible par mois, limite de sécurité à 2x la cible)
+    creation_dates = sample_arrival_dates((n / 12) * 0.4, plan, rng, min_per_month=1, limit=n * 2)
     
-    # Générer des techniciens sur la période complète
-    current_date = start_date
-    tech_count = 0
-    target_techniciens = n
+    # Zone d'intervention de chaque technicien (domicile) autour de la ville de la région
+    if rng is None:
+        rng = np.random.default_rng()
+    lats = coords["latitude"] + rng.uniform(-coords["radius"], coords["radius"], len(creation_dates))
+    lons = coords["longitude"] + rng.uniform(-coords["radius"], coords["radius"], len(creation_dates))
     
     # Suivre les emails uniques
     used_emails: Set[str] = set()
     
-    while current_date <= end_date:
-        # Calculer le nombre de techniciens à créer pour ce mois
-        multiplier = get_clients_per_month(start_date, current_date)
-        techs_this_month = max(1, int((target_techniciens / 12) * multiplier * 0.4))  # 40% de la cible
-        
-        # Générer les techniciens pour ce mois
-        month_start = date(current_date.year, current_date.month, 1)
-        if current_date.month == 12:
-            month_end = date(current_date.year, 12, 31)
-        else:
-            month_end = date(current_date.year, current_date.month + 1, 1) - timedelta(days=1)
-        
-        for _ in range(techs_this_month):
-            if tech_count >= target_techniciens * 2:  # Limite de sécurité
-                break
-                
-            created_at = fake.date_between(start_date=month_start, end_date=month_end)
-            
-            # Générer un email unique
-            email = fake.email()
-            attempts = 0
-            while email in used_emails and attempts < 100:
-                email = fake.email()
-                attempts += 1
-            used_emails.add(email)
-            
-            techniciens.append(Technicien(
-                id=uuid4(),
-                nom=fake.name(),
-                email=email,
-                telephone=fake.phone_number(),
-                created_at=created_at
-            ))
-            tech_count += 1
+    for created_at, lat, lon in zip(creation_dates.tolist(), lats.tolist(), lons.tolist()):
+        # Générer un email unique
+        email = regional_email(fake.email(), code)
+        attempts = 0
+        while email in used_emails and attempts < 100:
+            email = regional_email(fake.email(), code)
+            attempts += 1
+        used_emails.add(email)
         
-        # Passer au mois suivant
-        if current_date.month == 12:
-            current_date = date(current_date.year + 1, 1, 1)
-        else:
-            current_date = date(current_date.year, current_date.month + 1, 1)
+        techniciens.append(Technicien(
+            id=seeded_uuid4(),
+            nom=fake.name(),
+            email=email,
+            telephone=fake.phone_number(),
+            latitude=lat,
+            longitude=lon,
+            created_at=created_at
+        ))
     
     logger.info(f"Générés {len(techniciens)} techniciens")
     return techniciens
 
-def generate_clients(n: int, agents: List[Agent], start_date: date) -> List[Client]:
-    """Génère des clients avec évolution réaliste au fil du temps"""
+def generate_clients(n: int, agents: List[Agent], plan: GenerationPlan, rng: Optional[np.random.Generator] = None, sample_fraction: float = 1.0, profile: Optional[Dict] = None, coords: Dict = COTONOU_COORDS, code: Optional[str] = None) -> List[Client]:
+    """
+    Génère des clients suivant la courbe de demande du plan
+
+    Avec sample_fraction < 1, les dates d'arrivée de la population complète sont
+    tirées puis échantillonnées par date (stratified_sample) : seule cette fraction
+    des clients, et donc de leurs lignes dépendantes, est générée.
+
+    Le profil de charge (PROFILS_CHARGE) peut ajouter des jours de rafale
+    d'inscriptions et concentrer les clients sur quelques agents (loi de Zipf).
+    coords sont les coordonnées de la région (Cotonou par défaut), code son code,
+    ajouté aux emails.
+    """
     fake = Faker('fr_FR')
     clients = []
+    if rng is None:
+        rng = np.random.default_rng()
+    profile = profile or {}
     
-    # Date de fin pour la génération (aujourd'hui)
-    end_date = date.today()
+    # Dates de création de tous les clients, triées chronologiquement
+    bursts = (profile["rafales_par_an"], profile["facteur_rafale"]) if profile.get("rafales_par_an") else None
+    client_dates = sample_arrival_dates(n / 12, plan, rng, min_per_month=10, bursts=bursts)
+    if sample_fraction < 1:
+        client_dates = stratified_sample(client_dates, sample_fraction, rng)
+    
+    # Agents éligibles (créés avant la date du client) : préfixe de la liste triée par date
+    agents_sorted = sorted(agents, key=lambda a: a.created_at)
+    agent_dates = np.array([a.created_at for a in agents_sorted], dtype='datetime64[D]')
+    eligible_counts = np.searchsorted(agent_dates, client_dates, side='right')
+    
+    # Ignorer les jours sans agent éligible
+    has_agent = eligible_counts > 0
+    client_dates = client_dates[has_agent]
+    eligible_counts = eligible_counts[has_agent]
+    
+    # Choisir un agent éligible et des coordonnées autour de la ville de la région pour chaque client
+    if profile.get("zipf_agents"):
+        # Popularité de rang r (ordre aléatoire) proportionnelle à r^-s : tirage dans les
+        # poids cumulés du préfixe des agents éligibles
+        ranks = rng.permutation(len(agents_sorted)) + 1
+        cumulative = np.cumsum(ranks.astype(float) ** -profile["zipf_agents"])
+        targets = rng.random(len(client_dates)) * cumulative[eligible_counts - 1]
+        agent_idx = np.minimum(np.searchsorted(cumulative, targets, side='right'), eligible_counts - 1)
+    else:
+        agent_idx = (rng.random(len(client_dates)) * eligible_counts).astype(np.int64)
+    lats = coords["latitude"] + rng.uniform(-coords["radius"], coords["radius"], len(client_dates))
+    lons = coords["longitude"] + rng.uniform(-coords["radius"], coords["radius"], len(client_dates))
     
     # Suivre les emails uniques
     used_emails: Set[str] = set()
     
-    # Générer des clients mois par mois
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Calculer le nombre de clients à créer pour ce mois
-        multiplier = get_clients_per_month(start_date, current_date)
-        clients_this_month = max(10, int((n / 12) * multiplier))
-        
-        # Générer les clients pour ce mois
-        month_start = date(current_date.year, current_date.month, 1)
-        if current_date.month == 12:
-            month_end = date(current_date.year, 12, 31)
-        else:
-            month_end = date(current_date.year, current_date.month + 1, 1) - timedelta(days=1)
-        
-        # Répartition des clients dans le mois
-        daily_clients = defaultdict(int)
-        for _ in range(clients_this_month):
-            client_date = fake.date_between(start_date=month_start, end_date=month_end)
-            daily_clients[client_date] += 1
-        
-        # Générer les clients pour chaque jour
-        for client_date, count in daily_clients.items():
-            # Choisir des agents éligibles (créés avant cette date)
-            eligible_agents = [a for a in agents if a.created_at <= client_date]
-            if not eligible_agents:
-                continue
-            
-            for _ in range(count):
-                # Choisir un agent
-                agent = random.choice(eligible_agents)
-                
-                # Générer des coordonnées autour de Cotonou
-                lat = COTONOU_COORDS["latitude"] + random.uniform(-COTONOU_COORDS["radius"], COTONOU_COORDS["radius"])
-                lon = COTONOU_COORDS["longitude"] + random.uniform(-COTONOU_COORDS["radius"], COTONOU_COORDS["radius"])
-                
-                # Générer un email unique
-                email = fake.email()
-                attempts = 0
-                while email in used_emails and attempts < 100:
-                    email = fake.email()
-                    attempts += 1
-                used_emails.add(email)
-                
-                clients.append(Client(
-                    id=uuid4(),
-                    agent_id=agent.id,
-                    box_id=None,  # Sera rempli plus tard
-                    nom=fake.last_name(),
-                    prenom=fake.first_name(),
-                    email=email,
-                    telephone=fake.phone_number(),
-                    adresse=fake.address().replace('\n', ', '),
-                    latitude=lat,
-                    longitude=lon,
-                    created_at=client_date
-                ))
+    for client_date, idx, lat, lon in zip(client_dates.tolist(), agent_idx.tolist(), lats.tolist(), lons.tolist()):
+        # Générer un email unique
+        email = regional_email(fake.email(), code)
+        attempts = 0
+        while email in used_emails and attempts < 100:
+            email = regional_email(fake.email(), code)
+            attempts += 1
+        used_emails.add(email)
         
-        # Passer au mois suivant
-        if current_date.month == 12:
-            current_date = date(current_date.year + 1, 1, 1)
-        else:
-            current_date = date(current_date.year, current_date.month + 1, 1)
+        clients.append(Client(
+            id=seeded_uuid4(),
+            agent_id=agents_sorted[idx].id,
+            box_id=None,  # Sera rempli plus tard
+            nom=fake.last_name(),
+            prenom=fake.first_name(),
+            email=email,
+            telephone=fake.phone_number(),
+            adresse=fake.address().replace('\n', ', '),
+            latitude=lat,
+            longitude=lon,
+            created_at=client_date
+        ))
     
     logger.info(f"Générés {len(clients)} clients")
     return clients
 
-def generate_soumissions(clients: List[Client]) -> List[Soumission]:
-    """Génère des soumissions liées aux clients"""
+def generate_soumissions(clients: List[Client], rng: Optional[np.random.Generator] = None, end_date: Optional[date] = None, repeat_probability: float = 0.0) -> List[Soumission]:
+    """
+    Génère des soumissions liées aux clients
+
+    Chaque client dépose une soumission à sa création. Avec repeat_probability > 0
+    (profil reinstallations), il en dépose ensuite un nombre géométrique d'autres
+    (déménagement, remplacement de la box), à des dates tirées entre un mois après
+    sa création et end_date ; chacune donnera lieu à une installation. Les
+    soumissions initiales précèdent les autres dans la liste.
+    """
     soumissions = []
     
     for client in clients:
         soumissions.append(Soumission(
-            id=uuid4(),
+            id=seeded_uuid4(),
             client_id=client.id,
             date_soumission=client.created_at,
             statut="soumis"
         ))
     
+    if repeat_probability > 0 and clients:
+        if rng is None:
+            rng = np.random.default_rng()
+        end = np.datetime64(end_date or date.today(), 'D')
+        created = np.array([c.created_at for c in clients], dtype='datetime64[D]')
+        first_repeat = created + np.timedelta64(30, 'D')
+        extra = rng.geometric(1 - repeat_probability, len(clients)) - 1
+        extra[first_repeat > end] = 0
+        owners = np.repeat(np.arange(len(clients)), extra)
+        span = (end - first_repeat[owners]).astype(np.int64) + 1
+        dates = first_repeat[owners] + (rng.random(len(owners)) * span).astype('timedelta64[D]')
+        order = np.lexsort((dates, owners))
+        for owner, date_soumission in zip(owners[order].tolist(), dates[order].tolist()):
+            soumissions.append(Soumission(
+                id=seeded_uuid4(),
+                client_id=clients[owner].id,
+                date_soumission=date_soumission,
+                statut="soumis"
+            ))
+        logger.info(f"Soumissions répétées: {len(owners)} pour {int((extra > 0).sum())} clients (max {int(extra.max())} par client)")
+    
     logger.info(f"Générées {len(soumissions)} soumissions")
     return soumissions
 
-def generate_installations(soumissions: List[Soumission], techniciens: List[Technicien]) -> Tuple[List[Installation], List[Dict]]:
-    """Génère des installations avec dates planifiées et réelles"""
+def generate_installations(
+    soumissions: List[Soumission],
+    techniciens: List[Technicien],
+    clients: List[Client],
+    capacity_per_day: int = DEFAULT_PARAMS["capacite_technicien"],
+    sample_fraction: float = 1.0
+) -> Tuple[List[Installation], TechnicianAssignments]:
+    """
+    Génère des installations avec dates planifiées et réelles, assignées aux techniciens les plus proches
+
+    Chaque technicien réalise au plus capacity_per_day installations par jour :
+    quand les techniciens proches sont complets, la date planifiée est reportée
+    au premier jour où deux d'entre eux sont disponibles. Pour un échantillon
+    (sample_fraction < 1), chaque installation occupe les techniciens pour
+    1 / sample_fraction installations, comme dans la population complète.
+    Les assignations (installation_techniciens) sont des indices dans les
+    tables installations et techniciens.
+    """
     installations = []
-    installation_techniciens = []
+    installation_rows = []
+    technicien_rows = []
     
-    for soumission in soumissions:
-        # Calculer les dates (2-7 jours ouvrables après soumission)
-        days_to_install = random.randint(2, 7)
-        date_planifiee = add_business_days(soumission.date_soumission, days_to_install)
+    # Localisation des clients
+    client_coords = {c.id: (c.latitude, c.longitude) for c in clients}
+    
+    # Date souhaitée : 2-7 jours ouvrables après soumission
+    demandes = []
+    for soumission in sorted(soumissions, key=lambda s: s.date_soumission):
+        days_to_install = random.randint(INSTALLATION_PARAMS["delai_min_jours"], INSTALLATION_PARAMS["delai_max_jours"])
+        demandes.append((add_business_days(soumission.date_soumission, days_to_install), soumission))
+    
+    # Les créneaux sont réservés par date souhaitée croissante
+    demandes.sort(key=lambda d: d[0])
+    
+    # Index spatial des techniciens, alimenté au fil de leur date d'arrivée ;
+    # les techniciens sont désignés par leur indice dans la table
+    tech_rows = {t.id: i for i, t in enumerate(techniciens)}
+    techs_by_date = sorted(techniciens, key=lambda t: t.created_at)
+    tech_grid = SpatialGrid()
+    scheduler = TechnicianScheduler(capacity_per_day)
+    next_tech = 0
+    distances = []
+    reports = 0
+    
+    for date_souhaitee, soumission in demandes:
+        # Ajouter à l'index les techniciens arrivés avant la date souhaitée
+        while next_tech < len(techs_by_date) and techs_by_date[next_tech].created_at <= date_souhaitee:
+            tech = techs_by_date[next_tech]
+            tech_grid.add(next_tech, tech.latitude, tech.longitude)
+            next_tech += 1
+        
+        # Candidats : les techniciens éligibles les plus proches du client
+        if len(tech_grid) >= 2:
+            lat, lon = client_coords[soumission.client_id]
+            nearest = tech_grid.nearest(lat, lon, INSTALLATION_PARAMS["candidats_proches"])
+            candidates = [techs_by_date[idx] for idx, _ in nearest]
+            tech_distances = {tech_rows[techs_by_date[idx].id]: d for idx, d in nearest}
+        elif len(tech_grid) == 1:
+            # Si un seul technicien éligible, l'ajouter et en choisir un autre
+            candidates = [techs_by_date[0]]
+            # Ajouter un technicien aléatoire parmi les autres
+            other_techs = techs_by_date[1:]
+            if other_techs:
+                candidates.append(random.choice(other_techs))
+            tech_distances = {}
+        else:
+            # Si aucun technicien n'est éligible, choisir 2 aléatoires
+            candidates = random.sample(techniciens, min(2, len(techniciens))) if techniciens else []
+            tech_distances = {}
+        
+        # Premier jour où 2 candidats ont un créneau libre
+        candidate_rows = list(dict.fromkeys(tech_rows[t.id] for t in candidates))
+        date_planifiee, selected = scheduler.book(candidate_rows, date_souhaitee, 2, 1 / sample_fraction)
+        if date_planifiee > date_souhaitee:
+            reports += 1
+        distances.extend(tech_distances[t] for t in selected if t in tech_distances)
         
         # Date d'appel : 1-2 jours ouvrables avant installation
         days_to_call = random.randint(1, 2)
@@ -290,46 +336,41 @@ def generate_installations(soumissions: List[Soumission], techniciens: List[Tech
         if random.random() < 0.95:
             date_realisation = date_planifiee
         else:
-            # Report de 1 jour ouvrable en cas d'échec
-            date_realisation = add_business_days(date_planifiee, 1)
+            # Report au premier jour ouvrable suivant où les mêmes techniciens ont un créneau
+            date_realisation = scheduler.book_after(selected, date_planifiee, 1 / sample_fraction)
         
         installation = Installation(
-            id=uuid4(),
+            id=seeded_uuid4(),
             soumission_id=soumission.id,
             date_planifiee=date_planifiee,
             date_realisation=date_realisation,
             date_appel=date_appel
         )
+        installation_rows.extend([len(installations)] * len(selected))
+        technicien_rows.extend(selected)
         installations.append(installation)
-        
-        # Assigner 2 techniciens créés avant la date de soumission
-        eligible_techs = [t for t in techniciens if t.created_at <= soumission.date_soumission]
-        if len(eligible_techs) >= 2:
-            selected_techs = random.sample(eligible_techs, 2)
-        elif len(eligible_techs) == 1:
-            # Si un seul technicien éligible, l'ajouter et en choisir un autre
-            selected_techs = [eligible_techs[0]]
-            # Ajouter un technicien aléatoire parmi les autres
-            other_techs = [t for t in techniciens if t != eligible_techs[0]]
-            if other_techs:
-                selected_techs.append(random.choice(other_techs))
-        else:
-            # Si aucun technicien n'est éligible, choisir 2 aléatoires
-            selected_techs = random.sample(techniciens, min(2, len(techniciens))) if techniciens else []
-        
-        for tech in selected_techs:
-            installation_techniciens.append({
-                "installation_id": installation.id,
-                "technicien_id": tech.id
-            })
     
+    installation_techniciens = TechnicianAssignments(
+        [i.id for i in installations],
+        [t.id for t in techniciens],
+        np.array([i.date_planifiee for i in installations], dtype="datetime64[D]"),
+        np.array(installation_rows, dtype=np.int32),
+        np.array(technicien_rows, dtype=np.int32)
+    )
     logger.info(f"Générées {len(installations)} installations avec {len(installation_techniciens)} assignations techniciens")
+    logger.info(f"Installations reportées faute de technicien disponible: {reports}")
+    if distances:
+        logger.info(f"Distance moyenne technicien-client: {sum(distances) / len(distances):.2f} km")
+    _, _, workload = installation_techniciens.daily_workload()
+    if len(workload):
+        logger.info(f"Charge journalière des techniciens: {workload.mean():.2f} installations en moyenne, {workload.max()} au plus")
     return installations, installation_techniciens
 
-def generate_boxes(clients: List[Client]) -> Tuple[List[Box], List[Client]]:
-    """Génère des boxes pour les clients et met à jour les clients avec box_id"""
+def generate_boxes(clients: List[Client], code: Optional[str] = None) -> Tuple[List[Box], List[Client]]:
+    """Génère des boxes pour les clients et met à jour les clients avec box_id (numéros CBX-<code>-XXXX-AAAA pour une région)"""
     boxes = []
     used_serials: Set[str] = set()
+    prefix = f"CBX-{code}-" if code else "CBX-"
     
     # Créer une copie des clients pour mise à jour
     updated_clients = []
@@ -337,13 +378,13 @@ def generate_boxes(clients: List[Client]) -> Tuple[List[Box], List[Client]]:
     for client in clients:
         # Générer un numéro de série unique
         year = client.created_at.year
-        serial = f"CBX-{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}" \
+        serial = f"{prefix}{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}" \
                  f"{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}-{year}"
         
         # S'assurer que le numéro de série est unique
         attempts = 0
         while serial in used_serials and attempts < 100:
-            serial = f"CBX-{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}" \
+            serial = f"{prefix}{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}" \
                      f"{random.choice('0123456789ABCDEF')}{random.choice('0123456789ABCDEF')}-{year}"
             attempts += 1
         used_serials.add(serial)
@@ -378,15 +419,26 @@ def generate_boxes(clients: List[Client]) -> Tuple[List[Box], List[Client]]:
     logger.info(f"Générées {len(boxes)} boxes")
     return boxes, updated_clients
 
-def generate_abonnements(clients: List[Client], installations: List[Installation], forfaits: List[Dict], client_soumissions: Dict) -> List[Abonnement]:
-    """Génère des abonnements initiaux et renouvellements avec comportement client réaliste"""
+def generate_abonnements(clients: List[Client], installations: List[Installation], forfaits: List[Dict], client_soumissions: Dict, rng: Optional[np.random.Generator] = None, end_date: Optional[date] = None, lifecycle_params: Optional[Dict] = None, reinstallations: Optional[Dict] = None) -> List[Abonnement]:
+    """
+    Génère des abonnements initiaux et renouvellements avec comportement client réaliste
+
+    La chaîne d'un client part de l'installation de sa soumission initiale
+    (client_soumissions). lifecycle_params remplace des probabilités du cycle de
+    vie (ABONNEMENT_PARAMS), et reinstallations associe à un client ses
+    réinstallations réalisées (date_realisation, installation) triées par date :
+    un abonnement référence la dernière installation réalisée avant son début.
+    """
     abonnements = []
     # Créer un mapping soumission_id -> installation
     installation_dict = {inst.soumission_id: inst for inst in installations}
     
     # Forfait de base (50 Mbps à 15k) - le plus populaire
     forfait_base = next(f for f in forfaits if f["prix_mensuel"] == 15000)
+    forfait_premium = next(f for f in forfaits if f["id"] != forfait_base["id"])
     
+    # Clients avec une installation réalisée : point de départ de leur chaîne d'abonnements
+    chains = []
     for client in clients:
         # Trouver la soumission correspondante
         if client.id not in client_soumissions:
@@ -399,111 +451,35 @@ def generate_abonnements(clients: List[Client], installations: List[Installation
         installation = installation_dict[soumission.id]
         if not installation.date_realisation:
             continue
-            
-        # Abonnement initial - toujours le forfait de base
-        duree = 1  # Abonnement initial toujours pour 1 mois
-        
-        abonnement = Abonnement(
-            id=uuid4(),
+        chains.append((client, installation))
+    
+    # Simuler toutes les chaînes de renouvellement en bloc
+    start_dates = np.array([inst.date_realisation for _, inst in chains], dtype='datetime64[D]')
+    simulated = simulate_abonnements(start_dates, end_date or date.today(), rng, lifecycle_params)
+    reinstallations = reinstallations or {}
+    
+    for client_idx, premium, date_debut, date_fin, duree in zip(
+        simulated["client_idx"].tolist(),
+        simulated["premium"].tolist(),
+        simulated["date_debut"].tolist(),
+        simulated["date_fin"].tolist(),
+        simulated["duree"].tolist()
+    ):
+        client, installation = chains[client_idx]
+        if client.id in reinstallations:
+            later = reinstallations[client.id]
+            position = bisect_right(later, date_debut, key=lambda r: r[0])
+            if position:
+                installation = later[position - 1][1]
+        abonnements.append(Abonnement(
+            id=seeded_uuid4(),
             client_id=client.id,
-            forfait_id=forfait_base["id"],
+            forfait_id=forfait_premium["id"] if premium else forfait_base["id"],
             installation_id=installation.id,
-            date_debut=installation.date_realisation,
-            date_fin=installation.date_realisation + timedelta(days=30 * duree),
+            date_debut=date_debut,
+            date_fin=date_fin,
             duree_renouvellement=duree
-        )
-        abonnements.append(abonnement)
-        
-        # Générer des renouvellements réalistes
-        current_date = abonnement.date_fin
-        max_renewals = 12  # Max 12 renouvellements
-        renewal_count = 0
-        
-        # 95% des clients se réabonnent immédiatement après l'installation
-        should_renew = random.random() < 0.95
-        
-        while should_renew and renewal_count < max_renewals:
-            # 80% des clients se réabonnent dans les 2 jours suivant l'expiration
-            if random.random() < 0.8:
-                # Réabonnement dans 0-2 jours
-                days_delay = random.randint(0, 2)
-                date_paiement = current_date + timedelta(days=days_delay)
-            else:
-                # Réabonnement plus tard (0-10 jours)
-                days_delay = random.randint(3, 10)
-                date_paiement = current_date + timedelta(days=days_delay)
-            
-            # Vérifier que la date de paiement est plausible (pas dans le futur trop lointain)
-            if date_paiement > date.today() + timedelta(days=30):
-                break
-                
-            # 80% du temps, le client choisit le forfait de base (15k)
-            # 20% du temps, il peut choisir le forfait haut débit (30k)
-            if random.random() < 0.8:
-                forfait = forfait_base
-            else:
-                forfait = next(f for f in forfaits if f["id"] != forfait_base["id"])
-            
-            # Durée du renouvellement - généralement 1 mois
-            if random.random() < 0.7:
-                duree = 1  # 70% du temps
-            elif random.random() < 0.9:
-                duree = 3  # 20% du temps
-            else:
-                duree = random.choice([6, 12])  # 10% du temps
-            
-            abonnement = Abonnement(
-                id=uuid4(),
-                client_id=client.id,
-                forfait_id=forfait["id"],
-                installation_id=installation.id,
-                date_debut=current_date,
-                date_fin=current_date + timedelta(days=30 * duree),
-                duree_renouvellement=duree
-            )
-            abonnements.append(abonnement)
-            current_date = abonnement.date_fin
-            renewal_count += 1
-            
-            # Après 3 mois, la probabilité de réabonnement diminue
-            if renewal_count >= 3:
-                # 70% de chance de continuer après 3 mois
-                should_renew = random.random() < 0.7
-            else:
-                # 90% de chance de continuer avant 3 mois
-                should_renew = random.random() < 0.9
-        
-        # 15% des clients qui se sont arrêtés reviennent après une pause
-        if renewal_count > 0 and random.random() < 0.15:
-            # Pause de 1 à 6 mois
-            pause_months = random.randint(1, 6)
-            pause_days = pause_months * 30
-            comeback_date = current_date + timedelta(days=pause_days)
-            
-            # Vérifier que la date de retour est plausible
-            if comeback_date <= date.today() + timedelta(days=30):
-                # 90% du temps, ces clients reviennent avec le forfait de base
-                if random.random() < 0.9:
-                    forfait = forfait_base
-                else:
-                    forfait = next(f for f in forfaits if f["id"] != forfait_base["id"])
-                
-                # Durée du retour - généralement 1 mois
-                if random.random() < 0.8:
-                    duree = 1
-                else:
-                    duree = random.choice([3, 6])
-                
-                comeback_abo = Abonnement(
-                    id=uuid4(),
-                    client_id=client.id,
-                    forfait_id=forfait["id"],
-                    installation_id=installation.id,
-                    date_debut=comeback_date,
-                    date_fin=comeback_date + timedelta(days=30 * duree),
-                    duree_renouvellement=duree
-                )
-                abonnements.append(comeback_abo)
+        ))
     
     logger.info(f"Générés {len(abonnements)} abonnements")
     return abonnements
@@ -535,7 +511,7 @@ def generate_paiements(clients: List[Client], abonnements: List[Abonnement], for
         montant_initial = 25000  # 10k frais installation + 15k premier mois
         
         paiements.append(Paiement(
-            id=uuid4(),
+            id=seeded_uuid4(),
             client_id=client.id,
             abonnement_id=initial_abo.id,
             montant=montant_initial,
@@ -543,6 +519,10 @@ def generate_paiements(clients: List[Client], abonnements: List[Abonnement], for
             date_paiement=client.created_at
         ))
         
+        # Fins d'abonnement triées : les abonnements terminés avant chaque début en forment un préfixe
+        ends = sorted(a.date_fin for a in abos)
+        n_ended = 0
+        
         # Paiements de renouvellement (abonnements suivants)
         for abonnement in abos[1:]:
             montant = forfait_prix[abonnement.forfait_id] * abonnement.duree_renouvellement
@@ -555,14 +535,13 @@ def generate_paiements(clients: List[Client], abonnements: List[Abonnement], for
                 date_paiement = abonnement.date_debut - timedelta(days=days_before)
                 
                 # S'assurer que la date de paiement n'est pas avant la date de fin de l'abonnement précédent
-                previous_abos = [a for a in abos if a.date_fin <= abonnement.date_debut]
-                if previous_abos:
-                    previous_abo = max(previous_abos, key=lambda x: x.date_fin)
-                    if date_paiement < previous_abo.date_fin:
-                        date_paiement = previous_abo.date_fin
+                while n_ended < len(ends) and ends[n_ended] <= abonnement.date_debut:
+                    n_ended += 1
+                if n_ended and date_paiement < ends[n_ended - 1]:
+                    date_paiement = ends[n_ended - 1]
                 
                 paiements.append(Paiement(
-                    id=uuid4(),
+                    id=seeded_uuid4(),
                     client_id=client.id,
                     abonnement_id=abonnement.id,
                     montant=montant,
@@ -573,11 +552,14 @@ def generate_paiements(clients: List[Client], abonnements: List[Abonnement], for
     logger.info(f"Générés {len(paiements)} paiements")
     return paiements
 
-def generate_feedback(installations: List[Installation]) -> List[Feedback]:
+def generate_feedback(installations: List[Installation], soumissions: List[Soumission]) -> List[Feedback]:
     """Génère des feedbacks après installation"""
     fake = Faker('fr_FR')
     feedbacks = []
     
+    # Le client d'une installation est celui de sa soumission
+    soumission_clients = {s.id: s.client_id for s in soumissions}
+    
     for installation in installations:
         if not installation.date_realisation:
             continue
@@ -593,8 +575,8 @@ def generate_feedback(installations: List[Installation]) -> List[Feedback]:
             note_tech = min(5, max(1, int(random.gauss(4.5, 0.7))))
             
             feedbacks.append(Feedback(
-                id=uuid4(),
-                client_id=installation.soumission_id,  # À corriger lors de l'insertion
+                id=seeded_uuid4(),
+                client_id=soumission_clients[installation.soumission_id],
                 installation_id=installation.id,
                 satisfaction_produit=satisfaction,
                 note_techniciens=note_tech,
@@ -605,179 +587,274 @@ def generate_feedback(installations: List[Installation]) -> List[Feedback]:
     logger.info(f"Générés {len(feedbacks)} feedbacks")
     return feedbacks
 
-def insert_data_to_db(conn, data_dict: Dict):
-    """Insère les données générées dans la base de données"""
-    cursor = conn.cursor()
+def generation_end_date(params: Dict) -> date:
+    """Date de fin de la génération : celle des paramètres du run, aujourd'hui par défaut"""
+    return date.fromisoformat(params["end_date"]) if params.get("end_date") else date.today()
+
+def run_stage(store: CheckpointStore, seed: int, stage: str, func):
+    """Exécute une étape de génération, ou la relit depuis son point de reprise si elle est terminée"""
+    if store.has_stage(stage):
+        logger.info(f"Étape {stage} reprise depuis le point de reprise")
+        return store.load_stage(stage)
     
-    try:
-        # Agents
-        for agent in data_dict["agents"]:
-            cursor.execute("""
-                INSERT INTO agents (id, nom, email, telephone, created_at)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                str(agent.id),
-                agent.nom,
-                agent.email,
-                agent.telephone,
-                agent.created_at
-            ))
-        
-        # Techniciens
-        for technicien in data_dict["techniciens"]:
-            cursor.execute("""
-                INSERT INTO techniciens (id, nom, email, telephone, created_at)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                str(technicien.id),
-                technicien.nom,
-                technicien.email,
-                technicien.telephone,
-                technicien.created_at
-            ))
-        
-        # Clients (avec box_id)
-        for client in data_dict["clients"]:
-            cursor.execute("""
-                INSERT INTO clients (id, agent_id, box_id, nom, prenom, email, telephone, adresse, latitude, longitude, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                str(client.id),
-                str(client.agent_id),
-                client.box_id,  # Peut être None
-                client.nom,
-                client.prenom,
-                client.email,
-                client.telephone,
-                client.adresse,
-                client.latitude,
-                client.longitude,
-                client.created_at
-            ))
-        
-        # Soumissions
-        for soumission in data_dict["soumissions"]:
-            cursor.execute("""
-                INSERT INTO soumissions (id, client_id, date_soumission, statut)
-                VALUES (%s, %s, %s, %s)
-            """, (
-                str(soumission.id),
-                str(soumission.client_id),
-                soumission.date_soumission,
-                soumission.statut
-            ))
-        
-        # Installations
-        for installation in data_dict["installations"]:
-            cursor.execute("""
-                INSERT INTO installations (id, soumission_id, date_planifiee, date_realisation, date_appel)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                str(installation.id),
-                str(installation.soumission_id),
-                installation.date_planifiee,
-                installation.date_realisation,
-                installation.date_appel
-            ))
-        
-        # Installation-Techniciens
-        for rel in data_dict["installation_techniciens"]:
-            cursor.execute("""
-                INSERT INTO installation_techniciens (installation_id, technicien_id)
-                VALUES (%s, %s)
-            """, (
-                str(rel["installation_id"]),
-                str(rel["technicien_id"])
-            ))
-        
-        # Boxes
-        for box in data_dict["boxes"]:
-            cursor.execute("""
-                INSERT INTO boxes (numero_serie, client_id, modele, date_fabrication, wifi_ssid)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                box.numero_serie,
-                str(box.client_id),
-                box.modele,
-                box.date_fabrication,
-                box.wifi_ssid
-            ))
-        
-        # Abonnements
-        for abonnement in data_dict["abonnements"]:
-            cursor.execute("""
-                INSERT INTO abonnements (id, client_id, forfait_id, installation_id, 
-                                       date_debut, date_fin, duree_renouvellement)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                str(abonnement.id),
-                str(abonnement.client_id),
-                abonnement.forfait_id,
-                str(abonnement.installation_id),
-                abonnement.date_debut,
-                abonnement.date_fin,
-                abonnement.duree_renouvellement
-            ))
-        
-        # Paiements
-        for paiement in data_dict["paiements"]:
-            cursor.execute("""
-                INSERT INTO paiements (id, client_id, abonnement_id, montant, 
-                                     type_paiement, date_paiement)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                str(paiement.id),
-                str(paiement.client_id),
-                str(paiement.abonnement_id) if paiement.abonnement_id else None,
-                paiement.montant,
-                paiement.type_paiement,
-                paiement.date_paiement
-            ))
-        
-        # Feedback (corriger le client_id)
-        for fb in data_dict["feedback"]:
-            # Trouver le client_id à partir de l'installation
-            cursor.execute("""
-                SELECT s.client_id 
-                FROM installations i 
-                JOIN soumissions s ON i.soumission_id = s.id 
-                WHERE i.id = %s
-            """, (str(fb.installation_id),))
-            result = cursor.fetchone()
-            if result:
-                client_id = result[0]
-                
-                cursor.execute("""
-                    INSERT INTO feedback (id, client_id, installation_id, satisfaction_produit,
-                                        note_techniciens, commentaires, date_soumission)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    str(fb.id),
-                    str(client_id),
-                    str(fb.installation_id),
-                    fb.satisfaction_produit,
-                    fb.note_techniciens,
-                    fb.commentaires,
-                    fb.date_soumission
-                ))
-        
-        conn.commit()
-        logger.info("Données insérées avec succès dans la base de données")
+    rng = seed_stage(seed, stage)
+    result = func(rng)
+    store.save_stage(stage, result)
+    return result
+
+def generation_plan(store: CheckpointStore, seed: int, start_date: date, end_date: date, growth: Dict) -> GenerationPlan:
+    """
+    Plan de génération du run (calendrier et courbe de demande), calculé une fois puis relu
+
+    Le plan est une étape du point de reprise : une reprise retrouve la même
+    courbe de demande. Il est aussi écrit dans plan.json, à côté du manifeste.
+    """
+    plan = run_stage(store, seed, "plan", lambda rng: GenerationPlan(start_date, end_date, rng, growth))
+    store.save_report("plan", plan.to_dict())
+    logger.info(f"Plan de génération: {plan.n_months} mois, {int(plan.business_days.sum())} jours ouvrables, "
+                f"multiplicateurs {plan.multipliers.min():.2f} à {plan.multipliers.max():.2f}")
+    return plan
+
+def generate_data(
+    params: Dict,
+    forfaits: List[Dict],
+    seed: int,
+    store: CheckpointStore,
+    on_table: Optional[Callable[[str, List], None]] = None
+) -> Dict:
+    """
+    Enchaîne les étapes de génération, chacune sauvegardée dans le point de reprise du run
+
+    Si on_table est fourni, il est appelé avec chaque table dès qu'elle est
+    définitive, parents avant enfants, pour permettre son chargement pendant
+    la génération des étapes suivantes.
+    """
+    start_date = date.fromisoformat(params["start_date"])
+    end_date = generation_end_date(params)
+    sample_fraction = params.get("sample_fraction", 1.0)
+    profile = PROFILS_CHARGE[params.get("profile", "standard")]
+    coords, growth = region_settings(params.get("region"))
+    code = region_code(params.get("region"))
+    emit = on_table or (lambda table, records: None)
+    
+    plan = generation_plan(store, seed, start_date, end_date, growth)
+    agents = run_stage(store, seed, "agents", lambda rng: generate_agents(params["agents"], plan, rng, code))
+    emit("agents", agents)
+    techniciens = run_stage(store, seed, "techniciens", lambda rng: generate_techniciens(params["techniciens"], plan, rng, coords, code))
+    emit("techniciens", techniciens)
+    clients = run_stage(
+        store, seed, "clients",
+        lambda rng: generate_clients(params["clients"], agents, plan, rng, sample_fraction, profile, coords, code)
+    )
+    boxes, updated_clients = run_stage(
+        store, seed, "boxes", lambda rng: generate_boxes(clients, code)  # Génère les boxes et met à jour les clients
+    )
+    emit("clients", updated_clients)  # Utiliser les clients mis à jour avec box_id
+    emit("boxes", boxes)
+    soumissions = run_stage(
+        store, seed, "soumissions",
+        lambda rng: generate_soumissions(clients, rng, end_date, profile.get("proba_soumission_repetee", 0.0))
+    )
+    emit("soumissions", soumissions)
+    
+    # Créer un mapping client_id -> soumission initiale (la première du client) pour les abonnements
+    client_soumissions = {}
+    for s in soumissions:
+        client_soumissions.setdefault(s.client_id, s)
         
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Erreur lors de l'insertion des données: {str(e)}")
-        raise
-    finally:
-        cursor.close()
+    installations, installation_techniciens = run_stage(
+        store, seed, "installations", lambda rng: generate_installations(
+            soumissions, techniciens, clients,
+            params.get("capacite_technicien", DEFAULT_PARAMS["capacite_technicien"]),
+            sample_fraction
+        )
+    )
+    emit("installations", installations)
+    emit("installation_techniciens", installation_techniciens)
+    
+    # Réinstallations réalisées (soumissions répétées) de chaque client, par date
+    reinstallations = defaultdict(list)
+    if len(soumissions) > len(clients):
+        initial_ids = {s.id for s in client_soumissions.values()}
+        soumission_clients = {s.id: s.client_id for s in soumissions}
+        for inst in installations:
+            if inst.soumission_id not in initial_ids and inst.date_realisation:
+                reinstallations[soumission_clients[inst.soumission_id]].append((inst.date_realisation, inst))
+        for later in reinstallations.values():
+            later.sort(key=lambda r: r[0])
+    
+    abonnements = run_stage(
+        store, seed, "abonnements",
+        lambda rng: generate_abonnements(
+            updated_clients, installations, forfaits, client_soumissions, rng, end_date,
+            profile.get("abonnements"), reinstallations
+        )
+    )
+    emit("abonnements", abonnements)
+    paiements = run_stage(store, seed, "paiements", lambda rng: generate_paiements(updated_clients, abonnements, forfaits))
+    emit("paiements", paiements)
+    feedback = run_stage(store, seed, "feedback", lambda rng: generate_feedback(installations, soumissions))
+    emit("feedback", feedback)
+    
+    return {
+        "agents": agents,
+        "techniciens": techniciens,
+        "clients": updated_clients,
+        "soumissions": soumissions,
+        "installations": installations,
+        "installation_techniciens": installation_techniciens,
+        "boxes": boxes,
+        "abonnements": abonnements,
+        "paiements": paiements,
+        "feedback": feedback
+    }
+
+def generate_data_server_side(
+    params: Dict,
+    forfaits: List[Dict],
+    seed: int,
+    store: CheckpointStore,
+    sink: PostgresSink
+) -> Tuple[Dict, Dict[str, int]]:
+    """
+    Génère les agents, techniciens et clients en Python, puis les tables dérivées dans PostgreSQL
+
+    Les soumissions, installations, techniciens assignés, boxes et feedbacks sont
+    produits par des requêtes INSERT ... SELECT ; seules les tables nécessaires
+    aux abonnements et paiements (générés en Python) sont relues.
+
+    Returns:
+        Tuple[Dict, Dict[str, int]]: Données disponibles côté Python et nombre de lignes générées dans la base
+    """
+    start_date = date.fromisoformat(params["start_date"])
+    end_date = generation_end_date(params)
+    sample_fraction = params.get("sample_fraction", 1.0)
+    profile = PROFILS_CHARGE[params.get("profile", "standard")]
+    coords, growth = region_settings(params.get("region"))
+    code = region_code(params.get("region"))
+    
+    plan = generation_plan(store, seed, start_date, end_date, growth)
+    agents = run_stage(store, seed, "agents", lambda rng: generate_agents(params["agents"], plan, rng, code))
+    techniciens = run_stage(store, seed, "techniciens", lambda rng: generate_techniciens(params["techniciens"], plan, rng, coords, code))
+    clients = run_stage(
+        store, seed, "clients",
+        lambda rng: generate_clients(params["clients"], agents, plan, rng, sample_fraction, profile, coords, code)
+    )
+    sink.write({"agents": agents, "techniciens": techniciens, "clients": clients})
+    
+    # Commentaires de feedback tirés au hasard dans la base
+    commentaires = run_stage(
+        store, seed, "commentaires",
+        lambda rng: [Faker('fr_FR').text(max_nb_chars=200) for _ in range(NB_COMMENTAIRES)]
+    )
+    counts = generate_derived_tables(sink.conn, seed, commentaires, code)
+    updated_clients, soumissions, installations = read_derived_tables(sink.conn, [c.id for c in clients])
+    
+    client_soumissions = {s.client_id: s for s in soumissions}
+    abonnements = run_stage(
+        store, seed, "abonnements",
+        lambda rng: generate_abonnements(
+            updated_clients, installations, forfaits, client_soumissions, rng, end_date, profile.get("abonnements")
+        )
+    )
+    paiements = run_stage(store, seed, "paiements", lambda rng: generate_paiements(updated_clients, abonnements, forfaits))
+    sink.write({"abonnements": abonnements, "paiements": paiements})
+    
+    data = {
+        "agents": agents,
+        "techniciens": techniciens,
+        "clients": updated_clients,
+        "soumissions": soumissions,
+        "installations": installations,
+        "abonnements": abonnements,
+        "paiements": paiements
+    }
+    return data, counts
+
+def region_command(region: str, params: Dict, seed: int, run_id: str, chunk_size: int, args: argparse.Namespace) -> List[str]:
+    """Ligne de commande de la génération d'une région (reprise de son run s'il existe déjà), sans le mot de passe"""
+    command = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--checkpoint-dir", args.checkpoint_dir,
+        "--output", args.output,
+        "--output-dir", args.output_dir,
+        "--loader-workers", str(args.loader_workers),
+        "--db-host", args.db_host,
+        "--db-port", str(args.db_port),
+        "--db-name", args.db_name,
+        "--db-user", args.db_user
+    ]
+    if CheckpointStore(run_id, args.checkpoint_dir).exists():
+        command += ["--resume", run_id]
+    else:
+        command += [
+            "--region", region,
+            "--region-scale", str(params["region_scale"]),
+            "--run-id", run_id,
+            "--seed", str(region_seed(seed, region)),
+            "--chunk-size", str(chunk_size),
+            "--start-date", params["start_date"],
+            "--end-date", params["end_date"],
+            "--sample-fraction", str(params["sample_fraction"]),
+            "--profile", params["profile"],
+            "--capacite-technicien", str(params["capacite_technicien"])
+        ]
+    if args.pipeline:
+        command.append("--pipeline")
+    if args.server_side:
+        command.append("--server-side")
+    return command
+
+def generate_regions(params: Dict, seed: int, store: CheckpointStore, chunk_size: int, args: argparse.Namespace, db_config: Dict) -> None:
+    """
+    Génère chaque région dans son propre processus (generate.py --region), en parallèle
 
-def get_forfaits_from_db(conn) -> List[Dict]:
-    """Récupère les forfaits depuis la base de données"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, prix_mensuel FROM forfaits")
-    forfaits = [{"id": row[0], "prix_mensuel": row[1]} for row in cursor.fetchall()]
-    cursor.close()
-    return forfaits
+    Chaque région a son run (<run>-<région>), sa graine dérivée de celle du run et,
+    dans PostgreSQL, son schéma region_<nom> chargé par ses propres connexions :
+    les régions ne partagent ni table, ni index, ni verrou. Les vues du schéma
+    REGIONS_SCHEMA réunissent ensuite toutes les régions de la base pour les marts.
+    Une reprise relance chaque région depuis son propre point de reprise.
+    """
+    regions = params["regions"]
+    runs = {region: f"{store.run_id}-{region}" for region in regions}
+    if args.output == "postgres":
+        conn = psycopg2.connect(**db_config)
+        try:
+            for region in regions:
+                ensure_region_schema(conn, region)
+        finally:
+            conn.close()
+    else:
+        # Forfaits communs à toutes les régions, écrits une seule fois
+        FileSink(args.output_dir, args.output).write_forfaits()
+    
+    workers = args.region_workers or len(regions)
+    commands = {region: region_command(region, params, seed, runs[region], chunk_size, args) for region in regions}
+    logger.info(f"Génération de {len(regions)} régions, {workers} en parallèle")
+    start = time.perf_counter()
+    # Mot de passe transmis par l'environnement (PGPASSWORD), absent des lignes de commande visibles par ps
+    results = run_regions(commands, workers, env={**os.environ, "PGPASSWORD": args.db_password})
+    elapsed = time.perf_counter() - start
+    failed = [region for region, (code, _) in results.items() if code != 0]
+    if failed:
+        raise RuntimeError(f"Échec de la génération des régions: {', '.join(failed)}")
+    
+    total = 0
+    for region, (_, duration) in results.items():
+        rows = sum(CheckpointStore(runs[region], args.checkpoint_dir).load_stage("lignes").values())
+        total += rows
+        logger.info(f"- {region}: {rows} lignes en {duration:.1f} s ({rows / duration:.0f} lignes/s)")
+    logger.info(f"Régions générées: {total} lignes en {elapsed:.1f} s ({total / elapsed:.0f} lignes/s)")
+    
+    if args.output == "postgres":
+        conn = psycopg2.connect(**db_config)
+        try:
+            schemas = create_region_views(conn)
+        finally:
+            conn.close()
+        logger.info(f"Vues {REGIONS_SCHEMA}.* sur {len(schemas)} régions ({', '.join(schemas)}), "
+                    f"marts : dbt run --vars '{{source_schema: {REGIONS_SCHEMA}}}'")
+    logger.info(f"Contrôle des marts : python kpi_check.py --run-id {' '.join(runs.values())}")
 
 def main():
     parser = argparse.ArgumentParser(description='Générateur de données pour Canalbox')
@@ -789,13 +866,81 @@ def main():
                         help='Nombre de clients à générer')
     parser.add_argument('--start-date', type=str, default=DEFAULT_PARAMS["start_date"], 
                         help='Date de début pour la génération (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, default=date.today().isoformat(),
+                        help='Date de fin pour la génération (YYYY-MM-DD, aujourd\'hui par défaut)')
+    parser.add_argument('--sample-fraction', type=float, default=1.0,
+                        help='Fraction des clients générée (0 < f <= 1), échantillonnée par date sur la population complète')
+    parser.add_argument('--profile', choices=list(PROFILS_CHARGE), default='standard',
+                        help='Profil de charge : agents très sollicités, chaînes de renouvellement longues, '
+                             'réinstallations, rafales d\'inscriptions ou tout à la fois (stress)')
+    regions = parser.add_mutually_exclusive_group()
+    regions.add_argument('--regions', nargs='+', choices=list(REGIONS), default=None,
+                         help='Génère ces régions en parallèle, chacune dans son processus et son schéma region_<nom> '
+                              '(effectifs de REGIONS, --agents / --techniciens / --clients ignorés)')
+    regions.add_argument('--region', choices=list(REGIONS), default=None,
+                         help='Génère une seule région dans son schéma region_<nom> (ou sous region=<nom> en fichiers)')
+    parser.add_argument('--region-scale', type=float, default=1.0,
+                        help='Facteur appliqué aux effectifs (agents, techniciens, clients) de chaque région')
+    parser.add_argument('--region-workers', type=int, default=None,
+                        help='Régions générées en parallèle (toutes par défaut)')
+    parser.add_argument('--capacite-technicien', type=int, default=DEFAULT_PARAMS["capacite_technicien"],
+                        help='Nombre maximum d\'installations par technicien et par jour')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Graine aléatoire du run (tirée au hasard par défaut)')
+    parser.add_argument('--run-id', type=str, default=None,
+                        help='Identifiant du run (généré par défaut)')
+    parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID',
+                        help='Reprend un run interrompu : relit ses étapes terminées et ne charge que les lots manquants')
+    parser.add_argument('--checkpoint-dir', type=str, default=DEFAULT_PARAMS["checkpoint_dir"],
+                        help='Répertoire des points de reprise')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_PARAMS["chunk_size"],
+                        help='Nombre de lignes par lot validé lors du chargement')
+    parser.add_argument('--output', choices=['postgres', 'parquet', 'csv'], default='postgres',
+                        help='Destination : base PostgreSQL, ou fichiers Parquet / CSV compressés partitionnés par mois')
+    parser.add_argument('--output-dir', type=str, default=DEFAULT_PARAMS["output_dir"],
+                        help='Répertoire des fichiers générés (--output parquet ou csv)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Charge chaque table dans PostgreSQL pendant la génération des suivantes')
+    parser.add_argument('--loader-workers', type=int, default=DEFAULT_PARAMS["loader_workers"],
+                        help='Nombre de processus de chargement en mode --pipeline (une connexion PostgreSQL chacun)')
+    parser.add_argument('--server-side', action='store_true',
+                        help='Génère soumissions, installations, boxes et feedbacks dans PostgreSQL (INSERT ... SELECT)')
+    parser.add_argument('--snapshot-cache', action='store_true',
+                        help='Restaure le jeu de données depuis le cache d\'instantanés s\'il a déjà été généré, sinon l\'y enregistre')
+    parser.add_argument('--snapshot-dir', type=str, default=DEFAULT_PARAMS["snapshot_dir"],
+                        help='Répertoire du cache d\'instantanés')
+    parser.add_argument('--snapshot-max-size', type=float, default=DEFAULT_PARAMS["snapshot_max_gb"],
+                        help='Taille maximale du cache d\'instantanés en Go (les moins récemment utilisés sont supprimés)')
+    parser.add_argument('--restore-workers', type=int, default=DEFAULT_PARAMS["restore_workers"],
+                        help='Connexions utilisées en parallèle pour enregistrer ou restaurer un instantané')
+    parser.add_argument('--kpi-report', type=str, default=None,
+                        help='Écrit les indicateurs des marts calculés en mémoire (JSON, voir kpi_check.py)')
     parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
     parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
     parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
     parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
-    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+    parser.add_argument('--db-password', type=str, default=os.environ.get("PGPASSWORD", DB_CONFIG["password"]),
+                        help='Mot de passe de la base de données (PGPASSWORD par défaut, sinon celui de DB_CONFIG)')
     
     args = parser.parse_args()
+    if (args.pipeline or args.server_side) and args.output != "postgres":
+        parser.error("--pipeline et --server-side ne sont disponibles qu'avec --output postgres")
+    if args.pipeline and args.server_side:
+        parser.error("--pipeline et --server-side sont incompatibles")
+    if args.snapshot_cache and (args.output != "postgres" or args.resume):
+        parser.error("--snapshot-cache n'est disponible qu'avec --output postgres, hors --resume")
+    if args.server_side and PROFILS_CHARGE[args.profile].get("proba_soumission_repetee"):
+        parser.error(f"Le profil {args.profile} (soumissions répétées) n'est pas disponible avec --server-side")
+    if not 0 < args.sample_fraction <= 1:
+        parser.error("--sample-fraction doit être dans ]0, 1]")
+    if (args.regions or args.region) and args.snapshot_cache:
+        parser.error("--snapshot-cache n'est pas disponible avec --regions / --region")
+    if args.regions and args.kpi_report:
+        parser.error("--kpi-report n'est pas disponible avec --regions : kpi_check.py --run-id accepte les runs de toutes les régions")
+    if args.region_scale <= 0:
+        parser.error("--region-scale doit être positif")
+    if args.snapshot_cache and args.seed is None:
+        parser.error("--snapshot-cache nécessite --seed : une graine tirée au hasard ne retrouve jamais d'instantané")
     
     # Configuration de la connexion
     db_config = {
@@ -806,56 +951,155 @@ def main():
         "password": args.db_password
     }
     
-    start_date = date.fromisoformat(args.start_date)
+    # Point de reprise du run : les paramètres et la graine d'un run repris sont ceux de son manifeste
+    if args.resume:
+        store = CheckpointStore(args.resume, args.checkpoint_dir)
+        manifest = store.load_manifest()
+        seed = manifest["seed"]
+        params = manifest["params"]
+        chunk_size = manifest["chunk_size"]  # Les numéros de lot dépendent de la taille des lots
+        logger.info(f"Reprise du run {args.resume}")
+    else:
+        store = CheckpointStore(args.run_id or new_run_id(), args.checkpoint_dir)
+        if store.exists():
+            parser.error(f"Le run {store.run_id} existe déjà, utilisez --resume {store.run_id}")
+        seed = args.seed if args.seed is not None else random.SystemRandom().randrange(2 ** 32)
+        params = {
+            "agents": args.agents,
+            "techniciens": args.techniciens,
+            "clients": args.clients,
+            "start_date": args.start_date,
+            "end_date": args.end_date,
+            "capacite_technicien": args.capacite_technicien,
+            "sample_fraction": args.sample_fraction,
+            "profile": args.profile
+        }
+        # Effectifs fixés par chaque région (REGIONS), à l'échelle --region-scale
+        if args.regions:
+            for name in ("agents", "techniciens", "clients"):
+                del params[name]
+            params.update({"regions": args.regions, "region_scale": args.region_scale})
+        elif args.region:
+            params.update(region_counts(args.region, args.region_scale))
+            params["region"] = args.region
+        chunk_size = args.chunk_size
+    
+    # Run multi-régions : chaque région est un run de generate.py --region
+    if params.get("regions"):
+        if not args.resume:
+            store.create(seed, params, chunk_size)
+        logger.info(f"Run multi-régions {store.run_id} (graine {seed}): {', '.join(params['regions'])}")
+        try:
+            generate_regions(params, seed, store, chunk_size, args, db_config)
+        except Exception as e:
+            logger.exception(f"Erreur lors de la génération des régions: {str(e)}")
+            logger.error(f"Reprendre avec : python generate.py --resume {store.run_id}")
+            raise
+        return
+    
+    # Région : journal marqué du nom de la région, tables dans son schéma (ou sous region=<nom>)
+    region = params.get("region")
+    if region:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(logging.Formatter(f'%(asctime)s - %(name)s [{region}] - %(levelname)s - %(message)s'))
+        if args.output == "postgres":
+            db_config = region_db_config(db_config, region)
+            conn = psycopg2.connect(**db_config)
+            try:
+                ensure_region_schema(conn, region)
+            finally:
+                conn.close()
+    
+    # Cache d'instantanés : un jeu de données déjà généré avec les mêmes paramètres est restauré
+    snapshots, snapshot, save_snapshot = None, None, False
+    if args.snapshot_cache:
+        snapshots = SnapshotCache(args.snapshot_dir, int(args.snapshot_max_size * 1e9))
+        snapshot = snapshot_key(params, seed, args.server_side)
+        if snapshots.exists(snapshot):
+            logger.info(f"Instantané {snapshot[:12]} trouvé dans {args.snapshot_dir}, restauration...")
+            start = time.perf_counter()
+            counts = snapshots.restore(snapshot, db_config, args.restore_workers)
+            conn = psycopg2.connect(**db_config)
+            try:
+                write_sampling(conn, params.get("sample_fraction", 1.0))
+            finally:
+                conn.close()
+            logger.info(f"Restauration terminée en {time.perf_counter() - start:.1f} s: "
+                        + ", ".join(f"{table}={n}" for table, n in counts.items()))
+            return
+        # L'instantané est lu dans la base : elle ne doit contenir que les données de ce run
+        conn = psycopg2.connect(**db_config)
+        try:
+            save_snapshot = tables_are_empty(conn)
+        finally:
+            conn.close()
+        if not save_snapshot:
+            logger.warning("Tables déjà peuplées : le jeu de données généré ne sera pas enregistré dans le cache")
+    
+    if not args.resume:
+        store.create(seed, params, chunk_size)
     
     logger.info(f"Démarrage de la génération de données avec les paramètres :")
-    logger.info(f"- Agents: {args.agents}")
-    logger.info(f"- Techniciens: {args.techniciens}")
-    logger.info(f"- Clients: {args.clients}")
-    logger.info(f"- Date de début: {start_date}")
+    logger.info(f"- Run: {store.run_id} (graine {seed})")
+    if region:
+        logger.info(f"- Région: {region}")
+    logger.info(f"- Agents: {params['agents']}")
+    logger.info(f"- Techniciens: {params['techniciens']}")
+    logger.info(f"- Clients: {params['clients']}")
+    if params.get("sample_fraction", 1.0) < 1:
+        logger.info(f"- Échantillon: {params['sample_fraction']:.1%} des clients (poids {1 / params['sample_fraction']:g})")
+    if params.get("profile", "standard") != "standard":
+        logger.info(f"- Profil de charge: {params['profile']} {PROFILS_CHARGE[params['profile']]}")
+    logger.info(f"- Date de début: {params['start_date']}")
+    logger.info(f"- Date de fin: {generation_end_date(params)}")
+    logger.info(f"- Capacité par technicien: {params.get('capacite_technicien', DEFAULT_PARAMS['capacite_technicien'])} installations/jour")
     
     try:
-        # Connexion à la base de données
-        conn = psycopg2.connect(**db_config)
+        # Destination : base de données ou fichiers (forfaits définis localement)
+        sink: OutputSink
+        if args.pipeline:
+            sink = PipelinedPostgresSink(db_config, store, chunk_size, args.loader_workers)
+        elif args.output == "postgres":
+            sink = PostgresSink(psycopg2.connect(**db_config), store, chunk_size)
+        else:
+            sink = FileSink(args.output_dir, args.output, region=region)
         
-        # Récupérer les forfaits depuis la base
-        forfaits = get_forfaits_from_db(conn)
+        forfaits = sink.get_forfaits()
         logger.info(f"Forfaits récupérés: {len(forfaits)}")
         
         # Génération des données
-        agents = generate_agents(args.agents, start_date)
-        techniciens = generate_techniciens(args.techniciens, start_date)
-        clients = generate_clients(args.clients, agents, start_date)
-        soumissions = generate_soumissions(clients)
-        
-        # Créer un mapping client_id -> soumission pour l'utiliser dans les abonnements
-        client_soumissions = {}
-        for s in soumissions:
-            client_soumissions[s.client_id] = s
-            
-        installations, installation_techniciens = generate_installations(soumissions, techniciens)
-        boxes, updated_clients = generate_boxes(clients)  # Génère les boxes et met à jour les clients
-        abonnements = generate_abonnements(updated_clients, installations, forfaits, client_soumissions)
-        paiements = generate_paiements(updated_clients, abonnements, forfaits)
-        feedback = generate_feedback(installations)
+        server_counts = {}
+        if args.server_side:
+            logger.info("Tables dérivées des clients générées dans la base (INSERT ... SELECT)")
+            data, server_counts = generate_data_server_side(params, forfaits, seed, store, sink)
+        elif args.pipeline:
+            logger.info(f"Chargement en parallèle de la génération ({args.loader_workers} processus)")
+            data = generate_data(params, forfaits, seed, store, on_table=sink.write_table)
+        else:
+            data = generate_data(params, forfaits, seed, store)
+        agents = data["agents"]
+        techniciens = data["techniciens"]
+        clients = data["clients"]
+        installations = data["installations"]
+        abonnements = data["abonnements"]
+        paiements = data["paiements"]
         
-        # Préparation des données
-        data = {
-            "agents": agents,
-            "techniciens": techniciens,
-            "clients": updated_clients,  # Utiliser les clients mis à jour avec box_id
-            "soumissions": soumissions,
-            "installations": installations,
-            "installation_techniciens": installation_techniciens,
-            "boxes": boxes,
-            "abonnements": abonnements,
-            "paiements": paiements,
-            "feedback": feedback
-        }
+        # Écriture des données
+        if args.pipeline:
+            sink.finish()
+        elif not args.server_side:
+            logger.info(f"Écriture des données ({args.output})...")
+            sink.write(data)
+        if isinstance(sink, PostgresSink):
+            sink.compact_rollups()
+        sink.write_sampling(params.get("sample_fraction", 1.0))
         
-        # Insertion dans la base
-        logger.info("Insertion des données dans la base de données...")
-        insert_data_to_db(conn, data)
+        # Nombre de lignes par table (tables générées dans la base : lignes insérées)
+        counts = {table: len(records) for table, records in data.items()}
+        counts.update(server_counts)
+        if region:
+            # Relu par le run multi-régions pour mesurer le débit de chaque région
+            store.save_stage("lignes", counts)
         
         # Statistiques
         logger.info(f"Statistiques de génération :")
@@ -866,8 +1110,8 @@ def main():
         logger.info(f"- Abonnements initiaux: {sum(1 for a in abonnements if a.duree_renouvellement == 1)}")
         logger.info(f"- Renouvellements: {len(abonnements) - sum(1 for a in abonnements if a.duree_renouvellement == 1)}")
         logger.info(f"- Paiements générés: {len(paiements)}")
-        logger.info(f"- Feedbacks générés: {len(feedback)}")
-        logger.info(f"- Boxes générées: {len(boxes)}")
+        logger.info(f"- Feedbacks générés: {counts['feedback']}")
+        logger.info(f"- Boxes générées: {counts['boxes']}")
         
         # Vérification des dates
         if clients:
@@ -885,11 +1129,27 @@ def main():
             for month, count in sorted(monthly_counts.items()):
                 logger.info(f"  {month}: {count} clients")
         
-        conn.close()
+        # Indicateurs des marts recalculés en mémoire, pour contrôler les marts construits ensuite
+        if args.kpi_report:
+            start = time.perf_counter()
+            kpis = compute_kpis(data, forfaits)
+            with open(args.kpi_report, "w", encoding="utf-8") as f:
+                json.dump(kpis, f, indent=2, default=str)
+            logger.info(f"Indicateurs calculés en {time.perf_counter() - start:.1f} s, écrits dans {args.kpi_report}")
+        
+        sink.close()
         logger.info("Génération terminée avec succès !")
         
+        if save_snapshot:
+            snapshots.save(
+                snapshot, db_config,
+                {"run_id": store.run_id, "seed": seed, "params": params, "server_side": args.server_side},
+                args.restore_workers
+            )
+        
     except Exception as e:
         logger.exception(f"Erreur lors de la génération des données: {str(e)}")
+        logger.error(f"Reprendre avec : python generate.py --resume {store.run_id}")
         raise
 
 if __name__ == "__main__":
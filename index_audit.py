@@ -0,0 +1,141 @@
+"""
+Audit des index de init.sql : index inutilisés, redondants ou coûteux à l'écriture
+
+1. Rejoue les requêtes de test.sql et des marts (query_bench) et relève les parcours
+   de chaque index (pg_stat_user_indexes) ainsi que les index retenus par les plans.
+2. Lance une charge d'écriture (generate.py, simulate.py) et relève les blocs
+   d'index accédés (pg_statio_user_indexes) : le coût de maintenance de chaque index.
+Usage: python index_audit.py --duration 60 --load-command "python simulate.py --rate 50 --duration 60"
+"""
+
+import argparse
+import json
+import logging
+import shlex
+import subprocess
+import sys
+
+import psycopg2
+
+from config.settings import BENCH_PARAMS, DB_CONFIG
+from utils.bench import QueryBench, load_mart_queries, load_test_queries
+from utils.index_audit import (
+    audit, catalog_indexes, counters_delta, declared_indexes, index_counters, plan_index_usage,
+    wait_for_stats_flush
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("index_audit")
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit des index de la base Canalbox')
+    parser.add_argument('--clients', type=int, default=BENCH_PARAMS["clients"],
+                        help='Clients concurrents de la charge de lecture')
+    parser.add_argument('--duration', type=float, default=BENCH_PARAMS["duree_secondes"],
+                        help='Durée de la charge de lecture (secondes, 0 : plans seulement)')
+    parser.add_argument('--queries', nargs='+', choices=['test', 'marts'], default=['test', 'marts'],
+                        help='Requêtes de la charge de lecture')
+    parser.add_argument('--target-schema', type=str, default='public',
+                        help='Schéma cible dbt : les marts lisent <schéma>_raw / <schéma>_staging')
+    parser.add_argument('--load-command', type=str, default=None,
+                        help='Charge d\'écriture mesurée jusqu\'à sa fin (ex. "python generate.py --clients 5000")')
+    parser.add_argument('--costly-ratio', type=float, default=100.0,
+                        help='Blocs d\'index écrits par parcours en lecture au-delà desquels un index est coûteux')
+    parser.add_argument('--report', type=str, default=None, help='Écrit le rapport JSON dans ce fichier')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Écrit les DROP INDEX proposés dans ce script SQL (journalisés seulement par défaut)')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+
+    args = parser.parse_args()
+    db_config = {
+        "host": args.db_host,
+        "port": args.db_port,
+        "dbname": args.db_name,
+        "user": args.db_user,
+        "password": args.db_password
+    }
+
+    queries = {}
+    if 'test' in args.queries:
+        queries.update(load_test_queries())
+    if 'marts' in args.queries:
+        queries.update(load_mart_queries(args.target_schema))
+
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    try:
+        declared = declared_indexes()
+        indexes = catalog_indexes(conn)
+
+        # Charge de lecture : parcours d'index et index retenus par les plans
+        read_delta = {}
+        if args.duration > 0:
+            before = index_counters(conn)
+            report = QueryBench(db_config, queries, {name: 1.0 for name in queries}, args.clients).run(args.duration)
+            logger.info(f"Charge de lecture: {report['requetes']} requêtes ({report['requetes_par_s']:.1f}/s)")
+            wait_for_stats_flush()
+            read_delta = counters_delta(before, index_counters(conn))
+        conn.autocommit = False
+        plan_usage = plan_index_usage(conn, queries)
+        conn.autocommit = True
+
+        # Charge d'écriture : blocs d'index accédés pour maintenir chaque index
+        write_delta = {}
+        if args.load_command:
+            logger.info(f"Charge d'écriture: {args.load_command}")
+            before = index_counters(conn)
+            result = subprocess.run(shlex.split(args.load_command))
+            if result.returncode != 0:
+                logger.warning(f"La charge d'écriture s'est terminée avec le code {result.returncode}")
+            wait_for_stats_flush()
+            write_delta = counters_delta(before, index_counters(conn))
+    finally:
+        conn.close()
+
+    findings = audit(declared, indexes, read_delta, plan_usage, write_delta, args.costly_ratio)
+    for f in findings:
+        part = f" ({f['part_ecriture']:.1%} des blocs écrits)" if f["part_ecriture"] is not None else ""
+        details = [
+            f"{f['taille'] // 1024} kB",
+            f"{f['parcours_lecture']} parcours",
+            f"{len(f['requetes'])} plans",
+            f"{f['blocs_ecriture']} blocs en écriture{part}"
+        ]
+        if f["contrainte"]:
+            details.append(f["contrainte"])
+        if f["cle_etrangere"]:
+            details.append("clé étrangère")
+        if f["couvert_par"]:
+            details.append(f"couvert par {f['couvert_par']}")
+        level = logging.WARNING if f["constats"] else logging.INFO
+        logger.log(level, f"{f['index']} ({f['table']}: {', '.join(f['colonnes'] or [])}) - "
+                          f"{', '.join(details)} - {', '.join(f['constats']) or 'ok'}")
+
+    to_drop = [f for f in findings if f["suppression_proposee"]]
+    drops = [f"DROP INDEX IF EXISTS {f['index']};  -- {', '.join(f['constats'])}" for f in to_drop]
+    if to_drop:
+        logger.info(f"{len(to_drop)} index à supprimer ({sum(f['taille'] for f in to_drop) // 1024} kB):")
+        for statement in drops:
+            logger.info(statement)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(f"{statement}\n" for statement in drops)
+        logger.info(f"{len(drops)} DROP INDEX écrits dans {args.output}")
+    for f in findings:
+        if "non_cree" in f["constats"] or "predicat_non_immuable" in f["constats"]:
+            logger.warning(f"{f['index']}: prédicat non immuable, index refusé ou figé à sa création - "
+                           f"filtrer les dates dans les requêtes (idx_{f['table']}_dates) plutôt que dans l'index")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(findings, f, indent=2, ensure_ascii=False)
+
+    if any(f["constats"] for f in findings):
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ CREATE TABLE techniciens (
     nom VARCHAR(255) NOT NULL,
     email VARCHAR(255) NOT NULL UNIQUE,
     telephone VARCHAR(50) NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL, -- Zone d'intervention
+    longitude DOUBLE PRECISION NOT NULL,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -117,6 +119,236 @@ CREATE TABLE feedback (
 
 
 
+-- Fonctions calendaires (jours ouvrables : lundi à vendredi), identiques à utils/date_utils.py
+-- Numéro du dernier jour ouvrable <= d (jours ouvrables consécutifs = entiers consécutifs)
+CREATE FUNCTION business_day_number(d DATE) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT ((d - (EXTRACT(ISODOW FROM d)::INTEGER - 1) - DATE '2001-01-01') / 7) * 5
+           + LEAST(EXTRACT(ISODOW FROM d)::INTEGER - 1, 4) + 1
+$$;
+
+-- Jour ouvrable portant le numéro n
+CREATE FUNCTION business_day_from_number(n INTEGER) RETURNS DATE
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT DATE '2001-01-01' + FLOOR((n - 1) / 5.0)::INTEGER * 7 + ((n - 1) - FLOOR((n - 1) / 5.0)::INTEGER * 5)
+$$;
+
+-- Ajoute (ou soustrait si n < 0) n jours ouvrables à une date
+CREATE FUNCTION add_business_days(d DATE, n INTEGER) RETURNS DATE
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN n = 0 THEN d
+        -- En reculant depuis un week-end, le vendredi précédent compte comme premier jour
+        WHEN n < 0 AND EXTRACT(ISODOW FROM d) > 5 THEN business_day_from_number(business_day_number(d) + n + 1)
+        ELSE business_day_from_number(business_day_number(d) + n)
+    END
+$$;
+
+-- Nombre de jours ouvrables entre deux dates (bornes incluses, dans un ordre quelconque)
+CREATE FUNCTION business_days_between(d1 DATE, d2 DATE) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT business_day_number(GREATEST(d1, d2)) - business_day_number(LEAST(d1, d2))
+           + CASE WHEN EXTRACT(ISODOW FROM LEAST(d1, d2)) <= 5 THEN 1 ELSE 0 END
+$$;
+
+
+
+-- Fraction de la population générée (generate.py --sample-fraction) : une seule ligne,
+-- les marts multiplient leurs totaux par poids (1 / fraction) pour les extrapoler
+CREATE TABLE echantillonnage (
+    fraction NUMERIC NOT NULL CHECK (fraction > 0 AND fraction <= 1),
+    poids NUMERIC NOT NULL
+);
+INSERT INTO echantillonnage (fraction, poids) VALUES (1, 1);
+
+-- Agrégats mensuels des paiements, tenus à jour par triggers (lus par les marts finance)
+-- Clé : mois x type de paiement x forfait (0 : paiement sans abonnement) ; un paiement est réussi si montant > 0
+-- Chaque instruction d'insertion ajoute ses propres lignes (aucun verrou partagé entre écritures concurrentes),
+-- les lectures additionnent les lignes de la clé et compacter_paiements_mensuels() les fusionne
+CREATE TABLE paiements_mensuels (
+    mois DATE NOT NULL,
+    type_paiement VARCHAR(50) NOT NULL,
+    forfait_id INTEGER NOT NULL,
+    nb_paiements BIGINT NOT NULL,
+    nb_reussis BIGINT NOT NULL,
+    montant_total BIGINT NOT NULL,
+    montant_reussi BIGINT NOT NULL,
+    nb_payeurs BIGINT NOT NULL, -- Clients distincts ayant un paiement réussi
+    nb_abonnements_payes BIGINT NOT NULL -- Paiements réussis rattachés à un abonnement
+);
+CREATE INDEX idx_paiements_mensuels_cle ON paiements_mensuels(mois, type_paiement, forfait_id);
+
+-- Payeurs de chaque clé, pour compter les clients distincts sans relire les paiements
+-- (clients distincts du mois : parcours de l'index sur le préfixe (mois, client_id))
+CREATE TABLE paiements_payeurs_mensuels (
+    mois DATE NOT NULL,
+    client_id UUID NOT NULL,
+    type_paiement VARCHAR(50) NOT NULL,
+    forfait_id INTEGER NOT NULL,
+    PRIMARY KEY (mois, client_id, type_paiement, forfait_id)
+);
+
+-- Recalcule les agrégats des mois donnés (tous si NULL) à partir des paiements
+-- Sert au chargement initial d'un historique (triggers désactivés) et aux mises à jour / suppressions
+CREATE FUNCTION rafraichir_paiements_mensuels(mois_cibles DATE[] DEFAULT NULL) RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    nb_lignes INTEGER;
+BEGIN
+    IF mois_cibles IS NULL THEN
+        DELETE FROM paiements_payeurs_mensuels;
+        DELETE FROM paiements_mensuels;
+        SELECT array_agg(m::DATE) INTO mois_cibles
+        FROM generate_series(
+            (SELECT date_trunc('month', MIN(date_paiement)) FROM paiements),
+            (SELECT MAX(date_paiement) FROM paiements),
+            INTERVAL '1 month'
+        ) m;
+    ELSE
+        DELETE FROM paiements_payeurs_mensuels WHERE mois = ANY(mois_cibles);
+        DELETE FROM paiements_mensuels WHERE mois = ANY(mois_cibles);
+    END IF;
+
+    -- Lecture des paiements mois par mois (index idx_paiements_date)
+    WITH lignes AS (
+        SELECT m.mois, p.type_paiement, COALESCE(a.forfait_id, 0) AS forfait_id, p.client_id, p.abonnement_id, p.montant
+        FROM unnest(mois_cibles) AS m(mois)
+        JOIN paiements p ON p.date_paiement >= m.mois AND p.date_paiement < (m.mois + INTERVAL '1 month')::DATE
+        LEFT JOIN abonnements a ON a.id = p.abonnement_id
+    ),
+    payeurs AS (
+        INSERT INTO paiements_payeurs_mensuels (mois, client_id, type_paiement, forfait_id)
+        SELECT DISTINCT mois, client_id, type_paiement, forfait_id FROM lignes WHERE montant > 0
+    )
+    INSERT INTO paiements_mensuels
+    SELECT mois, type_paiement, forfait_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE montant > 0),
+           SUM(montant),
+           COALESCE(SUM(montant) FILTER (WHERE montant > 0), 0),
+           COUNT(DISTINCT client_id) FILTER (WHERE montant > 0),
+           COUNT(abonnement_id) FILTER (WHERE montant > 0)
+    FROM lignes
+    GROUP BY mois, type_paiement, forfait_id;
+    GET DIAGNOSTICS nb_lignes = ROW_COUNT;
+
+    RETURN nb_lignes;
+END
+$$;
+
+-- Ajoute les paiements insérés par une instruction (table de transition nouveaux) aux agrégats
+CREATE FUNCTION paiements_mensuels_ajout() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH lignes AS (
+        SELECT date_trunc('month', n.date_paiement)::DATE AS mois, n.type_paiement, COALESCE(a.forfait_id, 0) AS forfait_id,
+               n.client_id, n.abonnement_id, n.montant
+        FROM nouveaux n
+        LEFT JOIN abonnements a ON a.id = n.abonnement_id
+    ),
+    -- Payeurs absents de leur clé jusqu'ici (triés : les écritures concurrentes verrouillent dans le même ordre)
+    payeurs AS (
+        INSERT INTO paiements_payeurs_mensuels (mois, client_id, type_paiement, forfait_id)
+        SELECT DISTINCT mois, client_id, type_paiement, forfait_id FROM lignes WHERE montant > 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING
+        RETURNING mois, type_paiement, forfait_id
+    ),
+    nouveaux_payeurs AS (
+        SELECT mois, type_paiement, forfait_id, COUNT(*) AS nb FROM payeurs GROUP BY 1, 2, 3
+    ),
+    agregats AS (
+        SELECT mois, type_paiement, forfait_id,
+               COUNT(*) AS nb_paiements,
+               COUNT(*) FILTER (WHERE montant > 0) AS nb_reussis,
+               SUM(montant) AS montant_total,
+               COALESCE(SUM(montant) FILTER (WHERE montant > 0), 0) AS montant_reussi,
+               COUNT(abonnement_id) FILTER (WHERE montant > 0) AS nb_abonnements_payes
+        FROM lignes
+        GROUP BY 1, 2, 3
+    )
+    INSERT INTO paiements_mensuels
+    SELECT g.mois, g.type_paiement, g.forfait_id, g.nb_paiements, g.nb_reussis, g.montant_total, g.montant_reussi,
+           COALESCE(p.nb, 0), g.nb_abonnements_payes
+    FROM agregats g
+    LEFT JOIN nouveaux_payeurs p USING (mois, type_paiement, forfait_id);
+    RETURN NULL;
+END
+$$;
+
+-- Fusionne les lignes d'une même clé en une seule (lignes concurrentes non visibles conservées telles quelles)
+CREATE FUNCTION compacter_paiements_mensuels() RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    nb_lignes INTEGER;
+BEGIN
+    WITH cles AS (
+        SELECT mois, type_paiement, forfait_id
+        FROM paiements_mensuels
+        GROUP BY 1, 2, 3
+        HAVING COUNT(*) > 1
+    ),
+    supprimees AS (
+        DELETE FROM paiements_mensuels pm
+        USING cles c
+        WHERE pm.mois = c.mois AND pm.type_paiement = c.type_paiement AND pm.forfait_id = c.forfait_id
+        RETURNING pm.*
+    )
+    INSERT INTO paiements_mensuels
+    SELECT mois, type_paiement, forfait_id,
+           SUM(nb_paiements), SUM(nb_reussis), SUM(montant_total), SUM(montant_reussi),
+           SUM(nb_payeurs), SUM(nb_abonnements_payes)
+    FROM supprimees
+    GROUP BY 1, 2, 3;
+    GET DIAGNOSTICS nb_lignes = ROW_COUNT;
+    RETURN nb_lignes;
+END
+$$;
+
+-- Paiements modifiés ou supprimés : recalcul des mois concernés
+CREATE FUNCTION paiements_mensuels_recalcul() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    mois_touches DATE[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT date_trunc('month', date_paiement)::DATE) INTO mois_touches FROM anciens;
+    ELSE
+        SELECT array_agg(DISTINCT m) INTO mois_touches FROM (
+            SELECT date_trunc('month', date_paiement)::DATE AS m FROM anciens
+            UNION
+            SELECT date_trunc('month', date_paiement)::DATE FROM nouveaux
+        ) t;
+    END IF;
+    IF mois_touches IS NOT NULL THEN
+        PERFORM rafraichir_paiements_mensuels(mois_touches);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE FUNCTION paiements_mensuels_vidage() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE paiements_mensuels, paiements_payeurs_mensuels;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER paiements_mensuels_insert AFTER INSERT ON paiements
+    REFERENCING NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION paiements_mensuels_ajout();
+CREATE TRIGGER paiements_mensuels_update AFTER UPDATE ON paiements
+    REFERENCING OLD TABLE AS anciens NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION paiements_mensuels_recalcul();
+CREATE TRIGGER paiements_mensuels_delete AFTER DELETE ON paiements
+    REFERENCING OLD TABLE AS anciens
+    FOR EACH STATEMENT EXECUTE FUNCTION paiements_mensuels_recalcul();
+CREATE TRIGGER paiements_mensuels_truncate AFTER TRUNCATE ON paiements
+    FOR EACH STATEMENT EXECUTE FUNCTION paiements_mensuels_vidage();
+
+
+
 -- Index sur les forfaits
 CREATE INDEX idx_forfaits_nom ON forfaits(nom);
 CREATE INDEX idx_forfaits_prix ON forfaits(prix_mensuel);
@@ -132,6 +364,8 @@ CREATE INDEX idx_clients_nom_prenom ON clients(nom, prenom);
 -- Index sur les techniciens pour les recherches par date de création
 CREATE INDEX idx_techniciens_created_at ON techniciens(created_at);
 CREATE INDEX idx_techniciens_email ON techniciens(email);
+-- Position projetée (longitude corrigée de la latitude) : techniciens les plus proches par KNN (<->)
+CREATE INDEX idx_techniciens_position ON techniciens USING gist (point(longitude * COS(RADIANS(latitude)), latitude));
 
 
 -- Index sur les agents pour les recherches par date de création
@@ -0,0 +1,134 @@
+"""
+Contrôle croisé des marts dbt par les indicateurs calculés en mémoire (utils/kpi.py)
+
+Les indicateurs sont recalculés à partir des données d'un run (points de reprise de
+generate.py) ou relus dans un rapport (generate.py --kpi-report), puis comparés aux
+marts construits par dbt (PostgreSQL) ou par duckdb_runner.py (--duckdb). Plusieurs
+runs (les régions d'un run generate.py --regions) sont réunis avant le calcul.
+Usage: python kpi_check.py --run-id 20250101-120000-abcdef --duckdb canalbox.duckdb
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import date
+from typing import Dict, List
+
+import psycopg2
+
+from config.settings import DB_CONFIG, DEFAULT_PARAMS, FORFAITS
+from utils.checkpoint import CheckpointStore
+from utils.kpi import KPI_MARTS, compare_kpis, compute_kpis, read_mart
+from utils.scheduler import TechnicianAssignments
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("kpi_check")
+
+# Étapes des points de reprise -> tables générées (les étapes boxes et installations en produisent deux)
+RUN_STAGES = ["agents", "techniciens", "boxes", "soumissions", "installations", "abonnements", "paiements", "feedback"]
+
+def load_run(store: CheckpointStore):
+    """Relit les tables générées par un run depuis ses points de reprise"""
+    missing = [stage for stage in RUN_STAGES if not store.has_stage(stage)]
+    if missing:
+        raise ValueError(f"Étapes absentes du run {store.run_id} (run --server-side ou interrompu): {', '.join(missing)}")
+    data = {stage: store.load_stage(stage) for stage in RUN_STAGES}
+    data["boxes"], data["clients"] = data["boxes"]
+    data["installations"], data["installation_techniciens"] = data["installations"]
+    return data
+
+def load_runs(stores: List[CheckpointStore]) -> Dict[str, List]:
+    """Réunit les tables générées par plusieurs runs (une région chacun)"""
+    data: Dict[str, List] = {}
+    assignments = []
+    for store in stores:
+        run = load_run(store)
+        assignments.append(run.pop("installation_techniciens"))
+        for table, records in run.items():
+            data.setdefault(table, []).extend(records)
+    # Indices décalés comme les installations et techniciens mis bout à bout
+    data["installation_techniciens"] = TechnicianAssignments.concat(assignments)
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description='Contrôle des marts Canalbox par les indicateurs calculés en mémoire')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--run-id', type=str, nargs='+', help='Run(s) de generate.py dont recalculer les indicateurs (un par région)')
+    source.add_argument('--kpi-report', type=str, help='Rapport d\'indicateurs écrit par generate.py --kpi-report')
+    parser.add_argument('--checkpoint-dir', type=str, default=DEFAULT_PARAMS["checkpoint_dir"],
+                        help='Répertoire des points de reprise')
+    parser.add_argument('--today', type=str, default=date.today().isoformat(),
+                        help='Date de construction des marts (current_date des modèles, YYYY-MM-DD)')
+    parser.add_argument('--duckdb', type=str, default=None,
+                        help='Base DuckDB construite par duckdb_runner.py --database (PostgreSQL par défaut)')
+    parser.add_argument('--target-schema', type=str, default='public',
+                        help='Schéma cible dbt : les marts sont lus dans <schéma>_marts')
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='Tolérance relative des valeurs comparées')
+    parser.add_argument('--report', type=str, default=None, help='Écrit le résultat de la comparaison (JSON) dans ce fichier')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+    args = parser.parse_args()
+
+    if args.run_id:
+        stores = [CheckpointStore(run_id, args.checkpoint_dir) for run_id in args.run_id]
+        for store in stores:
+            if not store.exists():
+                parser.error(f"Run {store.run_id} introuvable dans {args.checkpoint_dir}")
+        start = time.perf_counter()
+        try:
+            data = load_runs(stores)
+        except ValueError as e:
+            parser.error(str(e))
+        loaded = time.perf_counter()
+        kpis = compute_kpis(data, FORFAITS, date.fromisoformat(args.today))
+        logger.info(f"Indicateurs calculés en {time.perf_counter() - loaded:.1f} s (lecture du run: {loaded - start:.1f} s)")
+    else:
+        with open(args.kpi_report, encoding="utf-8") as f:
+            kpis = json.load(f)
+
+    if args.duckdb:
+        try:
+            import duckdb
+        except ImportError:
+            sys.exit("--duckdb nécessite duckdb (pip install duckdb)")
+        conn = duckdb.connect(args.duckdb, read_only=True)
+        schema = "marts"
+    else:
+        conn = psycopg2.connect(
+            host=args.db_host, port=args.db_port, dbname=args.db_name, user=args.db_user, password=args.db_password
+        )
+        schema = f"{args.target_schema}_marts"
+
+    results = {}
+    try:
+        for mart, expected in kpis.items():
+            key, columns = KPI_MARTS[mart]
+            actual = read_mart(conn, f"{schema}.{mart}", key, columns)
+            results[mart] = compare_kpis(expected, actual, columns, args.tolerance)
+    finally:
+        conn.close()
+
+    failed = False
+    for mart, result in results.items():
+        issues = len(result["manquantes"]) + len(result["en_trop"]) + sum(result["ecarts"].values())
+        failed |= issues > 0
+        level = logging.WARNING if issues else logging.INFO
+        logger.log(level, f"{mart}: {result['lignes']} lignes, {len(result['manquantes'])} absentes du mart, "
+                          f"{len(result['en_trop'])} en trop, écarts {result['ecarts'] or 'aucun'}")
+        for example in result["exemples"]:
+            logger.warning(f"  {example['cle']} {example['colonne']}: attendu {example['attendu']}, mart {example['mart']}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
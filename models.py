@@ -17,6 +17,8 @@ class Technicien(BaseModel):
     nom: str
     email: str
     telephone: str
+    latitude: float  # Zone d'intervention (domicile du technicien)
+    longitude: float
     created_at: date
 
 class Client(BaseModel):
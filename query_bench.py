@@ -0,0 +1,144 @@
+"""
+Banc de charge des requêtes analytiques (test.sql et marts dbt) sous trafic concurrent
+
+Mesure débit et percentiles de latence par requête, avec ou sans charge d'écriture
+simultanée (generate.py, simulate.py), et relève les plans des requêtes les plus lentes.
+Usage: python query_bench.py --clients 8 --duration 60 --load-command "python simulate.py --duration 90" --baseline
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from config.settings import BENCH_PARAMS, DB_CONFIG
+from utils.bench import QueryBench, load_mart_queries, load_test_queries, slowest
+from utils.stats import format_latency
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("query_bench")
+
+def parse_weights(specs, names):
+    """Poids des requêtes : 1 par défaut, puis motifs NOM=POIDS (fnmatch) dans l'ordre donné"""
+    weights = {name: 1.0 for name in names}
+    for spec in specs:
+        pattern, _, value = spec.rpartition("=")
+        if not pattern:
+            raise ValueError(f"Poids invalide (attendu MOTIF=POIDS): {spec}")
+        matched = fnmatch.filter(names, pattern)
+        if not matched:
+            raise ValueError(f"Aucune requête ne correspond à {pattern}")
+        for name in matched:
+            weights[name] = float(value)
+    return weights
+
+def log_report(label, report):
+    logger.info(
+        f"[{label}] {report['requetes']} requêtes en {report['duree_s']:.1f} s avec {report['clients']} clients "
+        f"({report['requetes_par_s']:.1f}/s), {report['erreurs']} erreurs - {format_latency(report['latence'])}"
+    )
+    for name in slowest(report, len(report["par_requete"])):
+        stats = dict(report["par_requete"][name])
+        errors = stats.pop("erreurs")
+        logger.info(f"[{label}]   {name}: {format_latency(stats)}, {errors} erreurs")
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc de charge des requêtes analytiques Canalbox')
+    parser.add_argument('--clients', type=int, default=BENCH_PARAMS["clients"],
+                        help='Nombre de clients concurrents')
+    parser.add_argument('--duration', type=float, default=BENCH_PARAMS["duree_secondes"],
+                        help='Durée de chaque phase de mesure (secondes)')
+    parser.add_argument('--queries', nargs='+', choices=['test', 'marts'], default=['test', 'marts'],
+                        help='Requêtes rejouées : test.sql et/ou SQL des marts dbt')
+    parser.add_argument('--weight', action='append', default=[], metavar='MOTIF=POIDS',
+                        help='Poids d\'une requête ou d\'un motif (ex. "marts:*=2", "test:*=0") ; 1 par défaut')
+    parser.add_argument('--target-schema', type=str, default='public',
+                        help='Schéma cible dbt : les marts lisent <schéma>_raw / <schéma>_staging')
+    parser.add_argument('--statement-timeout', type=int, default=BENCH_PARAMS["statement_timeout_ms"],
+                        help='Délai maximal d\'une requête en millisecondes (0 : aucun)')
+    parser.add_argument('--explain-top', type=int, default=BENCH_PARAMS["explain_top"],
+                        help='Nombre de requêtes les plus lentes (p95) dont relever le plan')
+    parser.add_argument('--explain-dir', type=str, default=None,
+                        help='Écrit les plans EXPLAIN (ANALYZE, BUFFERS) dans ce répertoire')
+    parser.add_argument('--load-command', type=str, default=None,
+                        help='Commande de charge d\'écriture lancée pendant la mesure (ex. "python simulate.py")')
+    parser.add_argument('--load-warmup', type=float, default=BENCH_PARAMS["chauffe_charge_secondes"],
+                        help='Attente (secondes) entre le lancement de la charge et la mesure')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Mesure d\'abord sans charge, pour comparer avec la mesure sous charge')
+    parser.add_argument('--seed', type=int, default=None, help='Graine du tirage des requêtes')
+    parser.add_argument('--report', type=str, default=None, help='Écrit le rapport JSON dans ce fichier')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+
+    args = parser.parse_args()
+    db_config = {
+        "host": args.db_host,
+        "port": args.db_port,
+        "dbname": args.db_name,
+        "user": args.db_user,
+        "password": args.db_password
+    }
+
+    queries = {}
+    if 'test' in args.queries:
+        queries.update(load_test_queries())
+    if 'marts' in args.queries:
+        queries.update(load_mart_queries(args.target_schema))
+    try:
+        weights = parse_weights(args.weight, list(queries))
+    except ValueError as e:
+        parser.error(str(e))
+    bench = QueryBench(db_config, queries, weights, args.clients, args.statement_timeout)
+    logger.info(f"{len(bench.names)} requêtes dans le mélange, {args.clients} clients")
+
+    reports = {}
+    if args.baseline or not args.load_command:
+        reports["sans_charge"] = bench.run(args.duration, args.seed)
+        log_report("sans charge", reports["sans_charge"])
+
+    if args.load_command:
+        logger.info(f"Lancement de la charge d'écriture: {args.load_command}")
+        load = subprocess.Popen(shlex.split(args.load_command))
+        try:
+            time.sleep(args.load_warmup)
+            if load.poll() is not None:
+                logger.warning(f"La charge d'écriture s'est terminée avant la mesure (code {load.returncode})")
+            reports["avec_charge"] = bench.run(args.duration, args.seed)
+            if load.poll() is not None:
+                logger.warning("La charge d'écriture s'est terminée pendant la mesure")
+        finally:
+            if load.poll() is None:
+                load.terminate()
+                load.wait()
+        log_report("avec charge", reports["avec_charge"])
+
+    last = reports[list(reports)[-1]]
+    top = slowest(last, args.explain_top)
+    plans = bench.explain(top) if top else {}
+    for name, plan in plans.items():
+        logger.info(f"Plan de {name}:\n{plan}")
+    if args.explain_dir:
+        explain_dir = Path(args.explain_dir)
+        explain_dir.mkdir(parents=True, exist_ok=True)
+        for name, plan in plans.items():
+            filename = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+            (explain_dir / f"{filename}.txt").write_text(f"{queries[name]}\n\n{plan}\n", encoding="utf-8")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"phases": reports, "plans": plans}, f, indent=2)
+
+    if any(report["requetes"] == 0 for report in reports.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Simulateur d'événements en temps réel pour tester la base et les marts sous ingestion continue
+
+Rejoue le parcours des clients (inscription, soumission, appel, installation,
+paiement, renouvellement, feedback) sur une base déjà peuplée par generate.py
+Usage: python simulate.py --rate 20 --duration 60 --days-per-second 1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, datetime
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from config.settings import DB_CONFIG, SIMULATION_PARAMS
+from utils.live import LiveSimulator, SimClock
+from utils.stats import format_latency
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("simulator")
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulateur d\'événements Canalbox en temps réel')
+    parser.add_argument('--rate', type=float, default=SIMULATION_PARAMS["inscriptions_par_seconde"],
+                        help='Inscriptions de clients par seconde réelle')
+    parser.add_argument('--duration', type=float, default=SIMULATION_PARAMS["duree_secondes"],
+                        help='Durée de la simulation (secondes)')
+    parser.add_argument('--days-per-second', type=float, default=SIMULATION_PARAMS["jours_par_seconde"],
+                        help='Jours simulés par seconde réelle')
+    parser.add_argument('--start-date', type=str, default=None,
+                        help='Date simulée au lancement (YYYY-MM-DD, aujourd\'hui par défaut)')
+    parser.add_argument('--writers', type=int, default=SIMULATION_PARAMS["ecrivains"],
+                        help='Nombre d\'écrivains (connexions du pool utilisées en parallèle)')
+    parser.add_argument('--batch-size', type=int, default=SIMULATION_PARAMS["evenements_par_transaction"],
+                        help='Nombre maximum d\'événements par transaction')
+    parser.add_argument('--flush-interval', type=float, default=SIMULATION_PARAMS["delai_transaction"],
+                        help='Attente maximale (secondes) pour compléter une transaction')
+    parser.add_argument('--seed', type=int, default=None, help='Graine aléatoire')
+    parser.add_argument('--report', type=str, default=None, help='Écrit le rapport JSON dans ce fichier')
+    parser.add_argument('--db-host', type=str, default=DB_CONFIG["host"], help='Hôte de la base de données')
+    parser.add_argument('--db-port', type=int, default=int(DB_CONFIG["port"]), help='Port de la base de données')
+    parser.add_argument('--db-name', type=str, default=DB_CONFIG["dbname"], help='Nom de la base de données')
+    parser.add_argument('--db-user', type=str, default=DB_CONFIG["user"], help='Utilisateur de la base de données')
+    parser.add_argument('--db-password', type=str, default=DB_CONFIG["password"], help='Mot de passe de la base de données')
+
+    args = parser.parse_args()
+    start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date() if args.start_date else date.today()
+
+    # Une connexion par écrivain, plus une pour les lectures de référence
+    pool = ThreadedConnectionPool(
+        1, args.writers + 1,
+        host=args.db_host,
+        port=args.db_port,
+        dbname=args.db_name,
+        user=args.db_user,
+        password=args.db_password
+    )
+    try:
+        simulator = LiveSimulator(
+            pool,
+            SimClock(start_date, args.days_per_second),
+            args.rate,
+            writers=args.writers,
+            batch_size=args.batch_size,
+            flush_interval=args.flush_interval,
+            seed=args.seed
+        )
+        report = asyncio.run(simulator.run(args.duration))
+    finally:
+        pool.closeall()
+
+    logger.info(
+        f"{report['evenements_ecrits']} événements écrits en {report['duree_s']:.1f} s "
+        f"({report['evenements_par_s']:.1f}/s), {report['evenements_echoues']} en échec, "
+        f"{report['transactions']} transactions"
+    )
+    logger.info(f"Latence de commit: {format_latency(report['latence_commit'])}")
+    logger.info(f"Latence d'ingestion (émission -> commit): {format_latency(report['latence_ingestion'])}")
+    logger.info("Par type: " + ", ".join(f"{kind}={n}" for kind, n in report["par_type"].items()))
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Base PostgreSQL jetable des tests : créée à côté de celle de DB_CONFIG avec le schéma de init.sql, supprimée ensuite"""
+
+from typing import Dict
+from uuid import uuid4
+
+import psycopg2
+from psycopg2 import sql
+
+from config.settings import DB_CONFIG
+from utils.regions import INIT_SQL, sql_statements
+
+def database_available() -> bool:
+    """Vrai si la base de DB_CONFIG répond"""
+    try:
+        psycopg2.connect(connect_timeout=3, **DB_CONFIG).close()
+        return True
+    except psycopg2.OperationalError:
+        return False
+
+def _admin_connection():
+    conn = psycopg2.connect(connect_timeout=3, **DB_CONFIG)
+    conn.autocommit = True  # CREATE / DROP DATABASE hors transaction
+    return conn
+
+def create_scratch_database() -> Dict:
+    """
+    Crée une base vide, charge init.sql dans son schéma public
+
+    Comme psql, une instruction refusée (index à prédicat non immuable) est
+    ignorée sans interrompre le script.
+
+    Returns:
+        Dict: Paramètres de connexion à la base (DB_CONFIG avec son nom)
+    """
+    config = {**DB_CONFIG, "dbname": f"{DB_CONFIG['dbname']}_test_{uuid4().hex[:8]}"}
+    conn = _admin_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE DATABASE {} TEMPLATE template0 ENCODING 'UTF8'").format(sql.Identifier(config["dbname"])))
+    finally:
+        conn.close()
+
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            for statement in sql_statements(INIT_SQL.read_text(encoding="utf-8")):
+                cursor.execute("SAVEPOINT init_sql")
+                try:
+                    cursor.execute(statement)
+                except psycopg2.Error:
+                    cursor.execute("ROLLBACK TO SAVEPOINT init_sql")
+                cursor.execute("RELEASE SAVEPOINT init_sql")
+        conn.commit()
+    finally:
+        conn.close()
+    return config
+
+def drop_scratch_database(config: Dict) -> None:
+    """Supprime une base créée par create_scratch_database (connexions restantes comprises)"""
+    conn = _admin_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(config["dbname"])))
+    finally:
+        conn.close()
@@ -0,0 +1,140 @@
+"""Parcours complet d'un client du simulateur temps réel (nécessite PostgreSQL, écrit dans une base jetable)"""
+
+import asyncio
+import unittest
+from datetime import date, timedelta
+from uuid import uuid4
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from config.settings import ABONNEMENT_PARAMS
+from tests.scratch import create_scratch_database, database_available, drop_scratch_database
+from utils.lifecycle import JOURS_PAR_MOIS
+from utils.live import BatchWriter, LiveSimulator, SimClock, insert
+from utils.sinks import table_rows
+
+class InsertTest(unittest.TestCase):
+    def test_installation_techniciens_dict(self):
+        installation_id, technicien_id = uuid4(), uuid4()
+        query, params = insert("installation_techniciens", {"installation_id": installation_id, "technicien_id": technicien_id})
+        self.assertIn("INSERT INTO installation_techniciens", query)
+        self.assertEqual(params, (installation_id, technicien_id))
+
+    def test_installation_techniciens_rows(self):
+        installation_id, first, second = uuid4(), uuid4(), uuid4()
+        records = [
+            {"technicien_id": first, "installation_id": installation_id},
+            {"installation_id": installation_id, "technicien_id": second},
+        ]
+        self.assertEqual(
+            table_rows("installation_techniciens", records),
+            [(installation_id, first), (installation_id, second)]
+        )
+
+@unittest.skipUnless(database_available(), "base PostgreSQL indisponible")
+class BatchWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.config = create_scratch_database()
+        self.pool = ThreadedConnectionPool(1, 1, **self.config)
+
+    def tearDown(self):
+        self.pool.closeall()
+        drop_scratch_database(self.config)
+
+    def _agent(self, email: str):
+        return ("agents", 0.0, [(
+            "INSERT INTO agents (id, nom, email, telephone, created_at) VALUES (%s, 'Test', %s, '0', %s)",
+            (str(uuid4()), email, date(2024, 1, 1))
+        )])
+
+    def test_failed_event_rolls_back_alone(self):
+        # Le deuxième événement viole l'unicité de l'email : seul lui est annulé
+        writer = BatchWriter(self.pool, batch_size=3, flush_interval=0.0, max_pending=3)
+        writer._commit([self._agent("a@test.bj"), self._agent("a@test.bj"), self._agent("b@test.bj")])
+        self.assertEqual(writer.failed, 1)
+        self.assertEqual(writer.written["agents"], 2)
+
+        conn = self.pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT email FROM agents ORDER BY email")
+            self.assertEqual(cursor.fetchall(), [("a@test.bj",), ("b@test.bj",)])
+        conn.rollback()
+        self.pool.putconn(conn)
+
+@unittest.skipUnless(database_available(), "base PostgreSQL indisponible")
+class JourneyTest(unittest.TestCase):
+    def setUp(self):
+        # Base jetable : le parcours valide ses écritures, la base de DB_CONFIG reste intacte
+        self.config = create_scratch_database()
+        self.pool = ThreadedConnectionPool(1, 3, **self.config)
+        conn = self.pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO agents (id, nom, email, telephone, created_at) VALUES (%s, 'Test', %s, '0', %s)",
+                (str(uuid4()), f"agent.{uuid4().hex}@test.bj", date(2024, 1, 1))
+            )
+            for _ in range(2):
+                cursor.execute(
+                    "INSERT INTO techniciens (id, nom, email, telephone, latitude, longitude, created_at) "
+                    "VALUES (%s, 'Test', %s, '0', 6.37, 2.43, %s)",
+                    (str(uuid4()), f"tech.{uuid4().hex}@test.bj", date(2024, 1, 1))
+                )
+        conn.commit()
+        self.pool.putconn(conn)
+
+    def tearDown(self):
+        self.pool.closeall()
+        drop_scratch_database(self.config)
+
+    def test_journey(self):
+        # Horloge très rapide : les attentes entre étapes sont négligeables
+        simulator = LiveSimulator(self.pool, SimClock(date(2025, 1, 6), 1e6), rate=1, writers=2, seed=1)
+
+        async def journey():
+            writers = [asyncio.create_task(w.run()) for w in simulator.writers]
+            await simulator._journey()  # Lève l'exception d'une étape en échec
+            await asyncio.gather(*simulator._journeys)
+            for w in simulator.writers:
+                await w.queue.put(None)
+            await asyncio.gather(*writers)
+
+        asyncio.run(journey())
+        report = simulator.report(1.0)
+        self.assertEqual(report["evenements_echoues"], 0)
+        self.assertEqual(report["evenements_ecrits"], report["evenements_emis"])
+        for kind in ("inscription", "soumission", "appel", "installation", "paiement"):
+            self.assertEqual(report["par_type"][kind], 1)
+
+        conn = self.pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT count(*)
+                FROM installation_techniciens it
+                JOIN installations i ON i.id = it.installation_id
+                WHERE i.date_realisation IS NOT NULL AND i.date_planifiee >= '2025-01-06'
+                """
+            )
+            self.assertGreaterEqual(cursor.fetchone()[0], 2)
+
+            # Chaque renouvellement commence à la fin du précédent (un retour après une pause d'au
+            # moins pause_mois_min mois excepté) ; le paiement peut être plus tardif
+            cursor.execute(
+                """
+                SELECT a.date_debut, a.date_fin, p.date_paiement
+                FROM abonnements a
+                JOIN paiements p ON p.abonnement_id = a.id
+                ORDER BY a.date_debut
+                """
+            )
+            abonnements = cursor.fetchall()
+            self.assertGreater(len(abonnements), 1)
+            for (_, fin, _), (debut, _, date_paiement) in zip(abonnements, abonnements[1:]):
+                if debut - fin < timedelta(days=JOURS_PAR_MOIS * ABONNEMENT_PARAMS["pause_mois_min"]):
+                    self.assertEqual(debut, fin)
+                self.assertGreaterEqual(date_paiement, debut)
+        conn.rollback()
+        self.pool.putconn(conn)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Unicité des numéros de série et des emails dans les vues des régions (nécessite PostgreSQL)"""
+
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import psycopg2
+
+from config.settings import REGIONS_SCHEMA
+from tests.scratch import create_scratch_database, database_available, drop_scratch_database
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (vue, colonne) qui doivent rester uniques une fois les régions réunies
+UNIQUE_COLUMNS = [
+    ("boxes", "numero_serie"),
+    ("clients", "email"),
+    ("agents", "email"),
+    ("techniciens", "email"),
+]
+
+@unittest.skipUnless(database_available(), "base PostgreSQL indisponible")
+class RegionViewsTest(unittest.TestCase):
+    def setUp(self):
+        self.config = create_scratch_database()
+        self.checkpoints = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.checkpoints.cleanup()
+        drop_scratch_database(self.config)
+
+    def _generate(self, *options):
+        subprocess.run(
+            [sys.executable, "generate.py", "--regions", "cotonou", "parakou", "--region-scale", "0.02",
+             "--start-date", "2024-01-01", "--end-date", "2024-06-30", "--seed", "7",
+             "--checkpoint-dir", self.checkpoints.name, "--db-name", self.config["dbname"], *options],
+            cwd=ROOT, check=True, capture_output=True
+        )
+
+    def _assert_unique(self):
+        conn = psycopg2.connect(**self.config)
+        try:
+            with conn.cursor() as cursor:
+                for view, column in UNIQUE_COLUMNS:
+                    cursor.execute(
+                        f"SELECT count(*), count(DISTINCT {column}), count(DISTINCT region) FROM {REGIONS_SCHEMA}.{view}"
+                    )
+                    total, distinct, regions = cursor.fetchone()
+                    with self.subTest(view=view):
+                        self.assertEqual(regions, 2)
+                        self.assertEqual(total, distinct)
+        finally:
+            conn.close()
+
+    def test_unique_across_regions(self):
+        self._generate()
+        self._assert_unique()
+
+    def test_unique_across_regions_server_side(self):
+        self._generate("--server-side")
+        self._assert_unique()
+
+if __name__ == "__main__":
+    unittest.main()
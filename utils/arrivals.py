@@ -0,0 +1,129 @@
+"""Moteur d'arrivées vectorisé pour les dates de création (clients, agents, techniciens)"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils.plan import GenerationPlan
+
+def burst_weights(days: np.ndarray, per_year: float, factor: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Tire des jours de rafale (campagne, promotion) dont l'intensité est multipliée
+
+    Args:
+        days (np.ndarray): Jours de l'horizon (datetime64[D])
+        per_year (float): Nombre moyen de jours de rafale par an
+        factor (float): Multiplicateur de l'intensité d'un jour de rafale
+        rng (np.random.Generator): Générateur aléatoire
+
+    Returns:
+        np.ndarray: Poids de chaque jour (factor les jours de rafale, 1 sinon)
+    """
+    weights = np.ones(len(days))
+    n_bursts = min(len(days), rng.poisson(per_year * len(days) / 365))
+    weights[rng.choice(len(days), n_bursts, replace=False)] = factor
+    return weights
+
+def daily_intensity(
+    base_per_month: float,
+    plan: GenerationPlan,
+    rng: np.random.Generator,
+    min_per_month: float = 0.0,
+    bursts: Optional[Tuple[float, float]] = None
+) -> np.ndarray:
+    """
+    Calcule la courbe d'intensité journalière sur tout l'horizon du plan
+
+    Chaque mois reçoit en espérance base_per_month * multiplicateur du plan (au
+    moins min_per_month), réparti sur ses jours selon le poids de la période de
+    pointe. Les mois partiels en bord d'horizon reçoivent la part correspondant
+    à leurs jours. Les jours de rafale (bursts) s'ajoutent à cette espérance.
+
+    Args:
+        base_per_month (float): Nombre de créations de base par mois
+        plan (GenerationPlan): Calendrier et multiplicateurs mensuels du run
+        rng (np.random.Generator): Générateur aléatoire (jours de rafale)
+        min_per_month (float): Nombre minimum attendu sur un mois complet
+        bursts (Tuple[float, float], optional): Jours de rafale par an et leur multiplicateur (voir burst_weights)
+
+    Returns:
+        np.ndarray: Intensité attendue pour chaque jour de plan.days
+    """
+    if len(plan.days) == 0:
+        return np.zeros(0)
+
+    expected = np.maximum(min_per_month, base_per_month * plan.multipliers)
+    intensity = expected[plan.month_idx] * plan.daily_share
+    if bursts:
+        intensity *= burst_weights(plan.days, *bursts, rng)
+    return intensity
+
+def sample_arrival_dates(
+    base_per_month: float,
+    plan: GenerationPlan,
+    rng: Optional[np.random.Generator] = None,
+    min_per_month: float = 0.0,
+    limit: Optional[int] = None,
+    bursts: Optional[Tuple[float, float]] = None
+) -> np.ndarray:
+    """
+    Tire les dates d'arrivée de tout l'horizon en une seule étape vectorisée
+
+    Args:
+        base_per_month (float): Nombre de créations de base par mois
+        plan (GenerationPlan): Calendrier et multiplicateurs mensuels du run
+        rng (np.random.Generator, optional): Générateur aléatoire
+        min_per_month (float): Nombre minimum sur un mois complet (au prorata pour un mois partiel)
+        limit (int, optional): Nombre maximum de dates (les plus anciennes sont gardées)
+        bursts (Tuple[float, float], optional): Jours de rafale par an et leur multiplicateur
+
+    Returns:
+        np.ndarray: Dates d'arrivée triées (datetime64[D])
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    counts = rng.poisson(daily_intensity(base_per_month, plan, rng, min_per_month, bursts))
+
+    # Garantir le minimum de chaque mois, au prorata de la part du mois couverte par l'horizon
+    if min_per_month > 0 and len(plan.days) > 0:
+        drawn = np.bincount(plan.month_idx, weights=counts, minlength=plan.n_months).astype(np.int64)
+        deficit = np.maximum(0, np.floor(min_per_month * plan.coverage).astype(np.int64) - drawn)
+
+        # Compléter par des jours tirés uniformément dans les mois déficitaires
+        short_months = np.repeat(np.arange(plan.n_months), deficit)
+        extra_days = plan.month_first_day[short_months] + (
+            rng.random(len(short_months)) * plan.month_days[short_months]
+        ).astype(np.int64)
+        np.add.at(counts, extra_days, 1)
+
+    arrivals = np.repeat(plan.days, counts)
+
+    if limit is not None:
+        arrivals = arrivals[:limit]
+    return arrivals
+
+def stratified_sample(arrivals: np.ndarray, fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Échantillon systématique d'une fraction des arrivées, stratifié par date
+
+    Les arrivées triées sont parcourues avec un pas de 1 / fraction depuis un
+    point de départ aléatoire : chaque jour, et donc chaque mois, garde sa part
+    des arrivées à une unité près, ce qui conserve la courbe de croissance et
+    les périodes de pointe.
+
+    Args:
+        arrivals (np.ndarray): Dates d'arrivée triées (datetime64[D])
+        fraction (float): Fraction à conserver, dans ]0, 1]
+        rng (np.random.Generator): Générateur aléatoire
+
+    Returns:
+        np.ndarray: Dates d'arrivée conservées, triées
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"La fraction échantillonnée doit être dans ]0, 1]: {fraction}")
+    if fraction == 1:
+        return arrivals
+    position = (np.arange(len(arrivals)) + rng.random()) * fraction
+    keep = np.floor(position) != np.floor(position - fraction)
+    return arrivals[keep]
@@ -0,0 +1,182 @@
+"""Banc de charge des requêtes analytiques : clients concurrents, latences et plans d'exécution"""
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from utils.duckdb_engine import DBT_PROJECT_DIR, discover_models, render_jinja
+from utils.stats import latency_summary
+
+logger = logging.getLogger("query_bench")
+
+TEST_SQL = Path(__file__).resolve().parent.parent / "test.sql"
+
+def load_test_queries(path: Path = TEST_SQL) -> Dict[str, str]:
+    """
+    Découpe un fichier SQL en requêtes nommées d'après leur commentaire d'en-tête
+
+    Args:
+        path (Path): Fichier de requêtes (test.sql)
+
+    Returns:
+        Dict[str, str]: Nom (test:<commentaire>) -> requête
+    """
+    queries = {}
+    for i, block in enumerate(b for b in path.read_text(encoding="utf-8").split(";") if b.strip()):
+        comments = re.findall(r"^\s*--\s*(.+)$", block, re.MULTILINE)
+        name = comments[0].strip() if comments else f"requete_{i + 1}"
+        queries[f"test:{name}"] = block.strip()
+    return queries
+
+def load_mart_queries(target_schema: str = "public", project_dir: Path = DBT_PROJECT_DIR) -> Dict[str, str]:
+    """
+    Rend le SQL des marts pour PostgreSQL, en lisant les modèles amont déjà construits par dbt
+
+    Les ref() sont résolues selon le nommage par défaut de dbt
+    (<schéma cible>_<schéma du modèle>, par exemple public_staging).
+
+    Args:
+        target_schema (str): Schéma cible du profil dbt
+        project_dir (Path): Répertoire du projet dbt
+
+    Returns:
+        Dict[str, str]: Nom (marts:<modèle>) -> requête
+    """
+    models = discover_models(project_dir)
+    return {
+        f"marts:{name}": render_jinja(sql, models, lambda layer: f"{target_schema}_{layer}", "public")
+        for name, (layer, sql) in models.items() if layer == "marts"
+    }
+
+class QueryBench:
+    """
+    Rejoue un mélange pondéré de requêtes depuis plusieurs clients concurrents
+
+    Chaque client a sa propre connexion et enchaîne les requêtes tirées selon leurs
+    poids (lecture complète du résultat, comme un tableau de bord) jusqu'à la fin
+    de la durée. Les requêtes en erreur ou hors délai sont comptées à part.
+
+    Args:
+        db_config (Dict): Paramètres de connexion psycopg2
+        queries (Dict[str, str]): Requêtes nommées
+        weights (Dict[str, float]): Poids de chaque requête dans le mélange
+        clients (int): Nombre de clients concurrents
+        statement_timeout_ms (int): Délai maximal d'une requête (0 : aucun)
+    """
+
+    def __init__(self, db_config: Dict, queries: Dict[str, str], weights: Dict[str, float],
+                 clients: int, statement_timeout_ms: int = 0):
+        self.db_config = db_config
+        self.queries = queries
+        self.names = [name for name in queries if weights.get(name, 0) > 0]
+        self.weights = [weights[name] for name in self.names]
+        if not self.names:
+            raise ValueError("Aucune requête avec un poids positif dans le mélange")
+        self.clients = clients
+        self.statement_timeout_ms = statement_timeout_ms
+
+    def _client(self, index: int, deadline: float, seed: Optional[int],
+                latencies: Dict[str, List[float]], errors: Dict[str, int], lock: threading.Lock) -> None:
+        rng = random.Random(None if seed is None else seed + index)
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET statement_timeout = %s", (self.statement_timeout_ms,))
+                while time.perf_counter() < deadline:
+                    name = rng.choices(self.names, weights=self.weights)[0]
+                    start = time.perf_counter()
+                    try:
+                        cursor.execute(self.queries[name])
+                        cursor.fetchall()
+                    except psycopg2.Error as e:
+                        local_errors[name] += 1
+                        logger.debug(f"{name}: {e}")
+                        continue
+                    local_latencies[name].append(time.perf_counter() - start)
+        finally:
+            conn.close()
+            with lock:
+                for name, values in local_latencies.items():
+                    latencies[name].extend(values)
+                for name, n in local_errors.items():
+                    errors[name] += n
+
+    def run(self, duration: float, seed: Optional[int] = None) -> Dict:
+        """
+        Lance les clients pendant duration secondes
+
+        Args:
+            duration (float): Durée de la mesure (secondes)
+            seed (int, optional): Graine du tirage des requêtes
+
+        Returns:
+            Dict: Débit global et, par requête, nombre d'exécutions, erreurs et percentiles de latence
+        """
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        lock = threading.Lock()
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._client, args=(i, start + duration, seed, latencies, errors, lock),
+                             name=f"bench-client-{i}")
+            for i in range(self.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        executed = sum(len(values) for values in latencies.values())
+        return {
+            "duree_s": elapsed,
+            "clients": self.clients,
+            "requetes": executed,
+            "erreurs": sum(errors.values()),
+            "requetes_par_s": executed / elapsed if elapsed > 0 else 0.0,
+            "latence": latency_summary(l for values in latencies.values() for l in values),
+            "par_requete": {
+                name: {**latency_summary(latencies[name]), "erreurs": errors.get(name, 0)}
+                for name in self.names
+            }
+        }
+
+    def explain(self, names: List[str]) -> Dict[str, str]:
+        """
+        Plans EXPLAIN (ANALYZE, BUFFERS) des requêtes données (exécutées dans une transaction annulée)
+
+        Args:
+            names (List[str]): Requêtes à analyser
+
+        Returns:
+            Dict[str, str]: Nom -> plan texte
+        """
+        plans = {}
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            with conn.cursor() as cursor:
+                for name in names:
+                    try:
+                        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {self.queries[name]}")
+                        plans[name] = "\n".join(row[0] for row in cursor.fetchall())
+                    except psycopg2.Error as e:
+                        plans[name] = f"Erreur: {e}"
+                    conn.rollback()
+        finally:
+            conn.close()
+        return plans
+
+def slowest(report: Dict, n: int) -> List[str]:
+    """Les n requêtes au p95 le plus élevé d'un rapport"""
+    measured = {name: stats for name, stats in report["par_requete"].items() if stats.get("count")}
+    return sorted(measured, key=lambda name: measured[name]["p95"], reverse=True)[:n]
@@ -0,0 +1,154 @@
+"""Points de reprise pour une génération et un chargement reprenables"""
+
+import hashlib
+import json
+import os
+import pickle
+import random
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Set
+from uuid import UUID, uuid4
+
+import numpy as np
+from faker import Faker
+
+def new_run_id() -> str:
+    """
+    Crée un identifiant de run lisible et unique
+
+    Returns:
+        str: Identifiant de la forme AAAAMMJJ-HHMMSS-xxxxxx
+    """
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid4().hex[:6]}"
+
+def seed_stage(seed: int, stage: str) -> np.random.Generator:
+    """
+    Réinitialise les générateurs aléatoires (random, Faker, numpy) pour une étape
+
+    La graine de l'étape est dérivée de la graine du run et du nom de l'étape :
+    une étape régénérée lors d'une reprise produit les mêmes données.
+
+    Args:
+        seed (int): Graine du run
+        stage (str): Nom de l'étape
+
+    Returns:
+        np.random.Generator: Générateur numpy de l'étape
+    """
+    stage_seed = int.from_bytes(hashlib.sha256(f"{seed}:{stage}".encode()).digest()[:8], "big")
+    random.seed(stage_seed)
+    Faker.seed(stage_seed)
+    return np.random.default_rng(stage_seed)
+
+def seeded_uuid4() -> UUID:
+    """
+    Génère un UUID v4 à partir du générateur `random` (reproductible avec la graine de l'étape)
+
+    Returns:
+        UUID: Nouvel identifiant
+    """
+    return UUID(int=random.getrandbits(128), version=4)
+
+class CheckpointStore:
+    """
+    Stocke sur disque les sorties de chaque étape et la progression du chargement
+
+    Arborescence : <base_dir>/<run_id>/manifest.json, stages/<étape>.pkl
+    et load/<table>.progress (un numéro de lot chargé par ligne).
+    """
+
+    def __init__(self, run_id: str, base_dir: str):
+        self.run_id = run_id
+        self.run_dir = Path(base_dir) / run_id
+        self.stages_dir = self.run_dir / "stages"
+        self.load_dir = self.run_dir / "load"
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.run_dir / "manifest.json"
+
+    def exists(self) -> bool:
+        """Indique si le run a déjà un manifeste"""
+        return self.manifest_path.exists()
+
+    def create(self, seed: int, params: Dict[str, Any], chunk_size: int) -> None:
+        """
+        Initialise le répertoire du run et écrit son manifeste
+
+        Args:
+            seed (int): Graine du run
+            params (Dict[str, Any]): Paramètres de génération (sérialisables en JSON)
+            chunk_size (int): Taille des lots de chargement (fixe pour tout le run)
+        """
+        self.stages_dir.mkdir(parents=True, exist_ok=True)
+        self.load_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "run_id": self.run_id,
+            "seed": seed,
+            "params": params,
+            "chunk_size": chunk_size,
+            "created_at": datetime.now().isoformat(timespec="seconds")
+        }
+        self._write_atomic(self.manifest_path, json.dumps(manifest, indent=2).encode())
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """
+        Lit le manifeste du run
+
+        Raises:
+            FileNotFoundError: Si le run n'existe pas
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"Aucun point de reprise pour le run {self.run_id} ({self.run_dir})")
+        return json.loads(self.manifest_path.read_text())
+
+    def has_stage(self, stage: str) -> bool:
+        return (self.stages_dir / f"{stage}.pkl").exists()
+
+    def save_stage(self, stage: str, data: Any) -> None:
+        """Enregistre la sortie d'une étape"""
+        self._write_atomic(self.stages_dir / f"{stage}.pkl", pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_stage(self, stage: str) -> Any:
+        """Relit la sortie d'une étape"""
+        with open(self.stages_dir / f"{stage}.pkl", "rb") as f:
+            return pickle.load(f)
+
+    def save_report(self, name: str, payload: Dict[str, Any]) -> None:
+        """Écrit un rapport lisible du run (<run_dir>/<name>.json)"""
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self.run_dir / f"{name}.json", json.dumps(payload, indent=2, ensure_ascii=False).encode())
+
+    def completed_chunks(self, table: str) -> Set[int]:
+        """
+        Retourne les numéros des lots déjà chargés pour une table
+
+        Args:
+            table (str): Nom de la table
+
+        Returns:
+            Set[int]: Numéros des lots validés
+        """
+        path = self.load_dir / f"{table}.progress"
+        if not path.exists():
+            return set()
+        return {int(line) for line in path.read_text().split()}
+
+    def mark_chunk_done(self, table: str, chunk: int) -> None:
+        """Enregistre qu'un lot a été validé (commit) dans la base"""
+        self.load_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.load_dir / f"{table}.progress", "a") as f:
+            f.write(f"{chunk}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _write_atomic(path: Path, payload: bytes) -> None:
+        """Écrit un fichier via un fichier temporaire pour ne jamais laisser de fichier partiel"""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,173 @@
+"""Reconstruction sélective des modèles dbt selon les tables sources modifiées depuis le dernier run"""
+
+import json
+import logging
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from psycopg2 import sql
+
+from config.settings import REGIONS_SCHEMA
+from utils.duckdb_engine import DBT_PROJECT_DIR, SOURCE_SCHEMA
+from utils.regions import region_schemas
+from utils.sinks import PARTITION_COLUMNS
+
+logger = logging.getLogger("dbt_orchestrator")
+
+# Tables sources déclarées dans schema.yml (source canalbox) et leur colonne de date indexée,
+# dont les agrégats mensuels des paiements tenus à jour par triggers (init.sql)
+SOURCE_TABLES = {**PARTITION_COLUMNS, "paiements_mensuels": "mois", "paiements_payeurs_mensuels": "mois"}
+
+def source_watermarks(conn, schema: str = "public") -> Dict[str, Dict]:
+    """
+    Relève l'état de chaque table source : nombre de lignes, date maximale et modifications
+
+    Le compteur de modifications (insertions + mises à jour + suppressions, d'après
+    pg_stat_user_tables) détecte aussi les UPDATE qui ne changent ni le nombre de
+    lignes ni la date maximale. Une remise à zéro des statistiques ne provoque
+    qu'une reconstruction superflue. Les sources lues au travers des vues des
+    régions (REGIONS_SCHEMA) cumulent les modifications des tables de chaque région.
+
+    Args:
+        conn: Connexion psycopg2
+        schema (str): Schéma des tables sources (variable dbt source_schema)
+
+    Returns:
+        Dict[str, Dict]: Table -> {"rows", "max_date", "modifications"}
+    """
+    watermarks = {}
+    stats_schemas = region_schemas(conn) if schema == REGIONS_SCHEMA else [schema]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT relname, SUM(n_tup_ins + n_tup_upd + n_tup_del)::bigint
+            FROM pg_stat_user_tables
+            WHERE schemaname = ANY(%s)
+            GROUP BY relname
+            """,
+            (stats_schemas,)
+        )
+        modifications = dict(cursor.fetchall())
+
+        for table, date_column in SOURCE_TABLES.items():
+            max_date = sql.SQL("MAX({})").format(sql.Identifier(date_column)) if date_column else sql.SQL("NULL")
+            cursor.execute(sql.SQL("SELECT COUNT(*), {} FROM {}").format(max_date, sql.Identifier(schema, table)))
+            rows, latest = cursor.fetchone()
+            watermarks[table] = {
+                "rows": rows,
+                "max_date": latest.isoformat() if latest is not None else None,
+                "modifications": modifications.get(table)
+            }
+    conn.rollback()
+    return watermarks
+
+def changed_sources(current: Dict[str, Dict], previous: Optional[Dict[str, Dict]]) -> List[str]:
+    """Tables sources dont l'état diffère du dernier run (toutes s'il n'y a pas de run précédent)"""
+    if previous is None:
+        return list(current)
+    return [table for table, mark in current.items() if previous.get(table) != mark]
+
+def load_watermarks(path: Path) -> Optional[Dict[str, Dict]]:
+    """Lit les états enregistrés après le dernier run réussi (None s'il n'y en a pas)"""
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def save_watermarks(path: Path, watermarks: Dict[str, Dict]) -> None:
+    """Enregistre les états des sources (écriture atomique)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(watermarks, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+def _dbt(args: List[str], project_dir: Path, profiles_dir: Optional[str]) -> None:
+    command = ["dbt", *args, "--project-dir", str(project_dir)]
+    if profiles_dir:
+        command += ["--profiles-dir", profiles_dir]
+    logger.info(" ".join(command))
+    subprocess.run(command, check=True)
+
+def load_manifest(project_dir: Path = DBT_PROJECT_DIR, profiles_dir: Optional[str] = None) -> Dict:
+    """
+    Lit le manifeste dbt (target/manifest.json), régénéré par `dbt parse` s'il est absent ou périmé
+
+    Args:
+        project_dir (Path): Répertoire du projet dbt
+        profiles_dir (str, optional): Répertoire de profiles.yml
+
+    Returns:
+        Dict: Manifeste dbt
+    """
+    manifest_path = project_dir / "target" / "manifest.json"
+    sources = [p for p in (project_dir / "models").rglob("*") if p.suffix in (".sql", ".yml")]
+    sources.append(project_dir / "dbt_project.yml")
+    if not manifest_path.exists() or max(p.stat().st_mtime for p in sources) > manifest_path.stat().st_mtime:
+        _dbt(["parse"], project_dir, profiles_dir)
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+def affected_models(manifest: Dict, tables: List[str]) -> List[str]:
+    """
+    Modèles en aval des tables sources données, d'après le graphe du manifeste (child_map)
+
+    Args:
+        manifest (Dict): Manifeste dbt
+        tables (List[str]): Tables sources modifiées
+
+    Returns:
+        List[str]: Noms des modèles à reconstruire (raw, staging et marts dépendants)
+    """
+    roots = [
+        unique_id for unique_id, source in manifest["sources"].items()
+        if source["source_name"] == SOURCE_SCHEMA and source["name"] in tables
+    ]
+    seen: Set[str] = set(roots)
+    queue = deque(roots)
+    models = []
+    while queue:
+        for child in manifest["child_map"].get(queue.popleft(), []):
+            if child in seen or not child.startswith("model."):
+                continue
+            seen.add(child)
+            queue.append(child)
+            models.append(manifest["nodes"][child]["name"])
+    return sorted(models)
+
+def run_models(
+    models: List[str],
+    threads: int,
+    project_dir: Path = DBT_PROJECT_DIR,
+    profiles_dir: Optional[str] = None,
+    dbt_vars: Optional[Dict] = None
+) -> Dict[str, float]:
+    """
+    Exécute `dbt run` sur les modèles donnés et relève la durée de chacun (target/run_results.json)
+
+    Args:
+        models (List[str]): Modèles à construire (dbt les ordonne selon leurs dépendances)
+        threads (int): Nombre de modèles construits en parallèle
+        project_dir (Path): Répertoire du projet dbt
+        profiles_dir (str, optional): Répertoire de profiles.yml
+        dbt_vars (Dict, optional): Variables du projet (--vars), dont source_schema
+
+    Returns:
+        Dict[str, float]: Durée d'exécution de chaque modèle (secondes)
+
+    Raises:
+        subprocess.CalledProcessError: Si un modèle échoue
+    """
+    try:
+        args = ["run", "--select", *models, "--threads", str(threads)]
+        if dbt_vars:
+            args += ["--vars", json.dumps(dbt_vars)]
+        _dbt(args, project_dir, profiles_dir)
+    finally:
+        results_path = project_dir / "target" / "run_results.json"
+        timings = {}
+        if results_path.exists():
+            for result in json.loads(results_path.read_text(encoding="utf-8"))["results"]:
+                name = result["unique_id"].split(".")[-1]
+                timings[name] = result["execution_time"]
+                logger.info(f"{name}: {result['status']} en {result['execution_time']:.2f} s")
+    return timings
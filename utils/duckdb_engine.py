@@ -0,0 +1,269 @@
+"""Exécution des modèles dbt de canalbox_project sur DuckDB, à partir des fichiers générés"""
+
+import logging
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("duckdb_engine")
+
+# Projet dbt et schéma de chaque couche (dossier de premier niveau sous models/)
+DBT_PROJECT_DIR = Path(__file__).resolve().parent.parent / "canalbox_project"
+SOURCE_SCHEMA = "canalbox"
+
+# Fonctions PostgreSQL utilisées par les modèles, redéfinies en macros DuckDB
+POSTGRES_MACROS = [
+    """
+    CREATE OR REPLACE MACRO to_char(d, fmt) AS
+        CASE fmt
+            WHEN 'YYYY-MM' THEN strftime(d, '%Y-%m')
+            WHEN 'YYYY-MM-DD' THEN strftime(d, '%Y-%m-%d')
+            WHEN 'Month' THEN rpad(strftime(d, '%B'), 9, ' ')
+            WHEN 'Day' THEN rpad(strftime(d, '%A'), 9, ' ')
+        END
+    """
+]
+
+# Réécritures de syntaxe PostgreSQL sans équivalent direct (motif, remplacement)
+POSTGRES_REWRITES = [
+    # float PostgreSQL = double précision (FLOAT DuckDB = simple précision)
+    (re.compile(r"::\s*float\b", re.IGNORECASE), "::double"),
+    # x = any(liste) -> list_contains(liste, x)
+    (re.compile(r"([\w.]+)\s*=\s*any\s*\(\s*([\w.]+)\s*\)", re.IGNORECASE), r"list_contains(\2, \1)"),
+]
+
+# Agrégats tenus à jour par triggers dans PostgreSQL (init.sql), calculés ici à partir des fichiers
+DERIVED_SOURCES = {
+    "paiements_mensuels": f"""
+        SELECT date_trunc('month', p.date_paiement)::DATE AS mois, p.type_paiement,
+               COALESCE(a.forfait_id, 0) AS forfait_id,
+               COUNT(*) AS nb_paiements,
+               COUNT(*) FILTER (WHERE p.montant > 0) AS nb_reussis,
+               SUM(p.montant) AS montant_total,
+               COALESCE(SUM(p.montant) FILTER (WHERE p.montant > 0), 0) AS montant_reussi,
+               COUNT(DISTINCT p.client_id) FILTER (WHERE p.montant > 0) AS nb_payeurs,
+               COUNT(p.abonnement_id) FILTER (WHERE p.montant > 0) AS nb_abonnements_payes
+        FROM {SOURCE_SCHEMA}.paiements p
+        LEFT JOIN {SOURCE_SCHEMA}.abonnements a ON a.id = p.abonnement_id
+        GROUP BY 1, 2, 3
+    """,
+    "paiements_payeurs_mensuels": f"""
+        SELECT DISTINCT date_trunc('month', p.date_paiement)::DATE AS mois, p.client_id, p.type_paiement,
+               COALESCE(a.forfait_id, 0) AS forfait_id
+        FROM {SOURCE_SCHEMA}.paiements p
+        LEFT JOIN {SOURCE_SCHEMA}.abonnements a ON a.id = p.abonnement_id
+        WHERE p.montant > 0
+    """,
+    # Jeux de données écrits avant --sample-fraction : population complète
+    "echantillonnage": "SELECT 1.0 AS fraction, 1.0 AS poids"
+}
+
+_JINJA = re.compile(r"\{\{(.*?)\}\}", re.DOTALL)
+_CONFIG = re.compile(r"^\s*config\s*\(", re.DOTALL)
+_REF = re.compile(r"^\s*ref\s*\(\s*'(\w+)'\s*\)\s*$")
+_SOURCE = re.compile(r"^\s*source\s*\(\s*'(\w+)'\s*,\s*'(\w+)'\s*\)\s*$")
+_MACRO_CALL = re.compile(r"^\s*(\w+)\s*\(\s*\)\s*$")
+_MACRO_DEF = re.compile(r"\{%-?\s*macro\s+(\w+)\s*\(\s*\)\s*-?%\}(.*?)\{%-?\s*endmacro\s*-?%\}", re.DOTALL)
+
+def discover_models(project_dir: Path = DBT_PROJECT_DIR) -> Dict[str, Tuple[str, str]]:
+    """
+    Liste les modèles SQL du projet dbt
+
+    Args:
+        project_dir (Path): Répertoire du projet dbt
+
+    Returns:
+        Dict[str, Tuple[str, str]]: Nom du modèle -> (schéma de la couche, SQL brut)
+    """
+    models_dir = project_dir / "models"
+    models = {}
+    for path in sorted(models_dir.rglob("*.sql")):
+        layer = path.relative_to(models_dir).parts[0]
+        models[path.stem] = (layer, path.read_text(encoding="utf-8"))
+    return models
+
+@lru_cache(maxsize=None)
+def discover_macros(project_dir: Path = DBT_PROJECT_DIR) -> Dict[str, str]:
+    """
+    Macros sans argument du projet dbt (dossier macros/)
+
+    Args:
+        project_dir (Path): Répertoire du projet dbt
+
+    Returns:
+        Dict[str, str]: Nom de la macro -> corps (SQL avec Jinja)
+    """
+    return {
+        m.group(1): m.group(2).strip()
+        for path in sorted((project_dir / "macros").glob("*.sql"))
+        for m in _MACRO_DEF.finditer(path.read_text(encoding="utf-8"))
+    }
+
+def model_refs(sql: str) -> List[str]:
+    """Modèles référencés par ref() dans un modèle"""
+    return [m.group(1) for m in (_REF.match(expr) for expr in _JINJA.findall(sql)) if m]
+
+def render_jinja(
+    sql: str,
+    models: Dict[str, Tuple[str, str]],
+    ref_schema: Callable[[str], str] = lambda layer: layer,
+    source_schema: str = SOURCE_SCHEMA,
+    macros: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Remplace les expressions Jinja d'un modèle (config, ref, source, appels de macros sans argument)
+
+    Args:
+        sql (str): SQL brut du modèle
+        models (Dict[str, Tuple[str, str]]): Modèles du projet (pour la couche des ref)
+        ref_schema (Callable[[str], str]): Schéma des modèles d'une couche (raw, staging, marts)
+        source_schema (str): Schéma des tables sources
+        macros (Dict[str, str], optional): Macros du projet (discover_macros par défaut)
+
+    Returns:
+        str: SQL sans Jinja
+
+    Raises:
+        ValueError: Si le modèle contient une expression Jinja non prise en charge
+    """
+    if macros is None:
+        macros = discover_macros()
+
+    def replace(match: re.Match) -> str:
+        expr = match.group(1)
+        if _CONFIG.match(expr):
+            return ""
+        ref = _REF.match(expr)
+        if ref:
+            layer, _ = models[ref.group(1)]
+            return f"{ref_schema(layer)}.{ref.group(1)}"
+        source = _SOURCE.match(expr)
+        if source:
+            return f"{source_schema}.{source.group(2)}"
+        call = _MACRO_CALL.match(expr)
+        if call and call.group(1) in macros:
+            return render_jinja(macros[call.group(1)], models, ref_schema, source_schema, macros)
+        raise ValueError(f"Expression Jinja non prise en charge: {{{{{expr}}}}}")
+
+    return _JINJA.sub(replace, sql)
+
+def render_model(sql: str, models: Dict[str, Tuple[str, str]]) -> str:
+    """
+    Rend un modèle (voir render_jinja) et adapte son SQL PostgreSQL à DuckDB
+
+    Args:
+        sql (str): SQL brut du modèle
+        models (Dict[str, Tuple[str, str]]): Modèles du projet
+
+    Returns:
+        str: Requête exécutable par DuckDB
+    """
+    rendered = render_jinja(sql, models)
+    for pattern, replacement in POSTGRES_REWRITES:
+        rendered = pattern.sub(replacement, rendered)
+    return _unnest_generate_series(rendered)
+
+def _unnest_generate_series(sql: str) -> str:
+    """generate_series(...) dans une liste de sélection -> unnest(generate_series(...))"""
+    result, pos = [], 0
+    for match in re.finditer(r"\bgenerate_series\s*\(", sql, re.IGNORECASE):
+        if match.start() < pos:
+            continue
+        depth, end = 1, match.end()
+        while depth:
+            depth += {"(": 1, ")": -1}.get(sql[end], 0)
+            end += 1
+        result.append(sql[pos:match.start()])
+        result.append(f"unnest({sql[match.start():end]})")
+        pos = end
+    result.append(sql[pos:])
+    return "".join(result)
+
+def execution_order(models: Dict[str, Tuple[str, str]], select: Optional[List[str]] = None) -> List[str]:
+    """
+    Ordonne les modèles selon leurs dépendances (tri topologique)
+
+    Args:
+        models (Dict[str, Tuple[str, str]]): Modèles du projet
+        select (List[str], optional): Modèles demandés (avec leurs ancêtres) ; tous par défaut
+
+    Returns:
+        List[str]: Modèles dans l'ordre d'exécution
+    """
+    order: List[str] = []
+    visiting = set()
+
+    def visit(name: str) -> None:
+        if name in order:
+            return
+        if name not in models:
+            raise ValueError(f"Modèle inconnu: {name}")
+        if name in visiting:
+            raise ValueError(f"Dépendance circulaire sur le modèle {name}")
+        visiting.add(name)
+        for parent in model_refs(models[name][1]):
+            visit(parent)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in select or models:
+        visit(name)
+    return order
+
+def register_sources(con, data_dir: str, fmt: str = "parquet") -> List[str]:
+    """
+    Déclare les tables sources (schéma canalbox) comme vues sur les fichiers générés
+
+    Les agrégats tenus à jour par triggers dans PostgreSQL (DERIVED_SOURCES)
+    sont déclarés comme vues sur les tables sources.
+
+    Args:
+        con: Connexion DuckDB
+        data_dir (str): Répertoire de sortie de generate.py --output parquet|csv
+        fmt (str): Format des fichiers (parquet ou csv)
+
+    Returns:
+        List[str]: Tables sources déclarées
+    """
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SOURCE_SCHEMA}")
+    tables = []
+    for table_dir in sorted(p for p in Path(data_dir).iterdir() if p.is_dir()):
+        if fmt == "parquet":
+            reader = f"read_parquet('{table_dir.as_posix()}/**/*.parquet', hive_partitioning = false)"
+        else:
+            reader = f"read_csv('{table_dir.as_posix()}/**/*.csv.gz', header = true, hive_partitioning = false)"
+        con.execute(f"CREATE OR REPLACE VIEW {SOURCE_SCHEMA}.{table_dir.name} AS SELECT * FROM {reader}")
+        tables.append(table_dir.name)
+    for table, query in DERIVED_SOURCES.items():
+        if table not in tables:
+            con.execute(f"CREATE OR REPLACE VIEW {SOURCE_SCHEMA}.{table} AS {query}")
+            tables.append(table)
+    return tables
+
+def run_models(con, select: Optional[List[str]] = None, project_dir: Path = DBT_PROJECT_DIR) -> Dict[str, float]:
+    """
+    Matérialise les modèles en tables DuckDB (schémas raw, staging, marts)
+
+    Args:
+        con: Connexion DuckDB dont les sources sont déclarées (register_sources)
+        select (List[str], optional): Modèles à construire (avec leurs ancêtres)
+        project_dir (Path): Répertoire du projet dbt
+
+    Returns:
+        Dict[str, float]: Durée d'exécution de chaque modèle (secondes)
+    """
+    for macro in POSTGRES_MACROS:
+        con.execute(macro)
+
+    models = discover_models(project_dir)
+    timings = {}
+    for name in execution_order(models, select):
+        layer, sql = models[name]
+        con.execute(f"CREATE SCHEMA IF NOT EXISTS {layer}")
+        start = time.perf_counter()
+        con.execute(f"CREATE OR REPLACE TABLE {layer}.{name} AS {render_model(sql, models)}")
+        timings[name] = time.perf_counter() - start
+        logger.info(f"{layer}.{name}: {timings[name]:.3f} s")
+    return timings
@@ -0,0 +1,228 @@
+"""Extraction en flux de tables ou de requêtes PostgreSQL vers des fichiers Parquet / CSV"""
+
+import csv
+import gzip
+import logging
+import re
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from utils.sinks import PARTITION_COLUMNS
+
+logger = logging.getLogger("extract")
+
+# Colonne de date filtrée par --since / --until : celle qui partitionne chaque table,
+# indexée dans init.sql (idx_*_created_at, idx_*_date, idx_installations_date_planifiee, ...)
+DATE_COLUMNS = {table: col for table, col in PARTITION_COLUMNS.items() if col is not None}
+
+_IDENTIFIER = re.compile(r"^\w+(\.\w+)?$")
+
+def build_query(
+    conn,
+    table: Optional[str] = None,
+    query: Optional[str] = None,
+    date_column: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None
+) -> str:
+    """
+    Construit la requête d'extraction d'une table (éventuellement schema.table) ou d'une requête libre
+
+    Le filtre de dates est une plage semi-ouverte [since, until) sur la colonne
+    brute (sans fonction ni conversion), afin que PostgreSQL puisse parcourir
+    l'index de la colonne plutôt que la table entière.
+
+    Args:
+        conn: Connexion psycopg2 (pour l'échappement des identifiants et valeurs)
+        table (str, optional): Table ou mart à extraire
+        query (str, optional): Requête SELECT libre (exclusif avec table)
+        date_column (str, optional): Colonne filtrée (par défaut celle de DATE_COLUMNS pour une table connue)
+        since (date, optional): Date de début incluse
+        until (date, optional): Date de fin exclue
+
+    Returns:
+        str: Requête SQL prête à exécuter
+
+    Raises:
+        ValueError: Si la source est absente, ambiguë, ou si un filtre de dates n'a pas de colonne
+    """
+    if (table is None) == (query is None):
+        raise ValueError("Indiquer une table ou une requête à extraire")
+
+    if table is not None:
+        if not _IDENTIFIER.match(table):
+            raise ValueError(f"Nom de table invalide: {table}")
+        source = sql.SQL("SELECT * FROM {}").format(sql.Identifier(*table.split(".")))
+        date_column = date_column or DATE_COLUMNS.get(table.split(".")[-1])
+    else:
+        source = sql.SQL("SELECT * FROM ({}) q").format(sql.SQL(query.strip().rstrip(";")))
+
+    conditions = []
+    if since is not None or until is not None:
+        if date_column is None:
+            raise ValueError("Un filtre de dates nécessite une colonne de date (--date-column)")
+        column = sql.Identifier(date_column)
+        if since is not None:
+            conditions.append(sql.SQL("{} >= {}").format(column, sql.Literal(since)))
+        if until is not None:
+            conditions.append(sql.SQL("{} < {}").format(column, sql.Literal(until)))
+
+    if conditions:
+        source = sql.SQL("{} WHERE {}").format(source, sql.SQL(" AND ").join(conditions))
+    return source.as_string(conn)
+
+def stream_rows(conn, query: str, chunk_size: int) -> Tuple[List[str], List[int], Iterator[List[Tuple]]]:
+    """
+    Exécute une requête dans un curseur nommé (côté serveur) et en lit les lignes par lots
+
+    Seul le lot courant est en mémoire côté client, quelle que soit la taille du résultat.
+    La connexion ne doit pas être en autocommit (un curseur nommé vit dans une transaction).
+
+    Args:
+        conn: Connexion psycopg2
+        query (str): Requête à exécuter
+        chunk_size (int): Nombre de lignes par lot
+
+    Returns:
+        Tuple[List[str], List[int], Iterator[List[Tuple]]]: Noms et types (OID) des colonnes, lots de lignes
+    """
+    cursor = conn.cursor(name="canalbox_extract")
+    cursor.itersize = chunk_size
+    cursor.execute(query)
+    # La description n'est disponible qu'après la première lecture
+    first = cursor.fetchmany(chunk_size)
+    columns = [col.name for col in cursor.description]
+    type_codes = [col.type_code for col in cursor.description]
+
+    def batches() -> Iterator[List[Tuple]]:
+        try:
+            batch = first
+            while batch:
+                yield batch
+                batch = cursor.fetchmany(chunk_size)
+        finally:
+            cursor.close()
+            conn.rollback()
+
+    return columns, type_codes, batches()
+
+def _arrow_type(type_code: int):
+    """Type Arrow correspondant à un type PostgreSQL (OID), texte par défaut"""
+    import pyarrow as pa
+
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }.get(type_code, pa.string())
+
+def _convert(value, arrow_type):
+    """Adapte une valeur psycopg2 au type Arrow de sa colonne"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    if arrow_type == "string" and not isinstance(value, str):
+        return str(value)
+    return value
+
+def write_parquet(path: Path, columns: List[str], type_codes: List[int], batches: Iterator[List[Tuple]],
+                  row_group_size: int) -> int:
+    """Écrit les lots dans un fichier Parquet, un groupe de lignes par lot"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Schéma fixé d'après les types PostgreSQL : identique pour tous les lots, même entièrement NULL
+    schema = pa.schema([(name, _arrow_type(code)) for name, code in zip(columns, type_codes)])
+    n_rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            arrays = [
+                pa.array([_convert(row[i], str(field.type)) for row in batch], type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=row_group_size)
+            n_rows += len(batch)
+    return n_rows
+
+def write_csv(path: Path, columns: List[str], batches: Iterator[List[Tuple]]) -> int:
+    """Écrit les lots dans un fichier CSV compressé (gzip)"""
+    n_rows = 0
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            n_rows += len(batch)
+    return n_rows
+
+def copy_csv(conn, query: str, path: Path) -> int:
+    """
+    Extrait une requête en CSV compressé via COPY ... TO STDOUT
+
+    Le flux CSV produit par le serveur est écrit au fil de l'eau dans le fichier,
+    sans passer par des objets Python ligne à ligne.
+
+    Returns:
+        int: Nombre de lignes extraites
+    """
+    with gzip.open(path, "wb") as f, conn.cursor() as cursor:
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        n_rows = cursor.rowcount
+    conn.rollback()
+    return n_rows
+
+def extract(
+    conn,
+    query: str,
+    output_path: Path,
+    fmt: str = "parquet",
+    method: str = "cursor",
+    chunk_size: int = 50_000
+) -> Dict[str, float]:
+    """
+    Extrait le résultat d'une requête vers un fichier, en mémoire constante
+
+    Args:
+        conn: Connexion psycopg2
+        query (str): Requête à extraire (voir build_query)
+        output_path (Path): Fichier de sortie
+        fmt (str): parquet ou csv
+        method (str): cursor (curseur nommé) ou copy (COPY TO STDOUT, CSV uniquement)
+        chunk_size (int): Lignes lues par aller-retour (et par groupe de lignes Parquet)
+
+    Returns:
+        Dict[str, float]: Nombre de lignes et durée de l'extraction
+
+    Raises:
+        ValueError: Si la combinaison format / méthode n'est pas prise en charge
+    """
+    if method == "copy" and fmt != "csv":
+        raise ValueError("L'extraction par COPY ne produit que du CSV")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    if method == "copy":
+        n_rows = copy_csv(conn, query, output_path)
+    else:
+        columns, type_codes, batches = stream_rows(conn, query, chunk_size)
+        if fmt == "parquet":
+            n_rows = write_parquet(output_path, columns, type_codes, batches, chunk_size)
+        else:
+            n_rows = write_csv(output_path, columns, batches)
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"{output_path}: {n_rows} lignes extraites en {elapsed:.2f} s")
+    return {"rows": n_rows, "seconds": elapsed}
@@ -0,0 +1,293 @@
+"""Audit des index : redondances, utilisation par les requêtes analytiques et coût à l'écriture"""
+
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+logger = logging.getLogger("index_audit")
+
+INIT_SQL = Path(__file__).resolve().parent.parent / "init.sql"
+
+# Fonctions dont la valeur change d'une exécution à l'autre : interdites dans un prédicat d'index
+_VOLATILE_IN_PREDICATE = re.compile(r"\b(current_date|current_timestamp|localtimestamp|now\s*\(|random\s*\()", re.IGNORECASE)
+_CREATE_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(\w+)\s+ON\s+(\w+)\s*\(([^)]*)\)\s*(?:WHERE\s+([^;]+))?;",
+    re.IGNORECASE
+)
+
+def declared_indexes(path: Path = INIT_SQL) -> Dict[str, Dict]:
+    """
+    Index déclarés explicitement dans init.sql (CREATE INDEX)
+
+    Args:
+        path (Path): Script de création de la base
+
+    Returns:
+        Dict[str, Dict]: Nom -> {"table", "columns", "predicate"}
+    """
+    return {
+        m.group(1): {
+            "table": m.group(2),
+            "columns": [c.strip() for c in m.group(3).split(",")],
+            "predicate": m.group(4).strip() if m.group(4) else None
+        }
+        for m in _CREATE_INDEX.finditer(path.read_text(encoding="utf-8"))
+    }
+
+def catalog_indexes(conn) -> Dict[str, Dict]:
+    """
+    Index présents dans le schéma public, avec leurs colonnes, contrainte éventuelle et taille
+
+    Args:
+        conn: Connexion psycopg2
+
+    Returns:
+        Dict[str, Dict]: Nom -> {"table", "columns", "unique", "constraint", "foreign_key", "predicate", "method", "size"}
+    """
+    with conn.cursor() as cursor:
+        # Colonnes des clés étrangères de chaque table
+        cursor.execute(
+            """
+            SELECT t.relname, ARRAY(
+                       SELECT a.attname
+                       FROM unnest(con.conkey) WITH ORDINALITY k(attnum, n)
+                       JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                       ORDER BY k.n
+                   )
+            FROM pg_constraint con
+            JOIN pg_class t ON t.oid = con.conrelid
+            JOIN pg_namespace ns ON ns.oid = t.relnamespace
+            WHERE con.contype = 'f' AND ns.nspname = 'public'
+            """
+        )
+        foreign_keys = defaultdict(list)
+        for table, columns in cursor.fetchall():
+            foreign_keys[table].append(list(columns))
+
+        cursor.execute(
+            """
+            SELECT ic.relname,
+                   t.relname,
+                   ARRAY(
+                       SELECT COALESCE(a.attname, '(expression)')
+                       FROM unnest(ix.indkey::INT2[]) WITH ORDINALITY k(attnum, n)
+                       LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                       ORDER BY k.n
+                   ),
+                   ix.indisunique,
+                   con.contype,
+                   pg_get_expr(ix.indpred, ix.indrelid),
+                   am.amname,
+                   pg_relation_size(ic.oid)
+            FROM pg_index ix
+            JOIN pg_class ic ON ic.oid = ix.indexrelid
+            JOIN pg_class t ON t.oid = ix.indrelid
+            JOIN pg_namespace ns ON ns.oid = t.relnamespace
+            JOIN pg_am am ON am.oid = ic.relam
+            LEFT JOIN pg_constraint con ON con.conindid = ix.indexrelid AND con.contype IN ('p', 'u')
+            WHERE ns.nspname = 'public'
+            """
+        )
+        return {
+            name: {
+                "table": table,
+                "columns": list(columns),
+                "unique": unique,
+                "constraint": {"p": "clé primaire", "u": "unicité"}.get(contype),
+                # L'index sert la vérification de la clé étrangère (suppression / mise à jour du parent)
+                "foreign_key": any(columns[:len(fk)] == fk for fk in foreign_keys[table]),
+                "predicate": predicate,
+                "method": method,
+                "size": size
+            }
+            for name, table, columns, unique, contype, predicate, method, size in cursor.fetchall()
+        }
+
+def redundant_indexes(indexes: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Index non uniques couverts par un autre index de la même table
+
+    Un index B-tree est redondant si ses colonnes sont identiques à celles d'un
+    autre index, ou en forment un préfixe, avec le même prédicat : l'autre index
+    sert les mêmes recherches. Les index portant une contrainte ne sont jamais
+    proposés ; à colonnes identiques, l'index de contrainte est conservé.
+
+    Args:
+        indexes (Dict[str, Dict]): Index du catalogue (voir catalog_indexes)
+
+    Returns:
+        Dict[str, str]: Index redondant -> index qui le couvre
+    """
+    redundant = {}
+    for name, idx in indexes.items():
+        if idx["constraint"] or idx["unique"] or idx["method"] != "btree":
+            continue
+        n = len(idx["columns"])
+        covering = [
+            other_name for other_name, other in indexes.items()
+            if other_name != name
+            and other["table"] == idx["table"]
+            and other["method"] == "btree"
+            and other["predicate"] == idx["predicate"]
+            and other["columns"][:n] == idx["columns"]
+            # À colonnes identiques, ne garder qu'un index (celui de contrainte, sinon le premier par nom)
+            and (len(other["columns"]) > n or other["constraint"] or other["unique"] or other_name < name)
+        ]
+        if covering:
+            # Préférer l'index de contrainte, puis le plus étroit
+            covering.sort(key=lambda o: (indexes[o]["constraint"] is None, len(indexes[o]["columns"]), o))
+            redundant[name] = covering[0]
+    return redundant
+
+def index_counters(conn) -> Dict[str, Dict[str, int]]:
+    """
+    Compteurs cumulés de chaque index : parcours (lecture) et blocs accédés (lecture et écriture)
+
+    Args:
+        conn: Connexion psycopg2 en autocommit
+
+    Returns:
+        Dict[str, Dict[str, int]]: Nom -> {"scans", "blocks", "size"}
+    """
+    with conn.cursor() as cursor:
+        # Relire les statistiques à jour plutôt que l'instantané de la transaction
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(
+            """
+            SELECT s.indexrelname, s.idx_scan, io.idx_blks_hit + io.idx_blks_read, pg_relation_size(s.indexrelid)
+            FROM pg_stat_user_indexes s
+            JOIN pg_statio_user_indexes io ON io.indexrelid = s.indexrelid
+            WHERE s.schemaname = 'public'
+            """
+        )
+        return {name: {"scans": scans, "blocks": blocks, "size": size} for name, scans, blocks, size in cursor.fetchall()}
+
+def counters_delta(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """Variation des compteurs entre deux relevés"""
+    return {
+        name: {key: value - before.get(name, {}).get(key, 0) for key, value in values.items()}
+        for name, values in after.items()
+    }
+
+def wait_for_stats_flush(seconds: float = 1.5) -> None:
+    """Laisse aux sessions terminées le temps de publier leurs statistiques"""
+    time.sleep(seconds)
+
+def plan_index_usage(conn, queries: Dict[str, str]) -> Dict[str, Set[str]]:
+    """
+    Index utilisés par le plan (EXPLAIN, sans exécution) de chaque requête
+
+    Args:
+        conn: Connexion psycopg2
+        queries (Dict[str, str]): Requêtes nommées
+
+    Returns:
+        Dict[str, Set[str]]: Index -> requêtes dont le plan l'utilise
+    """
+    usage: Dict[str, Set[str]] = defaultdict(set)
+    with conn.cursor() as cursor:
+        for name, query in queries.items():
+            try:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}")
+            except Exception as e:
+                logger.warning(f"Plan indisponible pour {name}: {e}")
+                conn.rollback()
+                continue
+            plan = cursor.fetchone()[0]
+            for index in _plan_indexes(plan if isinstance(plan, list) else json.loads(plan)):
+                usage[index].add(name)
+            conn.rollback()
+    return usage
+
+def _plan_indexes(node) -> Iterable[str]:
+    if isinstance(node, dict):
+        if "Index Name" in node:
+            yield node["Index Name"]
+        for value in node.values():
+            yield from _plan_indexes(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _plan_indexes(value)
+
+def audit(
+    declared: Dict[str, Dict],
+    indexes: Dict[str, Dict],
+    read_delta: Dict[str, Dict[str, int]],
+    plan_usage: Dict[str, Set[str]],
+    write_delta: Dict[str, Dict[str, int]],
+    costly_ratio: float = 100.0
+) -> List[Dict]:
+    """
+    Classe chaque index d'après les mesures
+
+    Constats possibles (un index peut en cumuler plusieurs) :
+    - non_cree : déclaré dans init.sql mais absent de la base (création en échec)
+    - predicat_non_immuable : prédicat figé ou refusé (CURRENT_DATE, now(), ...)
+    - redondant : couvert par un autre index (voir redundant_indexes)
+    - inutilise : aucun parcours pendant la charge de lecture ni dans les plans
+    - couteux : plus de costly_ratio blocs accédés pendant la charge d'écriture
+      par parcours en lecture (index peu utilisé au regard de sa maintenance)
+
+    La suppression est proposée pour les index redondants, et pour les index
+    inutilisés qui ne portent ni contrainte ni clé étrangère (ces derniers
+    évitent un parcours de la table enfant à chaque suppression d'un parent).
+
+    Args:
+        declared (Dict[str, Dict]): Index de init.sql
+        indexes (Dict[str, Dict]): Index du catalogue
+        read_delta (Dict[str, Dict[str, int]]): Compteurs pendant la charge de lecture
+        plan_usage (Dict[str, Set[str]]): Requêtes utilisant chaque index
+        write_delta (Dict[str, Dict[str, int]]): Compteurs pendant la charge d'écriture (vide si non mesurée)
+        costly_ratio (float): Blocs écrits par parcours en lecture au-delà desquels un index est coûteux
+
+    Returns:
+        List[Dict]: Un constat par index, les plus coûteux à l'écriture d'abord
+    """
+    redundant = redundant_indexes(indexes)
+    total_write_blocks = sum(d["blocks"] for d in write_delta.values()) or 1
+    findings = []
+
+    for name in sorted(set(declared) | set(indexes)):
+        idx = indexes.get(name)
+        decl = declared.get(name, {})
+        predicate = (idx or decl).get("predicate")
+        reads = read_delta.get(name, {}).get("scans", 0)
+        write_blocks = write_delta.get(name, {}).get("blocks", 0)
+        used = reads > 0 or bool(plan_usage.get(name))
+
+        issues = []
+        if idx is None:
+            issues.append("non_cree")
+        if predicate and _VOLATILE_IN_PREDICATE.search(predicate):
+            issues.append("predicat_non_immuable")
+        if name in redundant:
+            issues.append("redondant")
+        if idx is not None and not used and not idx["constraint"]:
+            issues.append("inutilise")
+        if idx is not None and not idx["constraint"] and write_delta and write_blocks > costly_ratio * max(reads, 1):
+            issues.append("couteux")
+
+        findings.append({
+            "index": name,
+            "table": (idx or decl).get("table"),
+            "colonnes": (idx or decl).get("columns"),
+            "contrainte": idx["constraint"] if idx else None,
+            "cle_etrangere": idx["foreign_key"] if idx else False,
+            "taille": idx["size"] if idx else 0,
+            "parcours_lecture": reads,
+            "requetes": sorted(plan_usage.get(name, ())),
+            "blocs_ecriture": write_blocks,
+            "part_ecriture": write_blocks / total_write_blocks if write_delta else None,
+            "couvert_par": redundant.get(name),
+            "constats": issues,
+            "suppression_proposee": idx is not None and not idx["constraint"] and (
+                "redondant" in issues or ("inutilise" in issues and not idx["foreign_key"])
+            )
+        })
+
+    findings.sort(key=lambda f: f["blocs_ecriture"], reverse=True)
+    return findings
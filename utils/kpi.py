@@ -0,0 +1,439 @@
+"""Indicateurs des marts calculés en mémoire à partir des données générées, pour contrôler les marts dbt"""
+
+import math
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Indicateurs recalculés : mart -> (colonne clé, colonnes comparées)
+KPI_MARTS = {
+    "fact_monthly_revenue": ("payment_ym", [
+        "total_revenue", "paying_clients", "transactions", "avg_transaction_value",
+        "expected_revenue", "subscribed_clients", "conversion_rate_percent"
+    ]),
+    "fact_churn_analysis": ("client_id", [
+        "total_subscriptions", "active_subscriptions", "recent_churns", "historical_churns", "total_churns",
+        "avg_subscription_duration", "churned_revenue", "churn_rate_percent"
+    ]),
+    "fact_customer_ltv": ("client_id", [
+        "first_payment_date", "last_payment_date", "total_revenue", "total_subscriptions", "total_payments",
+        "engagement_months", "monthly_ltv"
+    ]),
+    "fact_installation_efficiency": ("installation_month", [
+        "total_installations", "completed_installations", "on_time_installations", "failed_installations",
+        "avg_delay_days", "avg_lead_time_days", "completion_rate_percent", "on_time_rate_percent"
+    ]),
+    "fact_technician_performance": ("technician_id", [
+        "total_assignments", "completed_installations", "on_time_installations", "avg_delay_days", "avg_lead_time_days"
+    ])
+}
+
+# Ordinal du 1970-01-01 : origine des datetime64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class GeneratedColumns:
+    """
+    Colonnes des tables générées, extraites une seule fois chacune en tableaux numpy
+
+    Les identifiants (UUID) sont remplacés par l'indice de la ligne dans leur
+    table (codes entiers, -1 pour une référence nulle) : regroupements et
+    jointures se font sur des entiers, et seuls les identifiants des lignes de
+    résultat sont convertis en texte.
+
+    Args:
+        data (Dict[str, List]): Tables générées (sortie de generate_data ou des points de reprise)
+    """
+
+    def __init__(self, data: Dict[str, List]):
+        self.data = data
+        self._cache: Dict[Tuple[str, str], np.ndarray] = {}
+        self._index: Dict[str, Dict] = {}
+
+    def __contains__(self, table: str) -> bool:
+        return table in self.data
+
+    def values(self, table: str, name: str) -> List:
+        """Valeurs brutes d'une colonne"""
+        records = self.data[table]
+        if table == "installation_techniciens":
+            return records.values(name).tolist()
+        return [getattr(record, name) for record in records]
+
+    def _cached(self, key: Tuple[str, str], build) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def numbers(self, table: str, name: str) -> np.ndarray:
+        """Colonne numérique (float64)"""
+        return self._cached((table, name), lambda: np.fromiter(self.values(table, name), dtype=float, count=len(self.data[table])))
+
+    def days(self, table: str, name: str) -> np.ndarray:
+        """Colonne de dates en datetime64[D] (NaT pour une date nulle)"""
+        def build():
+            ordinals = np.fromiter(
+                (d.toordinal() if d is not None else -1 for d in self.values(table, name)),
+                dtype=np.int64, count=len(self.data[table])
+            )
+            days = (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]")
+            days[ordinals < 0] = np.datetime64("NaT")
+            return days
+        return self._cached((table, name), build)
+
+    def codes(self, table: str, name: str, parent: str) -> np.ndarray:
+        """Référence vers une table parente -> indice de la ligne parente (-1 si nulle)"""
+        if table == "installation_techniciens":
+            # TechnicianAssignments : déjà des indices dans les tables installations et techniciens
+            return self.data[table].codes(name).astype(np.int64)
+        def build():
+            if parent not in self._index:
+                self._index[parent] = {record.id: i for i, record in enumerate(self.data[parent])}
+            index = self._index[parent]
+            return np.fromiter(
+                (index[v] if v is not None else -1 for v in self.values(table, name)),
+                dtype=np.int64, count=len(self.data[table])
+            )
+        return self._cached((table, name), build)
+
+    def ids(self, table: str, rows: np.ndarray) -> List[str]:
+        """Identifiants (texte) des lignes données d'une table"""
+        records = self.data[table]
+        return [str(records[i].id) for i in rows]
+
+def _codes(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Clés distinctes triées et indice de groupe de chaque ligne"""
+    return np.unique(keys, return_inverse=True)
+
+def _distinct_count(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Nombre de valeurs distinctes par groupe (count(distinct ...))"""
+    if len(groups) == 0:
+        return np.zeros(n_groups, dtype=int)
+    _, values_codes = _codes(values)
+    width = values_codes.max() + 1
+    pairs = np.unique(groups.astype(np.int64) * width + values_codes)
+    return np.bincount(pairs // width, minlength=n_groups)
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """numerator / denominator * scale, 0 si le dénominateur est nul (case when ... > 0 des marts)"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.zeros_like(numerator)
+    np.divide(numerator * scale, denominator, out=out, where=denominator > 0)
+    return out
+
+def _mean(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Moyenne par groupe des valeurs non manquantes (NaN), None si aucune (avg SQL)"""
+    present = ~np.isnan(values)
+    sums = np.bincount(groups[present], weights=values[present], minlength=n_groups)
+    counts = np.bincount(groups[present], minlength=n_groups)
+    return np.array([float(s / c) if c else None for s, c in zip(sums, counts)], dtype=object)
+
+def _months(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mois distincts en 'YYYY-MM' (to_char(d, 'YYYY-MM')) et indice du mois de chaque date"""
+    months, groups = _codes(days.astype("datetime64[M]"))
+    return np.datetime_as_string(months, unit="M"), groups
+
+def _rows(keys: Sequence, **columns: Sequence) -> Dict[str, Dict]:
+    """Assemble les colonnes calculées en lignes indexées par la clé du mart"""
+    names = list(columns)
+    # tolist() : types Python natifs (datetime64[D] -> date), sans conversion valeur par valeur
+    values = [np.asarray(column).tolist() for column in columns.values()]
+    return {str(key): dict(zip(names, row)) for key, *row in zip(keys, *values)}
+
+def _age_months(first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Mois entiers entre deux dates, comme extract(year) * 12 + extract(month) de age() PostgreSQL"""
+    first_months, last_months = first.astype("datetime64[M]"), last.astype("datetime64[M]")
+    first_day = (first - first_months.astype("datetime64[D]")).astype(int)
+    last_day = (last - last_months.astype("datetime64[D]")).astype(int)
+    return (last_months - first_months).astype(int) - (last_day < first_day)
+
+def monthly_revenue(cols: GeneratedColumns, forfaits: List[Dict]) -> Dict[str, Dict]:
+    """
+    Revenu mensuel (fact_monthly_revenue), par mois de paiement
+
+    Les mois sans paiement réussi, qui n'ont que des débuts d'abonnements
+    (lignes à payment_ym nul dans le mart), ne sont pas repris.
+
+    Args:
+        cols (GeneratedColumns): Tables générées
+        forfaits (List[Dict]): Forfaits (id, prix_mensuel)
+
+    Returns:
+        Dict[str, Dict]: 'YYYY-MM' -> indicateurs
+    """
+    amounts = cols.numbers("paiements", "montant")
+    success = amounts > 0
+    months, groups = _months(cols.days("paiements", "date_paiement")[success])
+    n = len(months)
+    revenue = np.bincount(groups, weights=amounts[success], minlength=n)
+    successful = np.bincount(groups, minlength=n)
+    with_subscription = cols.codes("paiements", "abonnement_id", "abonnements")[success] >= 0
+    transactions = np.bincount(groups, weights=with_subscription, minlength=n)
+    payers = _distinct_count(groups, cols.codes("paiements", "client_id", "clients")[success], n)
+
+    # Valeur attendue des abonnements, par mois de début
+    prices = {f["id"]: f["prix_mensuel"] for f in forfaits}
+    plan_prices = np.array([prices.get(f, 0) for f in cols.values("abonnements", "forfait_id")], dtype=float)
+    sub_months, sub_groups = _months(cols.days("abonnements", "date_debut"))
+    values = plan_prices * cols.numbers("abonnements", "duree_renouvellement")
+    expected = dict(zip(sub_months, np.bincount(sub_groups, weights=values, minlength=len(sub_months))))
+    subscribed = dict(zip(sub_months, _distinct_count(
+        sub_groups, cols.codes("abonnements", "client_id", "clients"), len(sub_months)
+    )))
+    subscribed_clients = np.array([subscribed.get(m, 0) for m in months])
+
+    return _rows(
+        months,
+        total_revenue=revenue.astype(np.int64),
+        paying_clients=payers,
+        transactions=transactions.astype(np.int64),
+        avg_transaction_value=revenue / successful,
+        expected_revenue=np.array([expected.get(m) for m in months], dtype=object),
+        subscribed_clients=np.where(subscribed_clients > 0, subscribed_clients, None),
+        conversion_rate_percent=_ratio(payers, subscribed_clients, 100)
+    )
+
+def churn_analysis(cols: GeneratedColumns, forfaits: List[Dict], today: date) -> Dict[str, Dict]:
+    """
+    Churn par client (fact_churn_analysis)
+
+    Un abonnement terminé depuis moins de 30 jours est un churn récent, au-delà
+    un churn historique ; il est actif tant que sa date de fin n'est pas passée.
+
+    Args:
+        cols (GeneratedColumns): Tables générées
+        forfaits (List[Dict]): Forfaits (id, prix_mensuel)
+        today (date): Date de référence (current_date des marts)
+
+    Returns:
+        Dict[str, Dict]: Identifiant du client -> indicateurs
+    """
+    clients, groups = _codes(cols.codes("abonnements", "client_id", "clients"))
+    n = len(clients)
+    starts, ends = cols.days("abonnements", "date_debut"), cols.days("abonnements", "date_fin")
+    today64 = np.datetime64(today, "D")
+    active = ends >= today64
+    recent = ~active & (ends >= today64 - 30)
+    historical = ~active & ~recent
+    churned = recent | historical
+    prices = {f["id"]: f["prix_mensuel"] for f in forfaits}
+    monthly_prices = np.array([prices.get(f, 0) for f in cols.values("abonnements", "forfait_id")], dtype=float)
+
+    total = np.bincount(groups, minlength=n)
+    churns = np.bincount(groups, weights=churned, minlength=n)
+    return _rows(
+        cols.ids("clients", clients),
+        total_subscriptions=total,
+        active_subscriptions=np.bincount(groups, weights=active, minlength=n).astype(int),
+        recent_churns=np.bincount(groups, weights=recent, minlength=n).astype(int),
+        historical_churns=np.bincount(groups, weights=historical, minlength=n).astype(int),
+        total_churns=churns.astype(int),
+        avg_subscription_duration=_mean(groups, (ends - starts).astype(float), n),
+        churned_revenue=np.bincount(groups, weights=monthly_prices * churned, minlength=n).astype(np.int64),
+        churn_rate_percent=_ratio(churns, total, 100)
+    )
+
+def customer_ltv(cols: GeneratedColumns) -> Dict[str, Dict]:
+    """
+    Valeur client (fact_customer_ltv), par client ayant au moins un paiement réussi
+
+    La durée d'engagement compte les mois entiers entre le premier et le dernier
+    paiement, comme age() de PostgreSQL (années * 12 + mois).
+
+    Args:
+        cols (GeneratedColumns): Tables générées
+
+    Returns:
+        Dict[str, Dict]: Identifiant du client -> indicateurs
+    """
+    amounts = cols.numbers("paiements", "montant")
+    success = amounts > 0
+    clients, groups = _codes(cols.codes("paiements", "client_id", "clients")[success])
+    n = len(clients)
+    amounts = amounts[success]
+    days = cols.days("paiements", "date_paiement")[success]
+
+    # Premier et dernier paiement : tri par (client, date)
+    order = np.lexsort((days, groups))
+    bounds = np.searchsorted(groups[order], np.arange(n + 1))
+    first = days[order][bounds[:-1]]
+    last = days[order][bounds[1:] - 1]
+    engagement = _age_months(first, last)
+
+    revenue = np.bincount(groups, weights=amounts, minlength=n)
+    subscriptions = cols.codes("paiements", "abonnement_id", "abonnements")[success]
+    with_subscription = subscriptions >= 0
+    return _rows(
+        cols.ids("clients", clients),
+        first_payment_date=first,
+        last_payment_date=last,
+        total_revenue=revenue.astype(np.int64),
+        total_subscriptions=_distinct_count(groups[with_subscription], subscriptions[with_subscription], n),
+        total_payments=np.bincount(groups, minlength=n),
+        engagement_months=engagement,
+        monthly_ltv=_ratio(revenue, engagement)
+    )
+
+def _installation_columns(cols: GeneratedColumns) -> Dict[str, np.ndarray]:
+    """Colonnes dérivées des installations (fact_installations)"""
+    planned = cols.days("installations", "date_planifiee")
+    actual = cols.days("installations", "date_realisation")
+    called = cols.days("installations", "date_appel")
+    completed = ~np.isnat(actual)
+    return {
+        "planned": planned,
+        "completed": completed,
+        "on_time": completed & (actual <= planned),
+        "delay": np.where(completed, (actual - planned).astype(float), np.nan),
+        "lead_time": np.where(completed, (actual - called).astype(float), np.nan)
+    }
+
+def installation_efficiency(cols: GeneratedColumns) -> Dict[str, Dict]:
+    """
+    Délais et réussite des installations (fact_installation_efficiency), par mois planifié
+
+    Args:
+        cols (GeneratedColumns): Tables générées
+
+    Returns:
+        Dict[str, Dict]: 'YYYY-MM' -> indicateurs
+    """
+    inst = _installation_columns(cols)
+    months, groups = _months(inst["planned"])
+    n = len(months)
+    total = np.bincount(groups, minlength=n)
+    completed = np.bincount(groups, weights=inst["completed"], minlength=n)
+    on_time = np.bincount(groups, weights=inst["on_time"], minlength=n)
+    return _rows(
+        months,
+        total_installations=total,
+        completed_installations=completed.astype(int),
+        on_time_installations=on_time.astype(int),
+        failed_installations=(total - completed).astype(int),
+        avg_delay_days=_mean(groups, inst["delay"], n),
+        avg_lead_time_days=_mean(groups, inst["lead_time"], n),
+        completion_rate_percent=_ratio(completed, total, 100),
+        on_time_rate_percent=_ratio(on_time, completed, 100)
+    )
+
+def technician_performance(cols: GeneratedColumns) -> Dict[str, Dict]:
+    """
+    Activité et notes des techniciens (fact_technician_performance), par technicien
+
+    La note moyenne (avg_technician_rating) est celle des feedbacks des
+    installations du technicien ; elle n'a pas d'équivalent dans le mart.
+
+    Args:
+        cols (GeneratedColumns): Tables générées (installation_techniciens et feedback requis)
+
+    Returns:
+        Dict[str, Dict]: Identifiant du technicien -> indicateurs
+    """
+    n = len(cols.data["techniciens"])
+    n_installations = len(cols.data["installations"])
+    inst = _installation_columns(cols)
+    rows = cols.codes("installation_techniciens", "installation_id", "installations")
+    groups = cols.codes("installation_techniciens", "technicien_id", "techniciens")
+
+    # Note des techniciens : feedbacks de chaque installation, reportés sur ses techniciens
+    fb_rows = cols.codes("feedback", "installation_id", "installations")
+    ratings = cols.numbers("feedback", "note_techniciens")
+    rating_sums = np.bincount(fb_rows, weights=ratings, minlength=n_installations)
+    rating_counts = np.bincount(fb_rows, minlength=n_installations)
+    tech_rating_sums = np.bincount(groups, weights=rating_sums[rows], minlength=n)
+    tech_rating_counts = np.bincount(groups, weights=rating_counts[rows], minlength=n)
+
+    return _rows(
+        cols.ids("techniciens", np.arange(n)),
+        total_assignments=np.bincount(groups, minlength=n),
+        completed_installations=np.bincount(groups, weights=inst["completed"][rows], minlength=n).astype(int),
+        on_time_installations=np.bincount(groups, weights=inst["on_time"][rows], minlength=n).astype(int),
+        avg_delay_days=_mean(groups, inst["delay"][rows], n),
+        avg_lead_time_days=_mean(groups, inst["lead_time"][rows], n),
+        avg_technician_rating=np.where(tech_rating_counts > 0, _ratio(tech_rating_sums, tech_rating_counts), None)
+    )
+
+def compute_kpis(data: Dict[str, List], forfaits: List[Dict], today: Optional[date] = None) -> Dict[str, Dict[str, Dict]]:
+    """
+    Calcule les indicateurs de chaque mart de KPI_MARTS disponibles dans les données
+
+    Les indicateurs des techniciens nécessitent installation_techniciens et
+    feedback, absents des données Python en génération --server-side.
+
+    Args:
+        data (Dict[str, List]): Tables générées (sortie de generate_data ou des points de reprise)
+        forfaits (List[Dict]): Forfaits (id, prix_mensuel)
+        today (date, optional): Date de référence des marts (aujourd'hui par défaut)
+
+    Returns:
+        Dict[str, Dict[str, Dict]]: Mart -> clé -> indicateurs
+    """
+    today = today or date.today()
+    cols = GeneratedColumns(data)
+    kpis = {
+        "fact_monthly_revenue": monthly_revenue(cols, forfaits),
+        "fact_churn_analysis": churn_analysis(cols, forfaits, today),
+        "fact_customer_ltv": customer_ltv(cols),
+        "fact_installation_efficiency": installation_efficiency(cols)
+    }
+    if "installation_techniciens" in cols and "feedback" in cols:
+        kpis["fact_technician_performance"] = technician_performance(cols)
+    return kpis
+
+def read_mart(conn, relation: str, key: str, columns: List[str]) -> Dict[str, Dict]:
+    """
+    Lit les colonnes comparées d'un mart construit (PostgreSQL ou DuckDB)
+
+    Args:
+        conn: Connexion DB-API (psycopg2 ou duckdb)
+        relation (str): Table du mart (ex. marts.fact_customer_ltv)
+        key (str): Colonne clé
+        columns (List[str]): Colonnes à lire
+
+    Returns:
+        Dict[str, Dict]: Clé -> valeurs (lignes à clé nulle ignorées)
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {key}, {', '.join(columns)} FROM {relation} WHERE {key} IS NOT NULL")
+    return {str(row[0]): dict(zip(columns, row[1:])) for row in cursor.fetchall()}
+
+def _same(expected, actual, rel_tol: float) -> bool:
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    if isinstance(expected, (date, str)) or isinstance(actual, (date, str)):
+        # Dates (relues en texte depuis un rapport JSON)
+        return str(expected)[:10] == str(actual)[:10]
+    return math.isclose(float(expected), float(actual), rel_tol=rel_tol, abs_tol=rel_tol)
+
+def compare_kpis(expected: Dict[str, Dict], actual: Dict[str, Dict], columns: List[str], rel_tol: float = 1e-6) -> Dict:
+    """
+    Compare les indicateurs calculés en mémoire à ceux d'un mart
+
+    Args:
+        expected (Dict[str, Dict]): Indicateurs calculés (clé -> valeurs)
+        actual (Dict[str, Dict]): Lignes du mart (clé -> valeurs)
+        columns (List[str]): Colonnes comparées
+        rel_tol (float): Tolérance relative (et absolue) des valeurs numériques
+
+    Returns:
+        Dict: lignes, manquantes (clés absentes du mart), en_trop (absentes du calcul),
+        ecarts (colonne -> nombre de lignes différentes) et exemples (premiers écarts)
+    """
+    missing = sorted(set(expected) - set(actual))
+    extra = sorted(set(actual) - set(expected))
+    mismatches = {column: 0 for column in columns}
+    examples = []
+    for key in sorted(set(expected) & set(actual)):
+        for column in columns:
+            if not _same(expected[key][column], actual[key][column], rel_tol):
+                mismatches[column] += 1
+                if len(examples) < 10:
+                    examples.append({"cle": key, "colonne": column, "attendu": expected[key][column], "mart": actual[key][column]})
+    return {
+        "lignes": len(expected),
+        "manquantes": missing,
+        "en_trop": extra,
+        "ecarts": {column: n for column, n in mismatches.items() if n},
+        "exemples": examples
+    }
@@ -0,0 +1,118 @@
+"""Simulateur vectorisé du cycle de vie des abonnements (chaîne de Markov)"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.settings import ABONNEMENT_PARAMS
+
+# Durée d'une période d'abonnement d'un mois, en jours
+JOURS_PAR_MOIS = 30
+
+def _draw_durations(choices: Dict[int, float], size: int, rng: np.random.Generator) -> np.ndarray:
+    """Tire des durées (en mois) selon la distribution {durée: probabilité}"""
+    durations = np.array(list(choices.keys()), dtype=np.int64)
+    probs = np.array(list(choices.values()), dtype=float)
+    return rng.choice(durations, size=size, p=probs / probs.sum())
+
+def simulate_abonnements(
+    start_dates: np.ndarray,
+    end_date: date,
+    rng: Optional[np.random.Generator] = None,
+    params: Optional[Dict] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Simule les chaînes d'abonnement de tous les clients, un renouvellement à la fois
+
+    Chaque client commence par un abonnement initial d'un mois au forfait de base,
+    puis tous les clients encore actifs avancent ensemble d'une étape de
+    renouvellement jusqu'à la fin de toutes les chaînes. Les clients arrêtés
+    peuvent revenir une fois après une pause.
+
+    Args:
+        start_dates (np.ndarray): Date de début de l'abonnement initial de chaque client (datetime64[D])
+        end_date (date): Date de référence (aujourd'hui) pour l'horizon de génération
+        rng (np.random.Generator, optional): Générateur aléatoire
+        params (Dict, optional): Probabilités de transition (par défaut ABONNEMENT_PARAMS)
+
+    Returns:
+        Dict[str, np.ndarray]: Tableaux des abonnements triés par client puis par étape :
+            client_idx, etape, premium, date_debut, date_fin, duree
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    params = {**ABONNEMENT_PARAMS, **(params or {})}
+
+    n = len(start_dates)
+    horizon = (np.datetime64(end_date, 'D') + np.timedelta64(params["horizon_jours"], 'D')).astype(np.int64)
+    start = np.asarray(start_dates, dtype='datetime64[D]').astype(np.int64)
+    all_clients = np.arange(n)
+
+    chunks: List[Dict[str, np.ndarray]] = []
+
+    def record(idx, step, premium, debut, duree):
+        chunks.append({
+            "client_idx": idx,
+            "etape": np.full(len(idx), step, dtype=np.int64),
+            "premium": premium,
+            "date_debut": debut,
+            "duree": duree
+        })
+
+    # Abonnement initial : toujours le forfait de base pour 1 mois
+    record(all_clients, 0, np.zeros(n, dtype=bool), start, np.ones(n, dtype=np.int64))
+    current = start + JOURS_PAR_MOIS
+    renewals = np.zeros(n, dtype=np.int64)
+    active = rng.random(n) < params["proba_premier_renouvellement"]
+
+    for step in range(1, params["max_renouvellements"] + 1):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+
+        # Délai de réabonnement : l'étape s'arrête si le paiement tomberait au-delà de l'horizon
+        quick = rng.random(len(idx)) < params["proba_reabonnement_rapide"]
+        delay = np.where(quick, rng.integers(0, 3, len(idx)), rng.integers(3, 11, len(idx)))
+        in_horizon = current[idx] + delay <= horizon
+        active[idx[~in_horizon]] = False
+        idx = idx[in_horizon]
+
+        premium = rng.random(len(idx)) < params["proba_forfait_premium"]
+        duree = _draw_durations(params["durees_renouvellement"], len(idx), rng)
+        record(idx, step, premium, current[idx], duree)
+
+        current[idx] += JOURS_PAR_MOIS * duree
+        renewals[idx] += 1
+
+        # La probabilité de continuer diminue après quelques renouvellements
+        p_continue = np.where(
+            renewals[idx] >= params["seuil_continuation_tardive"],
+            params["proba_continuation_tardive"],
+            params["proba_continuation"]
+        )
+        stops = rng.random(len(idx)) >= p_continue
+        active[idx[stops]] = False
+
+    # Retour après une pause pour une partie des clients qui se sont arrêtés
+    comes_back = (renewals > 0) & (rng.random(n) < params["proba_retour"])
+    idx = np.flatnonzero(comes_back)
+    pause = rng.integers(params["pause_mois_min"], params["pause_mois_max"] + 1, len(idx)) * JOURS_PAR_MOIS
+    comeback_date = current[idx] + pause
+    in_horizon = comeback_date <= horizon
+    idx, comeback_date = idx[in_horizon], comeback_date[in_horizon]
+    record(
+        idx,
+        params["max_renouvellements"] + 1,
+        rng.random(len(idx)) < params["proba_retour_premium"],
+        comeback_date,
+        _draw_durations(params["durees_retour"], len(idx), rng)
+    )
+
+    result = {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+    order = np.lexsort((result["etape"], result["client_idx"]))
+    result = {key: values[order] for key, values in result.items()}
+    result["date_fin"] = result["date_debut"] + JOURS_PAR_MOIS * result["duree"]
+    result["date_debut"] = result["date_debut"].astype('datetime64[D]')
+    result["date_fin"] = result["date_fin"].astype('datetime64[D]')
+    return result
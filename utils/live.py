@@ -0,0 +1,452 @@
+"""Simulation en temps réel du parcours des clients, écrite en continu dans PostgreSQL"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from faker import Faker
+from psycopg2.extras import register_uuid
+from psycopg2.pool import ThreadedConnectionPool
+
+from config.settings import ABONNEMENT_PARAMS, COTONOU_COORDS, INSTALLATION_PARAMS, MODELES_BOX
+from models import Abonnement, Box, Client, Feedback, Installation, Paiement, Soumission
+from utils.date_utils import add_business_days, subtract_business_days
+from utils.lifecycle import JOURS_PAR_MOIS
+from utils.sinks import TABLE_COLUMNS, table_rows
+from utils.spatial import SpatialGrid
+from utils.stats import latency_summary
+
+logger = logging.getLogger("simulator")
+
+# Types d'événements du parcours client, dans l'ordre du parcours
+EVENT_KINDS = ["inscription", "soumission", "appel", "installation", "paiement", "renouvellement", "feedback"]
+
+Statement = Tuple[str, tuple]
+
+def insert(table: str, record) -> Statement:
+    """Requête d'insertion d'un objet généré dans sa table"""
+    columns = TABLE_COLUMNS[table]
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    return query, table_rows(table, [record])[0]
+
+class SimClock:
+    """
+    Horloge simulée : le temps métier avance de days_per_second jours par seconde réelle
+
+    Args:
+        start (date): Date simulée au lancement
+        days_per_second (float): Vitesse de la simulation
+    """
+
+    def __init__(self, start: date, days_per_second: float):
+        self.start = start
+        self.days_per_second = days_per_second
+        self._t0 = time.monotonic()
+
+    def days(self) -> float:
+        """Jours simulés écoulés depuis le lancement"""
+        return (time.monotonic() - self._t0) * self.days_per_second
+
+    def today(self) -> date:
+        return self.start + timedelta(days=int(self.days()))
+
+    async def sleep_until(self, d: date) -> None:
+        """Attend que la date simulée atteigne d"""
+        delay = ((d - self.start).days - self.days()) / self.days_per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class BatchWriter:
+    """
+    Écrit les événements d'une file par petites transactions, avec une connexion du pool
+
+    Une transaction regroupe au plus batch_size événements, ou ceux arrivés pendant
+    flush_interval secondes après le premier. Les requêtes d'une transaction sont
+    envoyées en un seul aller-retour. Si la transaction échoue, elle est rejouée
+    événement par événement, chacun dans un SAVEPOINT : seuls les événements en
+    échec sont annulés et comptés comme échoués.
+    """
+
+    def __init__(self, pool: ThreadedConnectionPool, batch_size: int, flush_interval: float, max_pending: int):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.commit_latencies: List[float] = []
+        self.ingest_latencies: List[float] = []
+        self.written: Counter = Counter()
+        self.failed = 0
+
+    async def run(self) -> None:
+        """Vide la file jusqu'à la réception de None"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await asyncio.to_thread(self._commit, batch)
+
+    def _commit(self, batch: List[Tuple[str, float, List[Statement]]]) -> None:
+        conn = self.pool.getconn()
+        try:
+            start = time.perf_counter()
+            try:
+                with conn.cursor() as cursor:
+                    sql = b";".join(cursor.mogrify(query, params) for _, _, statements in batch for query, params in statements)
+                    cursor.execute(sql)
+                written = batch
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Échec d'une transaction de {len(batch)} événements, rejouée événement par événement: {e}")
+                written = self._commit_events(conn, batch)
+            conn.commit()
+            end = time.perf_counter()
+            self.commit_latencies.append(end - start)
+            self.failed += len(batch) - len(written)
+            for kind, emitted_at, _ in written:
+                self.ingest_latencies.append(end - emitted_at)
+                self.written[kind] += 1
+        except Exception as e:
+            conn.rollback()
+            self.failed += len(batch)
+            logger.error(f"Échec d'une transaction de {len(batch)} événements: {e}")
+        finally:
+            self.pool.putconn(conn)
+
+    def _commit_events(self, conn, batch: List[Tuple[str, float, List[Statement]]]) -> List[Tuple[str, float, List[Statement]]]:
+        """Exécute chaque événement dans un SAVEPOINT, annule ceux en échec et retourne les autres (à valider)"""
+        written = []
+        with conn.cursor() as cursor:
+            for event in batch:
+                kind, _, statements = event
+                cursor.execute("SAVEPOINT evenement")
+                try:
+                    cursor.execute(b";".join(cursor.mogrify(query, params) for query, params in statements))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT evenement")
+                    logger.error(f"Échec d'un événement {kind}: {e}")
+                else:
+                    written.append(event)
+                cursor.execute("RELEASE SAVEPOINT evenement")
+        return written
+
+class LiveSimulator:
+    """
+    Rejoue le parcours des clients sous forme d'événements, au fil d'une horloge simulée
+
+    Les inscriptions arrivent selon un processus de Poisson de `rate` clients par
+    seconde réelle ; chaque client suit ensuite les étapes de generate.py
+    (soumission, appel, installation, paiement initial, feedback, renouvellements
+    selon ABONNEMENT_PARAMS), chacune écrite à sa date simulée. Les événements d'un
+    client passent tous par le même écrivain : ils sont validés dans l'ordre, ce
+    qui respecte les clés étrangères. La capacité journalière des techniciens n'est
+    pas appliquée (affectation aux deux plus proches).
+    """
+
+    def __init__(
+        self,
+        pool: ThreadedConnectionPool,
+        clock: SimClock,
+        rate: float,
+        writers: int = 4,
+        batch_size: int = 50,
+        flush_interval: float = 0.05,
+        max_pending: int = 10_000,
+        seed: Optional[int] = None
+    ):
+        register_uuid()
+        self.pool = pool
+        self.clock = clock
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.fake = Faker('fr_FR')
+        self.fake.seed_instance(seed)
+        self.writers = [BatchWriter(pool, batch_size, flush_interval, max_pending) for _ in range(writers)]
+        self.emitted: Counter = Counter()
+        self._journeys: Set[asyncio.Task] = set()
+        self._serials: Dict[int, Set[str]] = {}
+        self._serials_lock = asyncio.Lock()
+        self._load_reference_data()
+
+    def _load_reference_data(self) -> None:
+        """Charge les agents, techniciens (index spatial) et forfaits existants"""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id FROM agents")
+                self.agents = [row[0] for row in cursor.fetchall()]
+                cursor.execute("SELECT id, latitude, longitude FROM techniciens")
+                self.tech_grid = SpatialGrid()
+                for tech_id, lat, lon in cursor.fetchall():
+                    self.tech_grid.add(tech_id, lat, lon)
+                cursor.execute("SELECT id, prix_mensuel FROM forfaits")
+                forfaits = dict(cursor.fetchall())
+            conn.rollback()
+        finally:
+            self.pool.putconn(conn)
+
+        if not self.agents or not len(self.tech_grid):
+            raise ValueError("La base doit contenir des agents et des techniciens (lancer generate.py)")
+        self.forfait_prix = forfaits
+        self.forfait_base = next(fid for fid, prix in forfaits.items() if prix == 15000)
+        self.forfait_premium = next(fid for fid in forfaits if fid != self.forfait_base)
+
+    def _used_serials(self, year: int) -> Set[str]:
+        """Numéros de série déjà attribués dans la base pour une année"""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT numero_serie FROM boxes WHERE numero_serie LIKE %s", (f"%-{year}",))
+                serials = {row[0] for row in cursor.fetchall()}
+            conn.rollback()
+        finally:
+            self.pool.putconn(conn)
+        return serials
+
+    async def emit(self, kind: str, client_id: UUID, statements: List[Statement]) -> None:
+        """Met en file un événement auprès de l'écrivain du client (attend si la file est pleine)"""
+        self.emitted[kind] += 1
+        writer = self.writers[client_id.int % len(self.writers)]
+        await writer.queue.put((kind, time.perf_counter(), statements))
+
+    def _spawn(self, coro) -> None:
+        """Lance une tâche de parcours, annulée à la fin de la simulation"""
+        task = asyncio.create_task(coro)
+        self._journeys.add(task)
+        task.add_done_callback(self._journey_done)
+
+    def _journey_done(self, task: asyncio.Task) -> None:
+        """Retire une tâche de parcours terminée et signale son échec éventuel"""
+        self._journeys.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Échec d'un parcours client: {task.exception()!r}")
+
+    async def _signups(self) -> None:
+        while True:
+            await asyncio.sleep(self.rng.expovariate(self.rate))
+            self._spawn(self._journey())
+
+    async def _journey(self) -> None:
+        """Parcours complet d'un client, de l'inscription à la fin de ses abonnements"""
+        rng, fake = self.rng, self.fake
+        today = self.clock.today()
+        client_id = uuid4()
+        client = Client(
+            id=client_id,
+            agent_id=rng.choice(self.agents),
+            box_id=None,
+            nom=fake.last_name(),
+            prenom=fake.first_name(),
+            email=f"{fake.user_name()}.{client_id.hex[:8]}@{fake.free_email_domain()}",
+            telephone=fake.phone_number(),
+            adresse=fake.address().replace('\n', ', '),
+            latitude=COTONOU_COORDS["latitude"] + rng.uniform(-COTONOU_COORDS["radius"], COTONOU_COORDS["radius"]),
+            longitude=COTONOU_COORDS["longitude"] + rng.uniform(-COTONOU_COORDS["radius"], COTONOU_COORDS["radius"]),
+            created_at=today
+        )
+        await self.emit("inscription", client_id, [insert("clients", client)])
+
+        soumission = Soumission(id=uuid4(), client_id=client_id, date_soumission=today, statut="soumis")
+        await self.emit("soumission", client_id, [insert("soumissions", soumission)])
+
+        # Appel 1-2 jours ouvrables avant l'installation planifiée : l'installation est alors enregistrée
+        delai = rng.randint(INSTALLATION_PARAMS["delai_min_jours"], INSTALLATION_PARAMS["delai_max_jours"])
+        date_planifiee = add_business_days(today, delai)
+        date_appel = max(today, subtract_business_days(date_planifiee, rng.randint(1, 2)))
+        await self.clock.sleep_until(date_appel)
+        installation = Installation(
+            id=uuid4(), soumission_id=soumission.id, date_planifiee=date_planifiee,
+            date_realisation=None, date_appel=date_appel
+        )
+        techniciens = [tech_id for tech_id, _ in self.tech_grid.nearest(client.latitude, client.longitude, 2)]
+        await self.emit("appel", client_id, [
+            insert("installations", installation),
+            *(insert("installation_techniciens", {"installation_id": installation.id, "technicien_id": t})
+              for t in techniciens),
+            ("UPDATE soumissions SET statut = 'planifié' WHERE id = %s", (soumission.id,))
+        ])
+
+        # Installation le jour planifié (95%) ou le jour ouvrable suivant, avec la box du client
+        date_realisation = date_planifiee if rng.random() < 0.95 else add_business_days(date_planifiee, 1)
+        await self.clock.sleep_until(date_realisation)
+        box = await self._new_box(client_id, date_realisation)
+        await self.emit("installation", client_id, [
+            ("UPDATE installations SET date_realisation = %s WHERE id = %s", (date_realisation, installation.id)),
+            ("UPDATE soumissions SET statut = 'complété' WHERE id = %s", (soumission.id,)),
+            insert("boxes", box),
+            ("UPDATE clients SET box_id = %s WHERE id = %s", (box.numero_serie, client_id))
+        ])
+
+        # Abonnement initial d'un mois au forfait de base et paiement des frais d'installation
+        abonnement = self._abonnement(client_id, installation.id, date_realisation, False, 1)
+        await self.emit("paiement", client_id, [
+            insert("abonnements", abonnement),
+            insert("paiements", Paiement(
+                id=uuid4(), client_id=client_id, abonnement_id=abonnement.id, montant=25000,
+                type_paiement="initial", date_paiement=date_realisation
+            ))
+        ])
+
+        self._spawn(self._feedback(client_id, installation.id, date_realisation))
+        await self._renewals(client_id, installation.id, abonnement.date_fin)
+
+    async def _new_box(self, client_id: UUID, installed: date) -> Box:
+        async with self._serials_lock:
+            if installed.year not in self._serials:
+                self._serials[installed.year] = await asyncio.to_thread(self._used_serials, installed.year)
+        used = self._serials[installed.year]
+        serial = None
+        while serial is None or serial in used:
+            serial = f"CBX-{self.rng.randrange(16 ** 4):04X}-{installed.year}"
+        used.add(serial)
+        return Box(
+            numero_serie=serial,
+            client_id=client_id,
+            modele=self.rng.choice(MODELES_BOX),
+            date_fabrication=installed - timedelta(days=self.rng.randint(30, 365)),
+            wifi_ssid=f"Canalbox_{self.rng.randint(1000, 9999)}"
+        )
+
+    def _abonnement(self, client_id: UUID, installation_id: UUID, debut: date, premium: bool, duree: int) -> Abonnement:
+        return Abonnement(
+            id=uuid4(),
+            client_id=client_id,
+            forfait_id=self.forfait_premium if premium else self.forfait_base,
+            installation_id=installation_id,
+            date_debut=debut,
+            date_fin=debut + timedelta(days=JOURS_PAR_MOIS * duree),
+            duree_renouvellement=duree
+        )
+
+    def _draw(self, choices: Dict[int, float]) -> int:
+        return self.rng.choices(list(choices), weights=list(choices.values()))[0]
+
+    async def _renewals(self, client_id: UUID, installation_id: UUID, fin: date) -> None:
+        """Renouvellements successifs (mêmes probabilités que utils/lifecycle.py), puis retour éventuel"""
+        params, rng = ABONNEMENT_PARAMS, self.rng
+        renewals = 0
+        continues = rng.random() < params["proba_premier_renouvellement"]
+        while continues and renewals < params["max_renouvellements"]:
+            # Le renouvellement prolonge l'abonnement à sa fin ; le délai de réabonnement ne décale que le paiement
+            quick = rng.random() < params["proba_reabonnement_rapide"]
+            date_paiement = fin + timedelta(days=rng.randint(0, 2) if quick else rng.randint(3, 10))
+            await self.clock.sleep_until(date_paiement)
+            fin = await self._renew(
+                client_id, installation_id, fin, date_paiement,
+                rng.random() < params["proba_forfait_premium"], self._draw(params["durees_renouvellement"])
+            )
+            renewals += 1
+            p_continue = (params["proba_continuation_tardive"] if renewals >= params["seuil_continuation_tardive"]
+                          else params["proba_continuation"])
+            continues = rng.random() < p_continue
+
+        if renewals > 0 and rng.random() < params["proba_retour"]:
+            debut = fin + timedelta(days=JOURS_PAR_MOIS * rng.randint(params["pause_mois_min"], params["pause_mois_max"]))
+            await self.clock.sleep_until(debut)
+            await self._renew(
+                client_id, installation_id, debut, debut,
+                rng.random() < params["proba_retour_premium"], self._draw(params["durees_retour"])
+            )
+
+    async def _renew(
+        self, client_id: UUID, installation_id: UUID, debut: date, date_paiement: date, premium: bool, duree: int
+    ) -> date:
+        """Écrit un abonnement commençant à debut et son paiement du date_paiement, retourne sa date de fin"""
+        abonnement = self._abonnement(client_id, installation_id, debut, premium, duree)
+        await self.emit("renouvellement", client_id, [
+            insert("abonnements", abonnement),
+            insert("paiements", Paiement(
+                id=uuid4(), client_id=client_id, abonnement_id=abonnement.id,
+                montant=self.forfait_prix[abonnement.forfait_id] * duree,
+                type_paiement="renouvellement", date_paiement=date_paiement
+            ))
+        ])
+        return abonnement.date_fin
+
+    async def _feedback(self, client_id: UUID, installation_id: UUID, installed: date) -> None:
+        """Feedback de 80% des clients, 1-3 jours ouvrables après l'installation"""
+        rng = self.rng
+        if rng.random() >= 0.8:
+            return
+        date_soumission = add_business_days(installed, rng.randint(1, 3))
+        await self.clock.sleep_until(date_soumission)
+        await self.emit("feedback", client_id, [insert("feedback", Feedback(
+            id=uuid4(),
+            client_id=client_id,
+            installation_id=installation_id,
+            satisfaction_produit=min(5, max(1, int(rng.gauss(4.2, 0.8)))),
+            note_techniciens=min(5, max(1, int(rng.gauss(4.5, 0.7)))),
+            commentaires=self.fake.text(max_nb_chars=200) if rng.random() > 0.3 else None,
+            date_soumission=date_soumission
+        ))])
+
+    def report(self, elapsed: float) -> Dict:
+        """Débit atteint, latences de commit et d'ingestion, événements par type"""
+        written = sum((w.written for w in self.writers), Counter())
+        return {
+            "duree_s": elapsed,
+            "evenements_emis": sum(self.emitted.values()),
+            "evenements_ecrits": sum(written.values()),
+            "evenements_echoues": sum(w.failed for w in self.writers),
+            "evenements_par_s": sum(written.values()) / elapsed if elapsed > 0 else 0.0,
+            "transactions": sum(len(w.commit_latencies) for w in self.writers),
+            "latence_commit": latency_summary(l for w in self.writers for l in w.commit_latencies),
+            "latence_ingestion": latency_summary(l for w in self.writers for l in w.ingest_latencies),
+            "par_type": {kind: written[kind] for kind in EVENT_KINDS}
+        }
+
+    async def run(self, duration: float, progress_interval: float = 5.0) -> Dict:
+        """
+        Lance la simulation pendant duration secondes, puis écrit les événements en attente
+
+        Args:
+            duration (float): Durée de la simulation (secondes réelles)
+            progress_interval (float): Intervalle entre deux points d'avancement
+
+        Returns:
+            Dict: Rapport de la simulation (voir report)
+        """
+        start = time.perf_counter()
+        writer_tasks = [asyncio.create_task(w.run()) for w in self.writers]
+        signups = asyncio.create_task(self._signups())
+
+        end = start + duration
+        while (remaining := end - time.perf_counter()) > 0:
+            await asyncio.sleep(min(progress_interval, remaining))
+            elapsed = time.perf_counter() - start
+            written = sum(sum(w.written.values()) for w in self.writers)
+            backlog = sum(w.queue.qsize() for w in self.writers)
+            logger.info(
+                f"{self.clock.today()} (simulé) - {written} événements écrits ({written / elapsed:.0f}/s), "
+                f"{len(self._journeys)} parcours en cours, {backlog} en attente"
+            )
+
+        # Arrêt des arrivées et des parcours, puis vidage des files
+        signups.cancel()
+        for task in list(self._journeys):
+            task.cancel()
+        await asyncio.gather(signups, *self._journeys, return_exceptions=True)
+        for w in self.writers:
+            await w.queue.put(None)
+        await asyncio.gather(*writer_tasks)
+        return self.report(time.perf_counter() - start)
@@ -0,0 +1,188 @@
+"""Chargement PostgreSQL en parallèle de la génération (producteur / consommateurs)"""
+
+import logging
+import multiprocessing as mp
+import queue
+import threading
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import register_uuid
+
+from config.settings import DEFAULT_PARAMS
+from utils.checkpoint import CheckpointStore
+from utils.sinks import TABLE_COLUMNS, TABLE_PARENTS, PostgresSink, table_rows
+
+logger = logging.getLogger("data_generator")
+
+# Délai (secondes) entre deux vérifications d'arrêt lors d'une attente
+_POLL_INTERVAL = 0.5
+
+def _loader_process(
+    db_config: Dict,
+    store: Optional[CheckpointStore],
+    chunk_size: int,
+    chunks: mp.Queue,
+    results: mp.Queue,
+    loaded: Dict[str, mp.Event],
+    abort: mp.Event
+) -> None:
+    """
+    Processus de chargement : insère les lots de la file dès que leurs tables parentes sont chargées
+
+    Chaque lot validé est signalé sur results ("ok", table) ; une erreur est
+    signalée ("erreur", table, message) puis la file est vidée sans charger.
+    """
+    conn = None
+    table = None
+    try:
+        conn = psycopg2.connect(**db_config)
+        register_uuid(conn_or_curs=conn)
+        loader = PostgresSink(conn, store, chunk_size)
+        while True:
+            item = chunks.get()
+            if item is None:
+                return
+            if abort.is_set():
+                continue  # Vider la file sans charger
+            table, chunk, rows = item
+            for parent in TABLE_PARENTS[table]:
+                while not loaded[parent].wait(_POLL_INTERVAL):
+                    if abort.is_set():
+                        break
+            if abort.is_set():
+                continue
+            loader.load_chunk(conn, table, rows, chunk)
+            results.put(("ok", table))
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        results.put(("erreur", table, f"{type(e).__name__}: {e}"))
+        abort.set()
+        while chunks.get() is not None:
+            pass
+    finally:
+        if conn is not None:
+            conn.close()
+
+class PipelinedPostgresSink(PostgresSink):
+    """
+    Charge chaque table dès qu'elle est générée, pendant la génération des suivantes
+
+    Les tables soumises via write_table sont découpées en lots placés dans une
+    file bornée : la génération est suspendue quand la file est pleine, ce qui
+    limite la mémoire occupée par les lots en attente. Des processus de
+    chargement, chacun avec sa propre connexion, vident la file en parallèle
+    de la génération (la préparation des requêtes ne partage pas le GIL du
+    générateur) ; un lot n'est inséré qu'une fois toutes les tables parentes
+    (TABLE_PARENTS) entièrement chargées. Les tables doivent être soumises
+    parents avant enfants.
+    """
+
+    def __init__(
+        self,
+        db_config: Dict,
+        store: Optional[CheckpointStore] = None,
+        chunk_size: int = DEFAULT_PARAMS["chunk_size"],
+        workers: int = DEFAULT_PARAMS["loader_workers"],
+        max_pending_chunks: Optional[int] = None
+    ):
+        self._chunks = mp.Queue(maxsize=max_pending_chunks or 2 * workers)
+        self._results = mp.Queue()
+        self._loaded = {table: mp.Event() for table in TABLE_COLUMNS}
+        self._abort = mp.Event()
+        self._remaining: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._errors: List[str] = []
+
+        self._workers = [
+            mp.Process(
+                target=_loader_process,
+                args=(db_config, store, chunk_size, self._chunks, self._results, self._loaded, self._abort),
+                name=f"loader-{i}",
+                daemon=True
+            )
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        # Connexion principale (forfaits) ouverte après le fork des processus de chargement
+        super().__init__(psycopg2.connect(**db_config), store, chunk_size)
+
+        # Suivi des lots validés, dans le processus principal
+        self._collector = threading.Thread(target=self._collect, name="loader-results", daemon=True)
+        self._collector.start()
+
+    def write_table(self, table: str, records: List) -> None:
+        """
+        Met en file les lots d'une table (bloque tant que la file est pleine)
+
+        Args:
+            table (str): Nom de la table
+            records (List): Objets générés de la table
+        """
+        chunks = self.pending_chunks(table, len(records))
+        with self._lock:
+            self._remaining[table] = len(chunks)
+        if not chunks:
+            self._loaded[table].set()
+
+        for chunk in chunks:
+            rows = table_rows(table, records[chunk * self.chunk_size:(chunk + 1) * self.chunk_size])
+            self._put((table, chunk, rows))
+
+    def write(self, data_dict: Dict) -> None:
+        for table in TABLE_COLUMNS:
+            self.write_table(table, data_dict[table])
+        self.finish()
+
+    def finish(self) -> None:
+        """
+        Attend la fin du chargement de toutes les tables soumises
+
+        Raises:
+            RuntimeError: Si un processus de chargement a échoué
+        """
+        for _ in self._workers:
+            self._put(None, force=True)
+        for worker in self._workers:
+            worker.join()
+        self._results.put(None)
+        self._collector.join()
+        self._raise_if_failed()
+        logger.info("Données insérées avec succès dans la base de données")
+
+    def _raise_if_failed(self) -> None:
+        if self._errors:
+            raise RuntimeError(f"Échec du chargement en parallèle: {self._errors[0]}")
+
+    def _put(self, item, force: bool = False) -> None:
+        """Ajoute un élément à la file, en abandonnant si un chargement a échoué"""
+        while True:
+            if self._abort.is_set() and not force:
+                while not self._errors:  # L'erreur est signalée avant l'arrêt
+                    self._collector.join(_POLL_INTERVAL)
+                self._raise_if_failed()
+            try:
+                self._chunks.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _collect(self) -> None:
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            if message[0] == "erreur":
+                _, table, error = message
+                logger.error(f"Erreur lors de l'insertion des données ({table}): {error}")
+                self._errors.append(error)
+                continue
+            table = message[1]
+            with self._lock:
+                self._remaining[table] -= 1
+                if self._remaining[table] == 0:
+                    self._loaded[table].set()
+                    logger.info(f"{table}: chargement terminé")
@@ -0,0 +1,148 @@
+"""Plan de génération d'un run : calendrier de l'horizon et courbe de demande, calculés une fois et partagés par les générateurs"""
+
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+
+from config.settings import CROISSANCE_PARAMS
+
+def monthly_multipliers(n_months: int, rng: np.random.Generator, growth: Optional[Dict] = None) -> np.ndarray:
+    """
+    Calcule le multiplicateur de croissance de chaque mois de l'horizon
+
+    Croissance linéaire, variation mensuelle aléatoire et plancher de
+    CROISSANCE_PARAMS, sans le boost de pointe, appliqué jour par jour.
+
+    Args:
+        n_months (int): Nombre de mois de l'horizon
+        rng (np.random.Generator): Générateur aléatoire
+        growth (Dict, optional): Règles de croissance (CROISSANCE_PARAMS par défaut)
+
+    Returns:
+        np.ndarray: Multiplicateur par mois (mois 0 = mois de départ)
+    """
+    growth = growth or CROISSANCE_PARAMS
+    trend = 1 + np.arange(n_months) * growth["croissance_mensuelle"]
+    variation = rng.uniform(
+        growth["variation_min"],
+        growth["variation_max"],
+        size=n_months
+    )
+    return np.maximum(growth["multiplicateur_min"], trend * variation)
+
+def peak_days(days: np.ndarray, growth: Optional[Dict] = None) -> np.ndarray:
+    """
+    Indique les jours de la période de pointe (25 au 8 du mois suivant)
+
+    Args:
+        days (np.ndarray): Jours (datetime64[D])
+        growth (Dict, optional): Règles de croissance (CROISSANCE_PARAMS par défaut)
+
+    Returns:
+        np.ndarray: True pour les jours de pointe
+    """
+    growth = growth or CROISSANCE_PARAMS
+    day_of_month = (days - days.astype('datetime64[M]')).astype(int) + 1
+    return (day_of_month >= growth["debut_pointe"]) | (day_of_month <= growth["fin_pointe"])
+
+def peak_weights(days: np.ndarray, growth: Optional[Dict] = None) -> np.ndarray:
+    """
+    Calcule le poids journalier lié à la période de pointe
+
+    Args:
+        days (np.ndarray): Jours (datetime64[D])
+        growth (Dict, optional): Règles de croissance (CROISSANCE_PARAMS par défaut)
+
+    Returns:
+        np.ndarray: Poids de chaque jour (boost_pointe en pointe, 1 sinon)
+    """
+    growth = growth or CROISSANCE_PARAMS
+    return np.where(peak_days(days, growth), growth["boost_pointe"], 1.0)
+
+def _month_weight_sums(first_month: np.datetime64, n_months: int, growth: Dict) -> np.ndarray:
+    """Somme des poids journaliers de chaque mois calendaire complet"""
+    month_starts = first_month + np.arange(n_months)
+    days_in_month = ((month_starts + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_starts.astype('datetime64[D]')).astype(int)
+    n_peak = growth["fin_pointe"] + np.maximum(0, days_in_month - growth["debut_pointe"] + 1)
+    return growth["boost_pointe"] * n_peak + (days_in_month - n_peak)
+
+class GenerationPlan:
+    """
+    Calendrier de l'horizon et courbe de demande d'un run
+
+    Jours de l'horizon, bornes de chaque mois (tronquées à l'horizon), jours
+    ouvrables, jours de pointe et multiplicateur de croissance de chaque mois
+    sont calculés une seule fois par run (étape "plan" du point de reprise) :
+    agents, techniciens et clients suivent la même courbe de demande au lieu
+    de tirer chacun leurs variations mensuelles.
+
+    Args:
+        start_date (date): Premier jour de l'horizon
+        end_date (date): Dernier jour de l'horizon (inclus)
+        rng (np.random.Generator): Générateur des multiplicateurs mensuels
+        growth (Dict, optional): Règles de croissance de la région (CROISSANCE_PARAMS par défaut)
+    """
+
+    def __init__(self, start_date: date, end_date: date, rng: np.random.Generator, growth: Optional[Dict] = None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.growth = growth or CROISSANCE_PARAMS
+        self.days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + np.timedelta64(1, 'D'))
+
+        months = self.days.astype('datetime64[M]')
+        self.month_idx = (months - months[0]).astype(int) if len(self.days) else np.zeros(0, dtype=int)
+        n_months = int(self.month_idx[-1]) + 1 if len(self.days) else 0
+        self.months = months[0] + np.arange(n_months) if n_months else np.zeros(0, dtype='datetime64[M]')
+
+        # Bornes de chaque mois dans l'horizon : indice de son premier jour et nombre de jours
+        self.month_first_day = np.searchsorted(self.month_idx, np.arange(n_months))
+        self.month_days = np.bincount(self.month_idx, minlength=n_months)
+        self.month_starts = self.days[self.month_first_day]
+        self.month_ends = self.days[self.month_first_day + self.month_days - 1]
+        self.business_days = np.busday_count(self.month_starts, self.month_ends + np.timedelta64(1, 'D'))
+
+        # Poids de pointe de chaque jour, rapporté à celui de son mois complet : part de la demande
+        # mensuelle attendue ce jour-là, et part du mois complet couverte par l'horizon
+        is_peak = peak_days(self.days, self.growth)
+        self.peak_days = np.bincount(self.month_idx, weights=is_peak, minlength=n_months).astype(int)
+        weights = np.where(is_peak, self.growth["boost_pointe"], 1.0)
+        weight_sums = _month_weight_sums(months[0], n_months, self.growth) if n_months else np.zeros(0)
+        self.daily_share = weights / weight_sums[self.month_idx] if n_months else np.zeros(0)
+        self.coverage = np.bincount(self.month_idx, weights=weights, minlength=n_months) / weight_sums if n_months else np.zeros(0)
+
+        self.multipliers = monthly_multipliers(n_months, rng, self.growth)
+
+    @property
+    def n_months(self) -> int:
+        return len(self.months)
+
+    def to_dict(self) -> Dict:
+        """
+        Plan sérialisable en JSON (plan.json du run)
+
+        Returns:
+            Dict: Horizon, règles de croissance et calendrier de chaque mois
+        """
+        return {
+            "debut": self.start_date.isoformat(),
+            "fin": self.end_date.isoformat(),
+            "croissance": self.growth,
+            "mois": [
+                {
+                    "mois": month.strftime("%Y-%m"),
+                    "debut": str(start),
+                    "fin": str(end),
+                    "jours": days,
+                    "jours_ouvrables": business,
+                    "jours_pointe": peak,
+                    "couverture": round(coverage, 6),
+                    "multiplicateur": round(multiplier, 6)
+                }
+                for month, start, end, days, business, peak, coverage, multiplier in zip(
+                    self.months.tolist(), self.month_starts.tolist(), self.month_ends.tolist(),
+                    self.month_days.tolist(), self.business_days.tolist(), self.peak_days.tolist(),
+                    self.coverage.tolist(), self.multipliers.tolist()
+                )
+            ]
+        }
@@ -0,0 +1,233 @@
+"""Génération multi-régions : un schéma PostgreSQL par région, chargé par son propre processus, et des vues qui les réunissent"""
+
+import hashlib
+import logging
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from config.settings import COTONOU_COORDS, CROISSANCE_PARAMS, REGIONS, REGIONS_SCHEMA
+from utils.sinks import TABLE_COLUMNS
+
+logger = logging.getLogger("data_generator")
+
+INIT_SQL = Path(__file__).resolve().parent.parent / "init.sql"
+REGION_SCHEMA_PREFIX = "region_"
+SHARED_SCHEMA = "public"
+
+_CREATE_TYPE = re.compile(r"^CREATE TYPE (\w+)", re.IGNORECASE)
+
+# Tables réunies par les vues de REGIONS_SCHEMA (les forfaits, identiques dans chaque région, sont lus dans une seule)
+UNION_TABLES = [*TABLE_COLUMNS, "paiements_mensuels", "paiements_payeurs_mensuels", "echantillonnage"]
+
+def region_schema(region: str) -> str:
+    """Schéma PostgreSQL des tables d'une région"""
+    return f"{REGION_SCHEMA_PREFIX}{region}"
+
+def region_seed(seed: int, region: str) -> int:
+    """
+    Graine d'une région, dérivée de celle du run
+
+    Args:
+        seed (int): Graine du run multi-régions
+        region (str): Nom de la région
+
+    Returns:
+        int: Graine du run de la région
+    """
+    return int.from_bytes(hashlib.sha256(f"{seed}:region:{region}".encode()).digest()[:4], "big")
+
+def region_settings(region: Optional[str]) -> Tuple[Dict, Dict]:
+    """
+    Coordonnées et règles de croissance d'une région (celles de Cotonou sans région)
+
+    Args:
+        region (str, optional): Nom de la région (REGIONS)
+
+    Returns:
+        Tuple[Dict, Dict]: Coordonnées (comme COTONOU_COORDS) et règles de croissance complètes
+    """
+    if region is None:
+        return COTONOU_COORDS, CROISSANCE_PARAMS
+    definition = REGIONS[region]
+    return definition["coords"], {**CROISSANCE_PARAMS, **definition["croissance"]}
+
+def region_code(region: Optional[str]) -> Optional[str]:
+    """Code de la région, ajouté aux numéros de série et aux emails (None sans région)"""
+    return REGIONS[region]["code"] if region is not None else None
+
+def region_counts(region: str, scale: float = 1.0) -> Dict[str, int]:
+    """
+    Effectifs d'une région (agents, techniciens, clients), multipliés par scale
+
+    Args:
+        region (str): Nom de la région
+        scale (float): Facteur appliqué aux effectifs de REGIONS
+
+    Returns:
+        Dict[str, int]: Nombre d'agents, de techniciens et de clients (au moins 1)
+    """
+    return {name: max(1, round(REGIONS[region][name] * scale)) for name in ("agents", "techniciens", "clients")}
+
+def region_db_config(db_config: Dict, region: str) -> Dict:
+    """Paramètres de connexion dont les tables non qualifiées sont celles de la région (types partagés dans public)"""
+    return {**db_config, "options": f"-c search_path={region_schema(region)},{SHARED_SCHEMA}"}
+
+def sql_statements(script: str) -> List[str]:
+    """
+    Découpe un script SQL en instructions (fin de ligne par ';' hors corps $$ ... $$)
+
+    Args:
+        script (str): Script SQL (init.sql)
+
+    Returns:
+        List[str]: Instructions, sans les lignes de commentaire
+    """
+    statements, current, in_body = [], [], False
+    for line in script.splitlines():
+        if not in_body and line.lstrip().startswith("--"):
+            continue
+        current.append(line)
+        if line.count("$$") % 2:
+            in_body = not in_body
+        if not in_body and line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip()
+            if statement != ";":
+                statements.append(statement)
+            current = []
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+def ensure_region_schema(conn, region: str) -> bool:
+    """
+    Crée le schéma d'une région et ses tables, index et triggers (init.sql) s'il n'existe pas
+
+    Comme psql, une instruction refusée (index à prédicat non immuable) est
+    signalée sans interrompre le script. Les types (statut_soumission) sont
+    partagés dans public, créés au besoin : les colonnes des vues UNION ALL des
+    régions sont du même type. Les fonctions PL/pgSQL (triggers des agrégats
+    mensuels) sont attachées au schéma de la région : une écriture faite avec
+    un autre search_path alimente bien les agrégats de la région.
+
+    Args:
+        conn: Connexion psycopg2 (la création est validée)
+        region (str): Nom de la région
+
+    Returns:
+        bool: True si le schéma a été créé
+    """
+    schema = region_schema(region)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", (f"{schema}.clients",))
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+        cursor.execute(sql.SQL("SET LOCAL search_path TO {}, {}").format(sql.Identifier(schema), sql.Identifier(SHARED_SCHEMA)))
+        for statement in sql_statements(INIT_SQL.read_text(encoding="utf-8")):
+            shared_type = _CREATE_TYPE.match(statement)
+            if shared_type:
+                cursor.execute("SELECT to_regtype(%s)", (f"{SHARED_SCHEMA}.{shared_type.group(1)}",))
+                if cursor.fetchone()[0] is not None:
+                    continue
+                statement = _CREATE_TYPE.sub(f"CREATE TYPE {SHARED_SCHEMA}.\\1", statement)
+            cursor.execute("SAVEPOINT init_sql")
+            try:
+                cursor.execute(statement)
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT init_sql")
+                logger.warning(f"{schema}: instruction de init.sql ignorée ({str(e).strip().splitlines()[0]})")
+            cursor.execute("RELEASE SAVEPOINT init_sql")
+
+        cursor.execute(
+            """
+            SELECT p.oid::regprocedure
+            FROM pg_proc p
+            JOIN pg_namespace n ON n.oid = p.pronamespace
+            JOIN pg_language l ON l.oid = p.prolang
+            WHERE n.nspname = %s AND l.lanname = 'plpgsql'
+            """,
+            (schema,)
+        )
+        for (function,) in cursor.fetchall():
+            cursor.execute(sql.SQL("ALTER FUNCTION {} SET search_path = {}, {}").format(
+                sql.SQL(function), sql.Identifier(schema), sql.Identifier(SHARED_SCHEMA)
+            ))
+    conn.commit()
+    logger.info(f"Schéma {schema} créé")
+    return True
+
+def region_schemas(conn) -> List[str]:
+    """Schémas des régions présents dans la base (contenant les tables de init.sql), par ordre alphabétique"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT n.nspname
+            FROM pg_namespace n
+            WHERE n.nspname LIKE %s AND to_regclass(quote_ident(n.nspname) || '.clients') IS NOT NULL
+            ORDER BY n.nspname
+            """,
+            (REGION_SCHEMA_PREFIX.replace("_", "\\_") + "%",)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+def create_region_views(conn, schema: str = REGIONS_SCHEMA) -> List[str]:
+    """
+    Crée (ou remplace) les vues qui réunissent les tables de toutes les régions de la base
+
+    Chaque vue ajoute la colonne region ; les marts lus au travers de ces vues
+    (dbt --vars '{source_schema: regions}') couvrent toutes les régions.
+
+    Args:
+        conn: Connexion psycopg2 (la création est validée)
+        schema (str): Schéma des vues
+
+    Returns:
+        List[str]: Schémas des régions réunis
+    """
+    schemas = region_schemas(conn)
+    if not schemas:
+        raise ValueError("Aucun schéma de région dans la base (generate.py --regions)")
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+        for table in UNION_TABLES:
+            union = sql.SQL(" UNION ALL ").join(
+                sql.SQL("SELECT t.*, {} AS region FROM {} t").format(
+                    sql.Literal(source[len(REGION_SCHEMA_PREFIX):]), sql.Identifier(source, table)
+                )
+                for source in schemas
+            )
+            cursor.execute(sql.SQL("DROP VIEW IF EXISTS {}").format(sql.Identifier(schema, table)))
+            cursor.execute(sql.SQL("CREATE VIEW {} AS {}").format(sql.Identifier(schema, table), union))
+        cursor.execute(sql.SQL("DROP VIEW IF EXISTS {}").format(sql.Identifier(schema, "forfaits")))
+        cursor.execute(sql.SQL("CREATE VIEW {} AS SELECT * FROM {}").format(
+            sql.Identifier(schema, "forfaits"), sql.Identifier(schemas[0], "forfaits")
+        ))
+    conn.commit()
+    return schemas
+
+def run_regions(commands: Dict[str, List[str]], workers: int, env: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[int, float]]:
+    """
+    Exécute la génération de chaque région dans son propre processus, workers à la fois
+
+    Args:
+        commands (Dict[str, List[str]]): Région -> ligne de commande (generate.py --region ...)
+        workers (int): Nombre de régions générées en parallèle
+        env (Dict[str, str], optional): Environnement des processus (celui du run par défaut)
+
+    Returns:
+        Dict[str, Tuple[int, float]]: Région -> (code de sortie, durée en secondes)
+    """
+    def run(region: str) -> Tuple[int, float]:
+        start = time.perf_counter()
+        result = subprocess.run(commands[region], env=env)
+        return result.returncode, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(commands, executor.map(run, commands)))
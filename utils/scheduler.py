@@ -0,0 +1,273 @@
+"""Planification des installations sous contrainte de capacité journalière des techniciens"""
+
+import heapq
+from datetime import date
+from typing import Dict, Hashable, List, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from utils.date_utils import add_business_days, is_business_day
+
+def business_day_index(d: date) -> int:
+    """Numéro du jour ouvrable d (jours ouvrables consécutifs = entiers consécutifs)"""
+    week, weekday = divmod(d.toordinal() - 1, 7)  # L'ordinal 1 (01/01/0001) est un lundi
+    return week * 5 + weekday
+
+def business_day_from_index(index: int) -> date:
+    """Jour ouvrable correspondant à un numéro calculé par business_day_index"""
+    week, weekday = divmod(index, 5)
+    return date.fromordinal(week * 7 + weekday + 1)
+
+class TechnicianScheduler:
+    """
+    Réserve des créneaux d'installation en respectant une capacité par technicien et par jour
+
+    Chaque technicien a une charge par jour ouvrable et un pointeur vers son
+    premier jour non complet. Les réservations doivent être demandées par date
+    au plus tôt croissante : les jours antérieurs sont alors libérés au fil de
+    l'eau et le coût d'une réservation ne dépend que du nombre de candidats
+    et du report effectif, pas du nombre total de techniciens ou d'installations.
+    Les jours sont manipulés en interne sous forme de numéros de jour ouvrable.
+
+    Une réservation peut représenter plusieurs installations (weight, pour un
+    jeu de données échantillonné) : la charge qui dépasse la capacité du jour
+    réservé est reportée sur les jours ouvrables suivants du technicien.
+    """
+
+    def __init__(self, capacity_per_day: int):
+        if capacity_per_day < 1:
+            raise ValueError("La capacité journalière doit être d'au moins 1 installation")
+        self.capacity = capacity_per_day
+        self._first_open: Dict[Hashable, int] = {}
+        self._load: Dict[Hashable, Dict[int, float]] = {}
+
+    def available_from(self, tech: Hashable, earliest: int) -> int:
+        """
+        Retourne le premier jour ouvrable à partir de earliest où le technicien a un créneau libre
+
+        Les jours antérieurs à earliest sont oubliés : earliest ne doit jamais
+        être inférieur à celui d'une réservation précédente.
+
+        Args:
+            tech (Hashable): Identifiant du technicien
+            earliest (int): Numéro du jour ouvrable au plus tôt
+
+        Returns:
+            int: Numéro du premier jour ouvrable disponible
+        """
+        load = self._load.setdefault(tech, {})
+        first_open = self._first_open.get(tech, earliest)
+
+        # Oublier les jours passés et complets : aucune réservation future ne pourra y tomber
+        while first_open < earliest or load.get(first_open, 0) >= self.capacity:
+            load.pop(first_open, None)
+            first_open += 1
+        self._first_open[tech] = first_open
+        return first_open
+
+    def _next_free(self, tech: Hashable, day: int) -> int:
+        """Premier jour ouvrable à partir de day où le technicien n'est pas complet"""
+        load = self._load[tech]
+        while load.get(day, 0) >= self.capacity:
+            day += 1
+        return day
+
+    def _add_load(self, tech: Hashable, day: int, weight: float) -> None:
+        """Ajoute une charge au technicien à partir de day, l'excédent sur les jours suivants"""
+        load = self._load[tech]
+        while weight > 0:
+            taken = min(weight, max(self.capacity - load.get(day, 0), 0))
+            if taken > 0:
+                load[day] = load.get(day, 0) + taken
+                weight -= taken
+            day += 1
+
+    def book(
+        self, candidates: Sequence[Hashable], earliest: date, n: int = 2, weight: float = 1.0
+    ) -> Tuple[date, List[Hashable]]:
+        """
+        Réserve le premier jour où n candidats sont disponibles ensemble
+
+        Les candidats sont parcourus via un tas indexé par leur prochain jour
+        disponible ; à égalité de jour, l'ordre des candidats (par exemple par
+        distance croissante) est respecté.
+
+        Args:
+            candidates (Sequence[Hashable]): Techniciens candidats, par ordre de préférence
+            earliest (date): Date au plus tôt de l'intervention
+            n (int): Nombre de techniciens requis (au plus le nombre de candidats)
+            weight (float): Nombre d'installations représentées par la réservation
+
+        Returns:
+            Tuple[date, List[Hashable]]: Jour réservé et techniciens retenus
+        """
+        if not is_business_day(earliest):
+            earliest = add_business_days(earliest, 1)
+        n = min(n, len(candidates))
+        if n == 0:
+            return earliest, []
+
+        start = business_day_index(earliest)
+        heap = [(self.available_from(tech, start), rank, tech) for rank, tech in enumerate(candidates)]
+        heapq.heapify(heap)
+
+        while True:
+            # Tous les candidats libres le même jour (le plus proche possible)
+            day = heap[0][0]
+            free = []
+            while heap and heap[0][0] == day:
+                free.append(heapq.heappop(heap))
+
+            if len(free) >= n:
+                selected = [tech for _, _, tech in free[:n]]
+                for tech in selected:
+                    self._add_load(tech, day, weight)
+                return business_day_from_index(day), selected
+
+            # Pas assez de candidats ce jour-là : chercher leur prochain créneau
+            for _, rank, tech in free:
+                heapq.heappush(heap, (self._next_free(tech, day + 1), rank, tech))
+
+    def book_after(self, techs: Sequence[Hashable], after: date, weight: float = 1.0) -> date:
+        """
+        Réserve pour les mêmes techniciens le premier jour ouvrable après after où tous sont libres
+
+        Report d'une intervention échouée : les techniciens ont déjà une réservation
+        (book) et leurs jours antérieurs ne sont pas oubliés, une réservation
+        suivante pourra encore y tomber.
+
+        Args:
+            techs (Sequence[Hashable]): Techniciens de l'intervention
+            after (date): Jour de l'intervention échouée
+            weight (float): Nombre d'installations représentées par la réservation
+
+        Returns:
+            date: Jour réservé
+        """
+        day = business_day_index(add_business_days(after, 1))
+        if not techs:
+            return business_day_from_index(day)
+        while True:
+            latest = max(self._next_free(tech, day) for tech in techs)
+            if latest == day:
+                break
+            day = latest
+        for tech in techs:
+            self._add_load(tech, day, weight)
+        return business_day_from_index(day)
+
+def _object_array(values: Sequence) -> np.ndarray:
+    """Tableau numpy d'objets (identifiants UUID), sans copie s'il l'est déjà"""
+    if isinstance(values, np.ndarray) and values.dtype == object:
+        return values
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+class TechnicianAssignments:
+    """
+    Techniciens assignés aux installations (table installation_techniciens), en tableaux d'indices
+
+    Chaque assignation est un couple (indice de l'installation, indice du
+    technicien) dans les tables installations et techniciens du run : deux
+    tableaux int32 au lieu d'un dictionnaire par ligne. Les identifiants ne
+    sont reconstitués qu'à l'écriture (rows). Le jour planifié de chaque
+    installation donne la charge journalière des techniciens (daily_workload)
+    sans relire les installations.
+
+    Args:
+        installation_ids (Sequence[UUID]): Identifiants des installations, dans l'ordre de leur table
+        technicien_ids (Sequence[UUID]): Identifiants des techniciens, dans l'ordre de leur table
+        installation_days (np.ndarray): Jour planifié de chaque installation (datetime64[D])
+        installation_rows (np.ndarray): Indice de l'installation de chaque assignation
+        technicien_rows (np.ndarray): Indice du technicien de chaque assignation
+    """
+
+    def __init__(
+        self,
+        installation_ids: Sequence[UUID],
+        technicien_ids: Sequence[UUID],
+        installation_days: np.ndarray,
+        installation_rows: np.ndarray,
+        technicien_rows: np.ndarray
+    ):
+        self.installation_ids = _object_array(installation_ids)
+        self.technicien_ids = _object_array(technicien_ids)
+        self.installation_days = np.asarray(installation_days, dtype="datetime64[D]")
+        self.installation_rows = np.asarray(installation_rows, dtype=np.int32)
+        self.technicien_rows = np.asarray(technicien_rows, dtype=np.int32)
+
+    @classmethod
+    def concat(cls, parts: Sequence["TechnicianAssignments"]) -> "TechnicianAssignments":
+        """
+        Réunit les assignations de plusieurs runs (une région chacun)
+
+        Les indices de chaque partie sont décalés du nombre d'installations et
+        de techniciens des parties précédentes, comme leurs tables mises bout à bout.
+
+        Args:
+            parts (Sequence[TechnicianAssignments]): Assignations, dans l'ordre de concaténation des tables
+
+        Returns:
+            TechnicianAssignments: Assignations de l'ensemble des runs
+        """
+        installation_offsets = np.cumsum([0] + [len(p.installation_ids) for p in parts])
+        technicien_offsets = np.cumsum([0] + [len(p.technicien_ids) for p in parts])
+        return cls(
+            np.concatenate([p.installation_ids for p in parts] or [_object_array([])]),
+            np.concatenate([p.technicien_ids for p in parts] or [_object_array([])]),
+            np.concatenate([p.installation_days for p in parts] or [np.zeros(0, dtype="datetime64[D]")]),
+            np.concatenate([p.installation_rows + o for p, o in zip(parts, installation_offsets)] or [np.zeros(0, dtype=np.int32)]),
+            np.concatenate([p.technicien_rows + o for p, o in zip(parts, technicien_offsets)] or [np.zeros(0, dtype=np.int32)])
+        )
+
+    def __len__(self) -> int:
+        return len(self.installation_rows)
+
+    def __getitem__(self, rows: slice) -> "TechnicianAssignments":
+        """Assignations d'une tranche de lignes (lot de chargement), tables des identifiants partagées"""
+        return TechnicianAssignments(
+            self.installation_ids, self.technicien_ids, self.installation_days,
+            self.installation_rows[rows], self.technicien_rows[rows]
+        )
+
+    def codes(self, name: str) -> np.ndarray:
+        """Indices des lignes référencées par une colonne (installation_id ou technicien_id)"""
+        return {"installation_id": self.installation_rows, "technicien_id": self.technicien_rows}[name]
+
+    def values(self, name: str) -> np.ndarray:
+        """Identifiants (UUID) d'une colonne (installation_id ou technicien_id)"""
+        ids = {"installation_id": self.installation_ids, "technicien_id": self.technicien_ids}[name]
+        return ids[self.codes(name)]
+
+    def rows(self) -> List[Tuple[str, str]]:
+        """
+        Lignes (installation_id, technicien_id) à écrire, identifiants en texte
+
+        Seuls les identifiants référencés sont convertis, une fois chacun : un
+        technicien apparaît dans de nombreuses assignations.
+        """
+        return list(zip(self._text("installation_id").tolist(), self._text("technicien_id").tolist()))
+
+    def _text(self, name: str) -> np.ndarray:
+        """Identifiants d'une colonne en texte"""
+        ids = {"installation_id": self.installation_ids, "technicien_id": self.technicien_ids}[name]
+        used, inverse = np.unique(self.codes(name), return_inverse=True)
+        return _object_array([str(i) for i in ids[used]])[inverse]
+
+    def daily_workload(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Nombre d'installations de chaque technicien par jour planifié
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Indice du technicien, jour (datetime64[D])
+            et nombre d'installations de chaque couple présent
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype="datetime64[D]"), np.zeros(0, dtype=np.int64)
+        days = self.installation_days[self.installation_rows].astype(np.int64)
+        first_day = days.min()
+        width = days.max() - first_day + 1
+        keys, counts = np.unique(self.technicien_rows.astype(np.int64) * width + (days - first_day), return_counts=True)
+        return (keys // width).astype(np.int32), (keys % width + first_day).astype("datetime64[D]"), counts
@@ -0,0 +1,226 @@
+"""Génération ensembliste des tables dérivées des clients, exécutée dans PostgreSQL"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from config.settings import INSTALLATION_PARAMS, MODELES_BOX
+from models import Client, Installation, Soumission
+
+logger = logging.getLogger("data_generator")
+
+# Taille du lot de commentaires de feedback (texte Faker) envoyé à la base
+NB_COMMENTAIRES = 500
+
+# Chaque requête ne traite que les lignes parentes sans ligne dérivée : une
+# requête rejouée (reprise) ne produit pas de doublon. Les distributions sont
+# celles des générateurs Python de generate.py.
+DERIVED_TABLES_SQL = {
+    # Une soumission par client, à sa date de création
+    "soumissions": """
+        INSERT INTO soumissions (client_id, date_soumission, statut)
+        SELECT c.id, c.created_at::DATE, 'soumis'
+        FROM clients c
+        WHERE NOT EXISTS (SELECT 1 FROM soumissions s WHERE s.client_id = c.id)
+    """,
+
+    # Installation 2-7 jours ouvrables après soumission, appel 1-2 jours ouvrables avant,
+    # 95% réalisées le jour planifié (sinon le jour ouvrable suivant)
+    "installations": """
+        INSERT INTO installations (soumission_id, date_planifiee, date_realisation, date_appel)
+        SELECT id,
+               date_planifiee,
+               CASE WHEN random() < 0.95 THEN date_planifiee ELSE add_business_days(date_planifiee, 1) END,
+               add_business_days(date_planifiee, -(1 + FLOOR(random() * 2)::INTEGER))
+        FROM (
+            SELECT s.id,
+                   add_business_days(
+                       s.date_soumission,
+                       %(delai_min)s + FLOOR(random() * (%(delai_max)s - %(delai_min)s + 1))::INTEGER
+                   ) AS date_planifiee
+            FROM soumissions s
+            WHERE NOT EXISTS (SELECT 1 FROM installations i WHERE i.soumission_id = s.id)
+        ) a
+    """,
+
+    # Les 2 techniciens les plus proches du client parmi ceux arrivés à la date souhaitée, comme
+    # generate_installations (sans report faute de capacité, la date planifiée est la date
+    # souhaitée), trouvés par KNN sur idx_techniciens_position. S'il y en a moins de 2, complétés
+    # au hasard parmi les autres : ce tirage ne parcourt la table que pour les premières installations
+    "installation_techniciens": """
+        INSERT INTO installation_techniciens (installation_id, technicien_id)
+        SELECT i.id, t.id
+        FROM (
+            SELECT i.id, i.date_planifiee AS date_souhaitee,
+                   point(c.longitude * COS(RADIANS(c.latitude)), c.latitude) AS position
+            FROM installations i
+            JOIN soumissions s ON s.id = i.soumission_id
+            JOIN clients c ON c.id = s.client_id
+            WHERE NOT EXISTS (SELECT 1 FROM installation_techniciens it WHERE it.installation_id = i.id)
+        ) i
+        CROSS JOIN LATERAL (
+            SELECT id
+            FROM (
+                (SELECT t.id, 0 AS rang
+                 FROM techniciens t
+                 WHERE t.created_at <= i.date_souhaitee
+                 ORDER BY point(t.longitude * COS(RADIANS(t.latitude)), t.latitude) <-> i.position
+                 LIMIT 2)
+                UNION ALL
+                (SELECT t.id, 1 AS rang
+                 FROM techniciens t
+                 WHERE t.created_at > i.date_souhaitee
+                   AND NOT EXISTS (
+                       SELECT 1 FROM techniciens e WHERE e.created_at <= i.date_souhaitee OFFSET 1
+                   )
+                 ORDER BY random()
+                 LIMIT 2)
+            ) candidats
+            ORDER BY rang
+            LIMIT 2
+        ) t
+    """,
+
+    # Une box par client : numéro de série CBX-XXXX-AAAA unique (les rangs successifs d'une
+    # année parcourent une permutation des 65536 valeurs hexadécimales, préfixe CBX-<code>-
+    # pour une région), fabriquée 30 à 365 jours avant le client
+    "boxes": """
+        WITH existantes AS (
+            SELECT RIGHT(numero_serie, 4)::INTEGER AS annee, COUNT(*) AS n
+            FROM boxes
+            GROUP BY 1
+        ),
+        nouvelles AS (
+            SELECT c.id, c.created_at, EXTRACT(YEAR FROM c.created_at)::INTEGER AS annee,
+                   ROW_NUMBER() OVER (PARTITION BY EXTRACT(YEAR FROM c.created_at) ORDER BY random()) AS rang
+            FROM clients c
+            WHERE NOT EXISTS (SELECT 1 FROM boxes b WHERE b.client_id = c.id)
+        )
+        INSERT INTO boxes (numero_serie, client_id, modele, date_fabrication, wifi_ssid)
+        SELECT %(prefixe)s || UPPER(LPAD(TO_HEX((((n.rang + COALESCE(e.n, 0)) * 40503 + n.annee * 7919) %% 65536)::INTEGER), 4, '0'))
+                      || '-' || n.annee,
+               n.id,
+               (%(modeles)s::TEXT[])[1 + FLOOR(random() * CARDINALITY(%(modeles)s::TEXT[]))::INTEGER],
+               n.created_at::DATE - (30 + FLOOR(random() * 336))::INTEGER,
+               'Canalbox_' || (1000 + FLOOR(random() * 9000))::INTEGER
+        FROM nouvelles n
+        LEFT JOIN existantes e ON e.annee = n.annee
+    """,
+
+    # Mise à jour des clients avec l'identifiant de leur box
+    "clients_box": """
+        UPDATE clients c
+        SET box_id = b.numero_serie
+        FROM boxes b
+        WHERE b.client_id = c.id AND c.box_id IS NULL
+    """,
+
+    # 80% des installations réalisées reçoivent un feedback 1-3 jours ouvrables après,
+    # notes gaussiennes (Box-Muller) tronquées comme int() puis bornées à 1-5,
+    # commentaire dans 70% des cas
+    "feedback": """
+        INSERT INTO feedback (client_id, installation_id, satisfaction_produit, note_techniciens,
+                              commentaires, date_soumission)
+        SELECT client_id, id,
+               LEAST(5, GREATEST(1, TRUNC(4.2 + 0.8 * SQRT(-2 * LN(1 - random())) * COS(2 * PI() * random()))))::SMALLINT,
+               LEAST(5, GREATEST(1, TRUNC(4.5 + 0.7 * SQRT(-2 * LN(1 - random())) * COS(2 * PI() * random()))))::SMALLINT,
+               CASE WHEN random() > 0.3
+                    THEN (%(commentaires)s::TEXT[])[1 + FLOOR(random() * CARDINALITY(%(commentaires)s::TEXT[]))::INTEGER]
+               END,
+               add_business_days(date_realisation, 1 + FLOOR(random() * 3)::INTEGER)
+        FROM (
+            SELECT i.id, i.date_realisation, s.client_id
+            FROM installations i
+            JOIN soumissions s ON s.id = i.soumission_id
+            WHERE i.date_realisation IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM feedback f WHERE f.installation_id = i.id)
+        ) i
+        WHERE random() < 0.8
+    """
+}
+
+def generate_derived_tables(conn, seed: int, commentaires: List[str], code: Optional[str] = None) -> Dict[str, int]:
+    """
+    Génère dans la base les soumissions, installations, techniciens assignés, boxes et feedbacks
+
+    Les clients, agents et techniciens doivent être chargés. Chaque requête est
+    validée séparément ; la capacité journalière des techniciens n'est pas
+    appliquée (affectation aux plus proches uniquement).
+
+    Args:
+        conn: Connexion psycopg2
+        seed (int): Graine du run (initialise random() de la session)
+        commentaires (List[str]): Commentaires de feedback parmi lesquels tirer
+        code (str, optional): Code de la région, ajouté aux numéros de série des boxes
+
+    Returns:
+        Dict[str, int]: Nombre de lignes insérées (ou mises à jour) par requête
+    """
+    params = {
+        "delai_min": INSTALLATION_PARAMS["delai_min_jours"],
+        "delai_max": INSTALLATION_PARAMS["delai_max_jours"],
+        "prefixe": f"CBX-{code}-" if code else "CBX-",
+        "modeles": MODELES_BOX,
+        "commentaires": commentaires
+    }
+    counts = {}
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT setseed(%s)", ((seed % 2 ** 31) / 2 ** 31,))
+        for table, query in DERIVED_TABLES_SQL.items():
+            cursor.execute(query, params)
+            conn.commit()
+            counts[table] = cursor.rowcount
+            logger.info(f"{table}: {cursor.rowcount} lignes générées dans la base")
+    return counts
+
+def read_derived_tables(conn, client_ids: List[UUID]) -> Tuple[List[Client], List[Soumission], List[Installation]]:
+    """
+    Relit les clients (avec leur box), soumissions et installations nécessaires aux abonnements
+
+    Args:
+        conn: Connexion psycopg2
+        client_ids (List[UUID]): Clients du run
+
+    Returns:
+        Tuple[List[Client], List[Soumission], List[Installation]]: Objets relus depuis la base
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, agent_id, box_id, nom, prenom, email, telephone, adresse, latitude, longitude, created_at
+            FROM clients WHERE id = ANY(%s)
+            """,
+            (client_ids,)
+        )
+        clients = [
+            Client(
+                id=row[0], agent_id=row[1], box_id=row[2], nom=row[3], prenom=row[4], email=row[5],
+                telephone=row[6], adresse=row[7], latitude=row[8], longitude=row[9], created_at=row[10].date()
+            )
+            for row in cursor.fetchall()
+        ]
+
+        cursor.execute(
+            "SELECT id, client_id, date_soumission, statut FROM soumissions WHERE client_id = ANY(%s)",
+            (client_ids,)
+        )
+        soumissions = [
+            Soumission(id=row[0], client_id=row[1], date_soumission=row[2], statut=row[3])
+            for row in cursor.fetchall()
+        ]
+
+        cursor.execute(
+            """
+            SELECT i.id, i.soumission_id, i.date_planifiee, i.date_realisation, i.date_appel
+            FROM installations i
+            JOIN soumissions s ON s.id = i.soumission_id
+            WHERE s.client_id = ANY(%s)
+            """,
+            (client_ids,)
+        )
+        installations = [
+            Installation(id=row[0], soumission_id=row[1], date_planifiee=row[2], date_realisation=row[3], date_appel=row[4])
+            for row in cursor.fetchall()
+        ]
+
+    return clients, soumissions, installations
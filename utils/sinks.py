@@ -0,0 +1,335 @@
+"""Destinations de sortie des données générées (PostgreSQL ou fichiers Parquet/CSV)"""
+
+import csv
+import gzip
+import io
+import logging
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from psycopg2.extras import execute_values, register_uuid
+
+from config.settings import DEFAULT_PARAMS, FORFAITS
+from utils.checkpoint import CheckpointStore
+from utils.scheduler import TechnicianAssignments
+
+logger = logging.getLogger("data_generator")
+
+# Ordre de chargement des tables (respecte les clés étrangères) et colonnes insérées
+TABLE_COLUMNS = {
+    "agents": ["id", "nom", "email", "telephone", "created_at"],
+    "techniciens": ["id", "nom", "email", "telephone", "latitude", "longitude", "created_at"],
+    "clients": ["id", "agent_id", "box_id", "nom", "prenom", "email", "telephone", "adresse", "latitude", "longitude", "created_at"],
+    "soumissions": ["id", "client_id", "date_soumission", "statut"],
+    "installations": ["id", "soumission_id", "date_planifiee", "date_realisation", "date_appel"],
+    "installation_techniciens": ["installation_id", "technicien_id"],
+    "boxes": ["numero_serie", "client_id", "modele", "date_fabrication", "wifi_ssid"],
+    "abonnements": ["id", "client_id", "forfait_id", "installation_id", "date_debut", "date_fin", "duree_renouvellement"],
+    "paiements": ["id", "client_id", "abonnement_id", "montant", "type_paiement", "date_paiement"],
+    "feedback": ["id", "client_id", "installation_id", "satisfaction_produit", "note_techniciens", "commentaires", "date_soumission"]
+}
+
+# Tables référencées par clé étrangère : à charger entièrement avant la table
+TABLE_PARENTS = {
+    "agents": [],
+    "techniciens": [],
+    "clients": ["agents"],
+    "soumissions": ["clients"],
+    "installations": ["soumissions"],
+    "installation_techniciens": ["installations", "techniciens"],
+    "boxes": ["clients"],
+    "abonnements": ["clients", "installations"],
+    "paiements": ["clients", "abonnements"],
+    "feedback": ["clients", "installations"]
+}
+
+# Clé primaire de chaque table : seul conflit ignoré au rejeu d'un lot (toute autre violation d'unicité échoue)
+TABLE_KEYS = {
+    "agents": ["id"],
+    "techniciens": ["id"],
+    "clients": ["id"],
+    "soumissions": ["id"],
+    "installations": ["id"],
+    "installation_techniciens": ["installation_id", "technicien_id"],
+    "boxes": ["numero_serie"],
+    "abonnements": ["id"],
+    "paiements": ["id"],
+    "feedback": ["id"]
+}
+
+# Colonne de date utilisée pour partitionner chaque table par mois (None : pas de partition)
+PARTITION_COLUMNS = {
+    "forfaits": None,
+    "agents": "created_at",
+    "techniciens": "created_at",
+    "clients": "created_at",
+    "soumissions": "date_soumission",
+    "installations": "date_planifiee",
+    "installation_techniciens": None,
+    "boxes": "date_fabrication",
+    "abonnements": "date_debut",
+    "paiements": "date_paiement",
+    "feedback": "date_soumission",
+    "echantillonnage": None
+}
+
+# Tables d'identifiants seulement (aucun texte à échapper), chargées en bloc par COPY
+COPY_TABLES = {"installation_techniciens"}
+
+# Fraction de la population générée et poids d'extrapolation (1 / fraction) des totaux des marts
+SAMPLING_COLUMNS = ["fraction", "poids"]
+
+def table_rows(table: str, records: List) -> List[Tuple]:
+    """Convertit les objets générés d'une table en tuples dans l'ordre des colonnes"""
+    columns = TABLE_COLUMNS[table]
+    if isinstance(records, TechnicianAssignments):
+        return records.rows()  # Identifiants reconstitués depuis les indices
+    if table == "installation_techniciens":
+        return [tuple(rel[col] for col in columns) for rel in records]
+    return [tuple(getattr(record, col) for col in columns) for record in records]
+
+def compact_rollups(conn, schema: Optional[str] = None) -> int:
+    """
+    Fusionne les lignes des agrégats mensuels des paiements (une par instruction d'insertion) en une ligne par clé
+
+    Args:
+        conn: Connexion psycopg2 (la fusion est validée)
+        schema (str, optional): Schéma des agrégats (celui du search_path par défaut, region_<nom> pour une région)
+
+    Returns:
+        int: Nombre de clés fusionnées
+    """
+    function = f'"{schema}".compacter_paiements_mensuels' if schema else "compacter_paiements_mensuels"
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT {function}()")
+        merged = cursor.fetchone()[0]
+    conn.commit()
+    return merged
+
+def write_sampling(conn, fraction: float) -> None:
+    """
+    Enregistre la fraction de la population générée (table echantillonnage d'init.sql)
+
+    Args:
+        conn: Connexion psycopg2 (l'écriture est validée)
+        fraction (float): Fraction des clients générée
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE echantillonnage SET fraction = %s, poids = %s", (fraction, 1 / fraction))
+    conn.commit()
+
+class OutputSink(ABC):
+    """Destination des données générées : fournit les forfaits et écrit les tables"""
+
+    @abstractmethod
+    def get_forfaits(self) -> List[Dict]:
+        """Retourne les forfaits disponibles (id, prix_mensuel)"""
+
+    @abstractmethod
+    def write(self, data_dict: Dict) -> None:
+        """Écrit les tables générées présentes dans data_dict, dans l'ordre de TABLE_COLUMNS"""
+
+    @abstractmethod
+    def write_sampling(self, fraction: float) -> None:
+        """Enregistre la fraction de la population générée (--sample-fraction)"""
+
+    def close(self) -> None:
+        pass
+
+class PostgresSink(OutputSink):
+    """
+    Charge les données dans PostgreSQL, par lots validés un à un
+
+    Chaque lot est validé (commit) séparément et, si un point de reprise est fourni,
+    enregistré comme terminé : une reprise ne recharge que les lots manquants.
+    Les insertions ignorent les lignes dont la clé primaire est déjà présente, un lot
+    rejoué est donc sans effet ; toute autre violation d'unicité reste une erreur.
+    """
+
+    def __init__(self, conn, store: Optional[CheckpointStore] = None, chunk_size: int = DEFAULT_PARAMS["chunk_size"]):
+        self.conn = conn
+        self.store = store
+        self.chunk_size = chunk_size
+
+    def get_forfaits(self) -> List[Dict]:
+        """Récupère les forfaits depuis la base de données"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, prix_mensuel FROM forfaits")
+        forfaits = [{"id": row[0], "prix_mensuel": row[1]} for row in cursor.fetchall()]
+        cursor.close()
+        return forfaits
+
+    def pending_chunks(self, table: str, n_rows: int) -> List[int]:
+        """Numéros des lots d'une table restant à charger (tous, sauf ceux validés lors d'un run précédent)"""
+        done = self.store.completed_chunks(table) if self.store else set()
+        n_chunks = (n_rows + self.chunk_size - 1) // self.chunk_size
+        if done:
+            logger.info(f"{table}: {len(done)}/{n_chunks} lots déjà chargés")
+        return [chunk for chunk in range(n_chunks) if chunk not in done]
+
+    def load_chunk(self, conn, table: str, rows: List[Tuple], chunk: int) -> None:
+        """
+        Insère et valide un lot, puis l'enregistre comme terminé dans le point de reprise
+
+        Les tables de COPY_TABLES sont copiées dans une table temporaire puis
+        insérées en une instruction, qui ignore aussi les lignes déjà présentes.
+        """
+        columns = ', '.join(TABLE_COLUMNS[table])
+        conflict = f"ON CONFLICT ({', '.join(TABLE_KEYS[table])}) DO NOTHING"
+        with conn.cursor() as cursor:
+            if table in COPY_TABLES:
+                cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS copie_{table} (LIKE {table}) ON COMMIT DELETE ROWS")
+                data = io.StringIO("".join("\t".join(map(str, row)) + "\n" for row in rows))
+                cursor.copy_expert(f"COPY copie_{table} ({columns}) FROM STDIN", data)
+                cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM copie_{table} {conflict}")
+            else:
+                query = f"INSERT INTO {table} ({columns}) VALUES %s {conflict}"
+                execute_values(cursor, query, rows, page_size=self.chunk_size)
+        conn.commit()
+        if self.store:
+            self.store.mark_chunk_done(table, chunk)
+
+    def write(self, data_dict: Dict) -> None:
+        register_uuid(conn_or_curs=self.conn)
+        chunk_size = self.chunk_size
+
+        try:
+            for table in TABLE_COLUMNS:
+                if table not in data_dict:
+                    continue
+                rows = table_rows(table, data_dict[table])
+                for chunk in self.pending_chunks(table, len(rows)):
+                    self.load_chunk(self.conn, table, rows[chunk * chunk_size:(chunk + 1) * chunk_size], chunk)
+
+            logger.info("Données insérées avec succès dans la base de données")
+
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Erreur lors de l'insertion des données: {str(e)}")
+            raise
+
+    def write_sampling(self, fraction: float) -> None:
+        write_sampling(self.conn, fraction)
+
+    def compact_rollups(self) -> None:
+        """Fusionne les agrégats mensuels des paiements alimentés lot par lot par les triggers"""
+        merged = compact_rollups(self.conn)
+        if merged:
+            logger.info(f"Agrégats mensuels des paiements fusionnés: {merged} clés")
+
+    def close(self) -> None:
+        self.conn.close()
+
+class FileSink(OutputSink):
+    """
+    Écrit chaque table dans des fichiers partitionnés par mois, sans base de données
+
+    Arborescence : <output_dir>/<table>/mois=AAAA-MM/part-0.parquet (ou .csv.gz),
+    lisible directement comme un jeu de données partitionné (Hive) par DuckDB,
+    Spark ou pyarrow. Les forfaits proviennent de FORFAITS (miroir de init.sql).
+    Une table réécrite remplace ses fichiers : une reprise est sans effet de bord.
+
+    Avec une région (generate.py --region), les tables sont écrites sous
+    <table>/region=<nom>/ : les régions générées en parallèle dans le même
+    répertoire forment un seul jeu de données. Les forfaits, communs, sont alors
+    écrits une fois par write_forfaits.
+    """
+
+    FORMATS = ("parquet", "csv")
+
+    def __init__(self, output_dir: str, fmt: str = "parquet", batch_size: int = 100_000, region: Optional[str] = None):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Format de sortie inconnu: {fmt} (attendu: {', '.join(self.FORMATS)})")
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Le format parquet nécessite pyarrow (pip install pyarrow)") from e
+        self.output_dir = Path(output_dir)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.region = region
+
+    def get_forfaits(self) -> List[Dict]:
+        return [{"id": f["id"], "prix_mensuel": f["prix_mensuel"]} for f in FORFAITS]
+
+    def write_forfaits(self) -> None:
+        """Écrit la table des forfaits (hors de toute région)"""
+        rows = [(f["id"], f["nom"], f["prix_mensuel"]) for f in FORFAITS]
+        self._write_table("forfaits", ["id", "nom", "prix_mensuel"], rows, shared=True)
+        logger.info(f"forfaits: {len(rows)} lignes écrites")
+
+    def write(self, data_dict: Dict) -> None:
+        if self.region is None:
+            self.write_forfaits()
+        for table, columns in TABLE_COLUMNS.items():
+            rows = table_rows(table, data_dict[table])
+            self._write_table(table, columns, rows)
+            logger.info(f"{table}: {len(rows)} lignes écrites")
+
+        logger.info(f"Données écrites dans {self.output_dir} ({self.fmt})")
+
+    def write_sampling(self, fraction: float) -> None:
+        self._write_table("echantillonnage", SAMPLING_COLUMNS, [(fraction, 1 / fraction)])
+
+    def _partitions(self, table: str, columns: List[str], rows: List[Tuple]) -> Dict[Optional[str], np.ndarray]:
+        """Indices des lignes de chaque mois (clé None si la table n'est pas partitionnée)"""
+        partition_col = PARTITION_COLUMNS[table]
+        if partition_col is None:
+            return {None: np.arange(len(rows))}
+
+        col = columns.index(partition_col)
+        months = np.array([f"{row[col].year}-{row[col].month:02d}" for row in rows])
+        order = np.argsort(months, kind="stable")
+        keys, starts = np.unique(months[order], return_index=True)
+        return dict(zip(keys, np.split(order, starts[1:])))
+
+    def _table_dir(self, table: str, shared: bool = False) -> Path:
+        table_dir = self.output_dir / table
+        if self.region is not None and not shared:
+            table_dir = table_dir / f"region={self.region}"
+        if table_dir.exists():
+            shutil.rmtree(table_dir)
+        table_dir.mkdir(parents=True, exist_ok=True)
+        return table_dir
+
+    def _write_table(self, table: str, columns: List[str], rows: List[Tuple], shared: bool = False) -> None:
+        table_dir = self._table_dir(table, shared)
+        partitions = self._partitions(table, columns, rows)
+
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Types déduits sur toute la table : le schéma est identique dans toutes les partitions
+            arrays = [pa.array([_plain(row[i]) for row in rows]) for i in range(len(columns))]
+            full = pa.Table.from_arrays(arrays, names=columns)
+            for month, indices in partitions.items():
+                path = self._partition_path(table_dir, month, "parquet")
+                pq.write_table(full.take(pa.array(indices)), path, row_group_size=self.batch_size, compression="zstd")
+        else:
+            for month, indices in partitions.items():
+                path = self._partition_path(table_dir, month, "csv.gz")
+                with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    for start in range(0, len(indices), self.batch_size):
+                        writer.writerows(
+                            [_plain(v) for v in rows[i]] for i in indices[start:start + self.batch_size]
+                        )
+
+    @staticmethod
+    def _partition_path(table_dir: Path, month: Optional[str], extension: str) -> Path:
+        if month is None:
+            return table_dir / f"part-0.{extension}"
+        partition_dir = table_dir / f"mois={month}"
+        partition_dir.mkdir(exist_ok=True)
+        return partition_dir / f"part-0.{extension}"
+
+def _plain(value):
+    """Convertit une valeur en type simple sérialisable (UUID en texte)"""
+    return str(value) if isinstance(value, UUID) else value
@@ -0,0 +1,281 @@
+"""Cache de jeux de données générés : instantanés COPY binaires adressés par le contenu des paramètres"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from importlib.metadata import version
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+
+from utils.sinks import TABLE_COLUMNS, TABLE_PARENTS
+
+logger = logging.getLogger("data_generator")
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Sources dont dépendent les données générées : toute modification invalide les instantanés
+GENERATOR_SOURCES = [
+    "generate.py", "models.py", "init.sql", "config/settings.py",
+    "utils/arrivals.py", "utils/checkpoint.py", "utils/date_utils.py", "utils/lifecycle.py", "utils/plan.py", "utils/regions.py",
+    "utils/scheduler.py", "utils/server_side.py", "utils/sinks.py", "utils/spatial.py", "utils/validators.py"
+]
+GENERATOR_LIBRARIES = ["faker", "numpy"]
+
+# Paramètres qui déterminent le jeu de données (les autres ne changent que la façon de le charger)
+SNAPSHOT_PARAMS = ["agents", "techniciens", "clients", "start_date", "end_date", "capacite_technicien", "sample_fraction", "profile"]
+
+def code_version() -> str:
+    """
+    Empreinte du code du générateur et des bibliothèques qui tirent les données
+
+    Returns:
+        str: Empreinte sha256 (hexadécimale)
+    """
+    digest = hashlib.sha256()
+    for source in GENERATOR_SOURCES:
+        digest.update(source.encode())
+        digest.update((ROOT_DIR / source).read_bytes())
+    for library in GENERATOR_LIBRARIES:
+        digest.update(f"{library}=={version(library)}".encode())
+    return digest.hexdigest()
+
+def snapshot_key(params: Dict, seed: int, server_side: bool = False) -> str:
+    """
+    Clé d'un jeu de données : empreinte de ses paramètres, de sa graine et de la version du code
+
+    Les tables dérivées générées dans la base (--server-side) ne tirent pas les mêmes
+    valeurs que le générateur Python : le mode fait partie de la clé.
+
+    Args:
+        params (Dict): Paramètres du run
+        seed (int): Graine du run
+        server_side (bool): Génération des tables dérivées dans la base
+
+    Returns:
+        str: Clé sha256 (hexadécimale)
+    """
+    content = {
+        "params": {name: params.get(name) for name in SNAPSHOT_PARAMS},
+        "seed": seed,
+        "server_side": server_side,
+        "code": code_version()
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def load_levels() -> List[List[str]]:
+    """
+    Tables générées groupées par niveau de clé étrangère
+
+    Les tables d'un même niveau ne se référencent pas entre elles et peuvent être
+    chargées en parallèle une fois les niveaux précédents chargés.
+
+    Returns:
+        List[List[str]]: Niveaux, parents d'abord
+    """
+    depth: Dict[str, int] = {}
+    for table in TABLE_COLUMNS:
+        depth[table] = 1 + max((depth[parent] for parent in TABLE_PARENTS[table]), default=-1)
+    levels: List[List[str]] = [[] for _ in range(max(depth.values()) + 1)]
+    for table, level in depth.items():
+        levels[level].append(table)
+    return levels
+
+def tables_are_empty(conn) -> bool:
+    """Indique si aucune table générée ne contient de ligne"""
+    with conn.cursor() as cursor:
+        for table in TABLE_COLUMNS:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cursor.fetchone()[0]:
+                return False
+    return True
+
+class SnapshotCache:
+    """
+    Instantanés des tables générées, un répertoire par clé
+
+    Arborescence : <cache_dir>/<clé>/manifest.json et <table>.bin (COPY binaire).
+    Un instantané est écrit dans un répertoire temporaire puis renommé : un
+    instantané présent est toujours complet. La date de modification du manifeste
+    marque la dernière utilisation ; au-delà de max_bytes, les instantanés les
+    moins récemment utilisés sont supprimés.
+
+    Args:
+        cache_dir (str): Répertoire du cache
+        max_bytes (int): Taille maximale du cache (0 : illimitée)
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def exists(self, key: str) -> bool:
+        """Indique si un instantané complet existe pour la clé"""
+        return (self._path(key) / "manifest.json").exists()
+
+    def load_manifest(self, key: str) -> Dict:
+        """Relit le manifeste d'un instantané"""
+        with open(self._path(key) / "manifest.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, key: str, db_config: Dict, metadata: Dict, workers: int = 4) -> Dict[str, int]:
+        """
+        Exporte les tables générées dans un nouvel instantané
+
+        Toutes les tables sont lues dans le même instantané de transaction
+        (pg_export_snapshot), en parallèle, comme pg_dump --jobs.
+
+        Args:
+            key (str): Clé du jeu de données
+            db_config (Dict): Paramètres de connexion psycopg2
+            metadata (Dict): Informations conservées dans le manifeste (paramètres, graine, run)
+            workers (int): Connexions utilisées en parallèle
+
+        Returns:
+            Dict[str, int]: Taille en octets du fichier de chaque table
+        """
+        if self.exists(key):
+            return {}
+        tmp_dir = self.cache_dir / f"{key}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        start = time.perf_counter()
+        conn = psycopg2.connect(**db_config)
+        try:
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_export_snapshot()")
+                snapshot_id = cursor.fetchone()[0]
+
+            def dump(table: str) -> Tuple[int, int]:
+                worker = psycopg2.connect(**db_config)
+                try:
+                    worker.set_session(isolation_level="REPEATABLE READ", readonly=True)
+                    path = tmp_dir / f"{table}.bin"
+                    with worker.cursor() as cursor, open(path, "wb") as f:
+                        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+                        cursor.copy_expert(
+                            f"COPY {table} ({', '.join(TABLE_COLUMNS[table])}) TO STDOUT (FORMAT binary)", f
+                        )
+                        rows = cursor.rowcount
+                    worker.rollback()
+                    return rows, path.stat().st_size
+                finally:
+                    worker.close()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                dumped = dict(zip(TABLE_COLUMNS, executor.map(dump, TABLE_COLUMNS)))
+            conn.rollback()
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            conn.close()
+
+        manifest = {
+            **metadata,
+            "key": key,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "tables": {table: {"rows": rows, "bytes": size} for table, (rows, size) in dumped.items()}
+        }
+        with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp_dir, self._path(key))
+        except OSError:
+            # Instantané écrit entre-temps par un autre run
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return {}
+
+        sizes = {table: size for table, (_, size) in dumped.items()}
+        logger.info(f"Instantané {key[:12]} enregistré ({sum(sizes.values()) / 1e6:.1f} Mo) en {time.perf_counter() - start:.1f} s")
+        self.evict(keep=key)
+        return sizes
+
+    def restore(self, key: str, db_config: Dict, workers: int = 4) -> Dict[str, int]:
+        """
+        Remplace le contenu des tables générées par celui d'un instantané
+
+        Les tables sont vidées puis rechargées par niveau de clé étrangère, les
+        tables d'un même niveau en parallèle (une connexion chacune), et analysées.
+        Les forfaits, définis par init.sql, ne sont pas touchés.
+
+        Args:
+            key (str): Clé du jeu de données
+            db_config (Dict): Paramètres de connexion psycopg2
+            workers (int): Connexions utilisées en parallèle
+
+        Returns:
+            Dict[str, int]: Nombre de lignes restaurées par table
+        """
+        snapshot_dir = self._path(key)
+        manifest = self.load_manifest(key)
+        os.utime(snapshot_dir / "manifest.json")  # Dernière utilisation, pour l'éviction
+
+        conn = psycopg2.connect(**db_config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {', '.join(TABLE_COLUMNS)}")
+            conn.commit()
+        finally:
+            conn.close()
+
+        def load(table: str) -> None:
+            worker = psycopg2.connect(**db_config)
+            try:
+                with worker.cursor() as cursor, open(snapshot_dir / f"{table}.bin", "rb") as f:
+                    cursor.copy_expert(
+                        f"COPY {table} ({', '.join(TABLE_COLUMNS[table])}) FROM STDIN (FORMAT binary)", f
+                    )
+                    cursor.execute(f"ANALYZE {table}")
+                worker.commit()
+            finally:
+                worker.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for level in load_levels():
+                list(executor.map(load, level))
+
+        return {table: info["rows"] for table, info in manifest["tables"].items()}
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Supprime les instantanés les moins récemment utilisés jusqu'à respecter max_bytes
+
+        Args:
+            keep (str, optional): Clé à ne jamais supprimer (instantané qui vient d'être écrit)
+
+        Returns:
+            List[str]: Clés supprimées
+        """
+        if not self.max_bytes or not self.cache_dir.exists():
+            return []
+        snapshots = []
+        for path in self.cache_dir.iterdir():
+            manifest = path / "manifest.json"
+            if path.is_dir() and manifest.exists():
+                size = sum(f.stat().st_size for f in path.iterdir())
+                snapshots.append((manifest.stat().st_mtime, path.name, size))
+
+        total = sum(size for _, _, size in snapshots)
+        evicted = []
+        for _, key, size in sorted(snapshots):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+            evicted.append(key)
+            logger.info(f"Instantané {key[:12]} supprimé du cache ({size / 1e6:.1f} Mo)")
+        return evicted
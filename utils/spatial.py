@@ -0,0 +1,113 @@
+"""Index spatial en grille pour l'affectation des techniciens les plus proches"""
+
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, Hashable, List, Tuple
+
+# Longueur d'un degré de latitude, en kilomètres
+KM_PAR_DEGRE = 111.32
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Distance approchée (équirectangulaire) entre deux points, suffisante à l'échelle d'une ville
+
+    Args:
+        lat1 (float), lon1 (float): Premier point
+        lat2 (float), lon2 (float): Second point
+
+    Returns:
+        float: Distance en kilomètres
+    """
+    x = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = lat2 - lat1
+    return math.hypot(x, y) * KM_PAR_DEGRE
+
+class SpatialGrid:
+    """
+    Grille de cellules carrées (en degrés) indexant des points par leur cellule
+
+    Les points sont ajoutés au fil de l'eau (par exemple à la date d'arrivée d'un
+    technicien). La recherche des k plus proches parcourt les anneaux de cellules
+    autour du point et s'arrête dès qu'aucune cellule plus lointaine ne peut
+    contenir un point plus proche : son coût dépend de la densité locale et non
+    de la taille totale de l'index.
+    """
+
+    def __init__(self, cell_size: float = 0.01):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[Tuple[Hashable, float, float]]] = defaultdict(list)
+        self._size = 0
+        self._bounds = None  # (min_i, max_i, min_j, max_j) des cellules occupées
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def add(self, key: Hashable, lat: float, lon: float) -> None:
+        """
+        Ajoute un point à l'index
+
+        Args:
+            key (Hashable): Identifiant du point
+            lat (float), lon (float): Coordonnées du point
+        """
+        i, j = self._cell(lat, lon)
+        self._cells[(i, j)].append((key, lat, lon))
+        self._size += 1
+        if self._bounds is None:
+            self._bounds = (i, i, j, j)
+        else:
+            min_i, max_i, min_j, max_j = self._bounds
+            self._bounds = (min(min_i, i), max(max_i, i), min(min_j, j), max(max_j, j))
+
+    def _ring(self, ci: int, cj: int, r: int):
+        """Cellules situées exactement à r cellules (norme infinie) de (ci, cj)"""
+        if r == 0:
+            yield ci, cj
+            return
+        for dj in range(-r, r + 1):
+            yield ci - r, cj + dj
+            yield ci + r, cj + dj
+        for di in range(-r + 1, r):
+            yield ci + di, cj - r
+            yield ci + di, cj + r
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[Hashable, float]]:
+        """
+        Retourne les k points les plus proches
+
+        Args:
+            lat (float), lon (float): Coordonnées de recherche
+            k (int): Nombre de points souhaités
+
+        Returns:
+            List[Tuple[Hashable, float]]: (identifiant, distance en km), du plus proche au plus lointain
+        """
+        if self._size == 0 or k <= 0:
+            return []
+
+        ci, cj = self._cell(lat, lon)
+        min_i, max_i, min_j, max_j = self._bounds
+        max_ring = max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j))
+
+        # Distance minimale (km) entre le point et une cellule de l'anneau r + 1
+        cell_km = self.cell_size * KM_PAR_DEGRE * min(1.0, math.cos(math.radians(lat)))
+
+        best: List[Tuple[float, int, Hashable]] = []  # tas max via distances négatives
+        counter = 0
+        for r in range(max_ring + 1):
+            for cell in self._ring(ci, cj, r):
+                for key, plat, plon in self._cells.get(cell, ()):
+                    d = distance_km(lat, lon, plat, plon)
+                    counter += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, counter, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, counter, key))
+            if len(best) == k and r * cell_km >= -best[0][0]:
+                break
+
+        return [(key, -neg_d) for neg_d, _, key in sorted(best, reverse=True)]
@@ -0,0 +1,35 @@
+"""Statistiques de performance : débits et percentiles de latence"""
+
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+# Percentiles rapportés par défaut
+PERCENTILES = (50, 95, 99)
+
+def latency_summary(latencies: Iterable[float], percentiles: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+    """
+    Résume une série de latences (en secondes) en millisecondes
+
+    Args:
+        latencies (Iterable[float]): Latences mesurées, en secondes
+        percentiles (Sequence[int]): Percentiles à calculer
+
+    Returns:
+        Dict[str, float]: count, mean, p50, p95, p99 (selon percentiles) et max, en ms
+    """
+    values = np.fromiter(latencies, dtype=float) * 1000
+    if len(values) == 0:
+        return {"count": 0}
+    summary = {"count": len(values), "mean": float(values.mean())}
+    for p, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{p}"] = float(value)
+    summary["max"] = float(values.max())
+    return summary
+
+def format_latency(summary: Dict[str, float]) -> str:
+    """Met en forme un résumé de latence_summary sur une ligne"""
+    if not summary.get("count"):
+        return "aucune mesure"
+    parts = [f"{key}={value:.1f} ms" for key, value in summary.items() if key != "count"]
+    return f"n={summary['count']} " + " ".join(parts)